@@ -1,32 +1,82 @@
-from flask import Flask, request, render_template, redirect, url_for, session, jsonify, flash, Response
-from models import db, User, CandidateProfile, Job, Application, Review
-from utils import analyze_candidate, extract_text_from_pdf
+from flask import (Blueprint, Flask, current_app, request, render_template, redirect, url_for, session, jsonify,
+                   flash, Response, make_response, send_file, stream_with_context)
+from models import (db, User, CandidateProfile, Job, Application, Review, ApplicationStatusHistory,
+                    JobFunnelStage, DataVersion, ExportJob, ArchivedApplication, ArchivedReview,
+                    FUNNEL_STAGES, composite_score, upgrade_schema)
+from cache import ViewCache
+from compression import init_compression
+from exports import iter_changed_rows, start_export_job
+from sqlalchemy import case, delete, exists, func, insert, or_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from utils import analyze_candidate, analyze_github, extract_text_from_pdf, profile_fingerprint
 import os
-import os as _os
-import csv
-import io
-import re
-from datetime import datetime as dt
-
-app = Flask(__name__)
+import json
+import hashlib
+import time
+import click
+from datetime import datetime as dt, timedelta, timezone
+from werkzeug.http import is_resource_modified
+
+# Routes live on a blueprint so the app is only built by create_app(); importing
+# this module does no I/O and no schema work.
+bp = Blueprint('portal', __name__, cli_group=None)
 INTERVIEW_APP_URL = "http://127.0.0.1:8000/interview"
-INTERVIEW_SECRET = _os.getenv("INTERVIEW_SECRET", "")
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///jobportal.db'
-app.config['SECRET_KEY'] = 'demo-secret-key-for-interview'
-app.config['UPLOAD_FOLDER'] = 'uploads'
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-
-db.init_app(app)
 
-with app.app_context():
-    db.create_all()
+# ===== View Cache =====
+
+def data_version_stamp(*names):
+    """(version per name, latest change time across them) from the DataVersion table."""
+    rows = {name: (version, updated_at) for name, version, updated_at in
+            db.session.query(DataVersion.name, DataVersion.version, DataVersion.updated_at)
+            .filter(DataVersion.name.in_(names)).all()}
+    versions = tuple(rows[n][0] if n in rows else 0 for n in names)
+    changed = [updated_at for _, updated_at in rows.values() if updated_at]
+    return versions, (max(changed).replace(tzinfo=timezone.utc) if changed else None)
+
+def data_versions(*names):
+    return data_version_stamp(*names)[0]
+
+def not_modified(etag, last_modified):
+    """304 response when the request's If-None-Match / If-Modified-Since still match, else None."""
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    resp = Response(status=304)
+    resp.set_etag(etag)
+    if last_modified:
+        resp.last_modified = last_modified
+    return resp
+
+def cached_view(name, params, tables, build, render):
+    """Render a page from view data cached per version of `tables`, with ETag/304 support.
+
+    build() must return JSON-serializable data (it may be stored in the shared
+    tier); render(data) runs on every non-304 request so session-specific parts
+    of the page (nav, flash messages) are never cached.
+    """
+    versions, last_modified = data_version_stamp(*tables)
+    key = json.dumps([name, params, versions])
+    # Pages carrying flash messages are one-off and must not be revalidated
+    etag = None
+    if '_flashes' not in session:
+        identity = [key, session.get('user_id'), session.get('role'), session.get('email')]
+        etag = hashlib.sha1(json.dumps(identity).encode('utf-8')).hexdigest()
+        resp = not_modified(etag, last_modified)
+        if resp:
+            return resp
+    resp = make_response(render(current_app.extensions['view_cache'].get_or_set(key, build)))
+    if etag:
+        resp.set_etag(etag)
+        if last_modified:
+            resp.last_modified = last_modified
+        resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
 
 # ===== Auth Routes =====
-@app.route('/')
+@bp.route('/')
 def index():
-    return redirect(url_for('login'))
+    return redirect(url_for('portal.login'))
 
-@app.route('/signup', methods=['GET', 'POST'])
+@bp.route('/signup', methods=['GET', 'POST'])
 def signup():
     if request.method == 'POST':
         email = request.form['email']
@@ -34,7 +84,7 @@ def signup():
         role = request.form['role']
         if User.query.filter_by(email=email).first():
             flash("Email already exists", "error")
-            return redirect(url_for('signup'))
+            return redirect(url_for('portal.signup'))
         user = User(email=email, password=password, role=role)
         db.session.add(user)
         db.session.commit()
@@ -42,10 +92,10 @@ def signup():
         session['role'] = role
         session['email'] = email
         flash("Signup successful. Welcome!", "success")
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('portal.dashboard'))
     return render_template('signup.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         user = User.query.filter_by(email=request.form['email'], password=request.form['password']).first()
@@ -53,25 +103,25 @@ def login():
             session['user_id'] = user.id
             session['role'] = user.role
             session['email'] = user.email
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('portal.dashboard'))
         flash("Invalid email or password", "error")
-        return redirect(url_for('login'))
+        return redirect(url_for('portal.login'))
     return render_template('login.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.clear()
     flash("Logged out successfully", "success")
-    return redirect(url_for('login'))
+    return redirect(url_for('portal.login'))
 
 # ===== Dashboard =====
-@app.route('/dashboard')
+@bp.route('/dashboard')
 def dashboard():
     if 'user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('portal.login'))
     user = User.query.get(session['user_id'])
     if user.role == 'candidate':
-        jobs = Job.query.all()
+        jobs = Job.query.filter(Job.closed_at.is_(None)).all()
         applications = Application.query.filter_by(candidate_id=user.id).all()
         return render_template('candidate_dashboard.html', jobs=jobs, applications=applications)
     else:
@@ -79,10 +129,10 @@ def dashboard():
         return render_template('recruiter_dashboard.html', jobs=jobs)
 
 # ===== Candidate Profile =====
-@app.route('/profile', methods=['GET', 'POST'])
+@bp.route('/profile', methods=['GET', 'POST'])
 def profile():
     if session.get('role') != 'candidate':
-        return redirect(url_for('login'))
+        return redirect(url_for('portal.login'))
     user_id = session['user_id']
     profile = CandidateProfile.query.filter_by(user_id=user_id).first()
     if request.method == 'POST':
@@ -95,21 +145,29 @@ def profile():
         # Save new resume if provided
         resume_text = "No content"
         if resume and getattr(resume, 'filename', ''):
-            path = os.path.join(app.config['UPLOAD_FOLDER'], resume.filename)
+            path = os.path.join(current_app.config['UPLOAD_FOLDER'], resume.filename)
             resume.save(path)
             profile.resume_path = path
-        # Load resume text from stored resume if available
-        if profile.resume_path and os.path.exists(profile.resume_path):
-            try:
-                resume_text = extract_text_from_pdf(profile.resume_path) or "No content"
-            except Exception:
-                resume_text = "No content"
-                flash("We couldn't parse your resume PDF. You can still add skills or try another file.", "error")
-        # Analyze to compute scores (uses GitHub too)
-        result = analyze_candidate(resume_text, github or (profile.github_url or ""))
+        # Only re-analyze when the scoring inputs (resume content, GitHub URL) changed
+        github_url = github or (profile.github_url or "")
+        fingerprint = profile_fingerprint(profile.resume_path, github_url)
+        reanalyze = fingerprint != profile.analysis_fingerprint
+        result = {}
+        if reanalyze:
+            # Load resume text from stored resume if available
+            if profile.resume_path and os.path.exists(profile.resume_path):
+                try:
+                    resume_text = extract_text_from_pdf(profile.resume_path) or "No content"
+                except Exception:
+                    resume_text = "No content"
+                    flash("We couldn't parse your resume PDF. You can still add skills or try another file.", "error")
+            # Analyze to compute scores (uses GitHub too)
+            result = analyze_candidate(resume_text, github_url)
         # Merge skills: existing + AI/extracted + manual
         existing_skills = profile.extracted_skills or ""
-        extracted = result.get('skills') or ""
+        # A throttled Gemini call leaves only keyword placeholders; keep what is stored
+        gemini_failed = result.get('gemini_rate_limited')
+        extracted = "" if gemini_failed and existing_skills else (result.get('skills') or "")
         combined = [s.strip() for s in (existing_skills + "," + extracted + "," + manual).split(",") if s.strip()]
         seen = set()
         dedup = []
@@ -123,40 +181,62 @@ def profile():
         profile.linkedin_url = linkedin or profile.linkedin_url
         # Update scores
         if result:
-            profile.tech_score = result.get('tech_score', profile.tech_score or 0)
-            profile.comm_score = result.get('comm_score', profile.comm_score or 0)
+            # Keep the previous GitHub score when the GitHub check was rate limited or failed
+            github_failed = result.get('rate_limited') or result.get('github_error')
+            if not github_failed or not profile.tech_score:
+                profile.tech_score = result.get('tech_score', profile.tech_score or 0)
+            if not gemini_failed or not profile.comm_score:
+                profile.comm_score = result.get('comm_score', profile.comm_score or 0)
+            # Either placeholder means the profile must be analyzed again on the next save
+            if not github_failed and not gemini_failed:
+                profile.analysis_fingerprint = fingerprint
+                if github_url:
+                    profile.github_etag = result.get('github_etag')
+                    profile.github_refreshed_at = dt.utcnow()
         db.session.add(profile)
         db.session.commit()
-        # Update funnel for all applications of this candidate
-        apps = Application.query.filter_by(candidate_id=user_id).all()
-        for a in apps:
-            auto_update_funnel(a.id)
-        flash("Profile saved successfully", "success")
-        return redirect(url_for('dashboard'))
+        if reanalyze:
+            # Update funnel for all applications of this candidate
+            apps = Application.query.filter_by(candidate_id=user_id).all()
+            for a in apps:
+                auto_update_funnel(a.id)
+            flash("Profile saved successfully. Resume and GitHub re-analyzed.", "success")
+        else:
+            flash("Profile saved successfully. Resume and GitHub unchanged, scores kept.", "success")
+        return redirect(url_for('portal.dashboard'))
     return render_template('profile.html', profile=profile)
 
 # ===== Apply to Job =====
-@app.route('/apply/<int:job_id>')
+@bp.route('/apply/<int:job_id>')
 def apply(job_id):
     if session.get('role') != 'candidate':
         flash("Candidates only. Please log in as a candidate.", "error")
-        return redirect(url_for('login'))
-    if Application.query.filter_by(candidate_id=session['user_id'], job_id=job_id).first():
+        return redirect(url_for('portal.login'))
+    job = Job.query.get(job_id)
+    if not job or job.closed_at:
+        flash("This job is no longer accepting applications.", "error")
+        return redirect(url_for('portal.dashboard'))
+    if (Application.query.filter_by(candidate_id=session['user_id'], job_id=job_id).first()
+            or ArchivedApplication.query.filter_by(candidate_id=session['user_id'], job_id=job_id).first()):
         flash("You have already applied to this job.", "error")
-        return redirect(url_for('dashboard'))
-    app_record = Application(candidate_id=session['user_id'], job_id=job_id)
+        return redirect(url_for('portal.dashboard'))
+    now = dt.utcnow()
+    app_record = Application(candidate_id=session['user_id'], job_id=job_id, status="Applied",
+                             created_at=now, status_changed_at=now)
     db.session.add(app_record)
+    db.session.flush()
+    record_status_changes([(app_record.id, job_id, None, "Applied", None)], now)
     db.session.commit()
     auto_update_funnel(app_record.id)
     flash("Application submitted successfully", "success")
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('portal.dashboard'))
 
 # ===== Recruiter: Post Job =====
-@app.route('/post_job', methods=['GET', 'POST'])
+@bp.route('/post_job', methods=['GET', 'POST'])
 def post_job():
     if session.get('role') != 'recruiter':
         flash("Recruiters only. Please log in as a recruiter.", "error")
-        return redirect(url_for('login'))
+        return redirect(url_for('portal.login'))
     if request.method == 'POST':
         job = Job(
             title=request.form['title'],
@@ -166,49 +246,65 @@ def post_job():
         db.session.add(job)
         db.session.commit()
         flash("Job posted successfully", "success")
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('portal.dashboard'))
     return render_template('post_job.html')
 
+@bp.route('/job/<int:job_id>/close', methods=['POST'])
+def close_job(job_id):
+    job = Job.query.get(job_id)
+    if session.get('role') != 'recruiter' or not job or job.recruiter_id != session.get('user_id'):
+        flash("Unauthorized to close this job.", "error")
+        return redirect(url_for('portal.dashboard'))
+    if not job.closed_at:
+        job.closed_at = dt.utcnow()
+        db.session.commit()
+    flash("Job closed. Its applications will be archived by the next archive run.", "success")
+    return redirect(url_for('portal.dashboard'))
+
 # ===== View Applicants =====
-@app.route('/applicants/<int:job_id>')
+@bp.route('/applicants/<int:job_id>')
 def applicants(job_id):
     job = Job.query.get(job_id)
     if not job or job.recruiter_id != session.get('user_id'):
         flash("Unauthorized to view applicants for this job.", "error")
-        return redirect(url_for('dashboard'))
-    apps = Application.query.filter_by(job_id=job_id).all()
-    candidates = []
-    for app in apps:
-        user = User.query.get(app.candidate_id)
-        profile = CandidateProfile.query.filter_by(user_id=user.id).first()
-        candidates.append({
-            'email': user.email,
-            'status': app.status,
-            'tech_score': profile.tech_score if profile else 0,
-            'comm_score': profile.comm_score if profile else 0,
-            'application_id': app.id
-        })
+        return redirect(url_for('portal.dashboard'))
+    def build():
+        candidates = []
+        for app in Application.query.filter_by(job_id=job_id).all():
+            user = User.query.get(app.candidate_id)
+            profile = CandidateProfile.query.filter_by(user_id=user.id).first()
+            candidates.append({
+                'email': user.email,
+                'status': app.status,
+                'tech_score': profile.tech_score if profile else 0,
+                'comm_score': profile.comm_score if profile else 0,
+                'application_id': app.id
+            })
+        return candidates
     # ✅ PASS INTERVIEW_APP_URL TO TEMPLATE (THIS IS THE ONLY CHANGE)
-    return render_template('applicants.html', job=job, candidates=candidates, INTERVIEW_APP_URL=INTERVIEW_APP_URL)
+    return cached_view('applicants', job_id, ('application', 'candidate_profile'), build,
+                       lambda candidates: render_template('applicants.html', job=job, candidates=candidates,
+                                                          INTERVIEW_APP_URL=INTERVIEW_APP_URL))
 
 # ===== Add Review =====
-@app.route('/application/<int:app_id>')
+@bp.route('/application/<int:app_id>')
 def application_detail(app_id):
     if session.get('role') != 'candidate' or session.get('user_id') is None:
-        return redirect(url_for('login'))
+        return redirect(url_for('portal.login'))
     app_rec = Application.query.get(app_id)
     if not app_rec or app_rec.candidate_id != session.get('user_id'):
         flash("Unauthorized to view this application.", "error")
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('portal.dashboard'))
     job = Job.query.get(app_rec.job_id)
     reviews = Review.query.filter_by(application_id=app_id).all()
     return render_template('application_detail.html', application=app_rec, job=job, reviews=reviews)
 
-@app.route('/interview/callback', methods=['POST'])
+@bp.route('/interview/callback', methods=['POST'])
 def interview_callback():
     # Optional shared secret validation
     token = request.headers.get('X-Interview-Token', '')
-    if INTERVIEW_SECRET and token != INTERVIEW_SECRET:
+    secret = current_app.config['INTERVIEW_SECRET']
+    if secret and token != secret:
         return jsonify({"error": "Unauthorized"}), 401
     data = request.get_json(silent=True) or {}
     app_id = data.get('app_id')
@@ -224,27 +320,14 @@ def interview_callback():
     db.session.add(review)
     db.session.commit()
     # Update funnel based on averages
-    all_reviews = Review.query.filter_by(application_id=app_id).all()
-    tech_scores = [r.score for r in all_reviews if r.reviewer_type == 'tech']
-    hr_scores = [r.score for r in all_reviews if r.reviewer_type == 'hr']
-    avg_tech = sum(tech_scores) / len(tech_scores) if tech_scores else 0
-    avg_hr = sum(hr_scores) / len(hr_scores) if hr_scores else 0
-    if avg_tech >= 70 and avg_hr >= 70:
-        app_rec.status = "Selected"
-    elif avg_tech >= 60 and avg_hr >= 60:
-        app_rec.status = "HR Checked"
-    elif avg_tech >= 60:
-        app_rec.status = "Technical Checked"
-    elif all_reviews:
-        app_rec.status = "Shortlisted"
-    db.session.commit()
+    review_update_funnel(app_rec)
     return jsonify({"status": "ok", "application_status": app_rec.status}), 200
 
-@app.route('/review/<int:app_id>', methods=['POST'])
+@bp.route('/review/<int:app_id>', methods=['POST'])
 def add_review(app_id):
     if session.get('role') != 'recruiter':
         flash("Recruiters only. Please log in as a recruiter.", "error")
-        return redirect(url_for('login'))
+        return redirect(url_for('portal.login'))
     review = Review(
         application_id=app_id,
         reviewer_type=request.form['reviewer_type'],
@@ -254,213 +337,542 @@ def add_review(app_id):
     db.session.add(review)
     db.session.commit()
     # Recalculate hiring funnel based on reviews
-    app_rec = Application.query.get(app_id)
-    all_reviews = Review.query.filter_by(application_id=app_id).all()
+    review_update_funnel(Application.query.get(app_id))
+    flash("Review submitted", "success")
+    return redirect(url_for('portal.applicants', job_id=request.form['job_id']))
+
+# ===== Hiring Funnel Automation =====
+def record_status_changes(changes, now):
+    """Append history rows and fold the changes into the per-job funnel summary.
+
+    `changes` is a list of (application_id, job_id, from_status, to_status,
+    entered_from_at) tuples; from_status is None for new applications.
+    """
+    if not changes:
+        return
+    db.session.execute(insert(ApplicationStatusHistory), [
+        {'application_id': app_id, 'job_id': job_id, 'from_status': old, 'to_status': new, 'changed_at': now}
+        for app_id, job_id, old, new, _ in changes
+    ])
+    deltas = {}
+    for _, job_id, old, new, entered_at in changes:
+        if old is not None:
+            d = deltas.setdefault((job_id, old), [0, 0, 0, 0.0])
+            d[1] -= 1
+            d[2] += 1
+            d[3] += (now - entered_at).total_seconds() if entered_at else 0.0
+        d = deltas.setdefault((job_id, new), [0, 0, 0, 0.0])
+        d[0] += 1
+        d[1] += 1
+    stmt = sqlite_insert(JobFunnelStage).values([
+        {'job_id': job_id, 'stage': stage, 'entered': d[0], 'current': d[1], 'exited': d[2], 'seconds_in_stage': d[3]}
+        for (job_id, stage), d in deltas.items()
+    ])
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['job_id', 'stage'],
+        set_={
+            'entered': JobFunnelStage.entered + stmt.excluded.entered,
+            'current': JobFunnelStage.current + stmt.excluded.current,
+            'exited': JobFunnelStage.exited + stmt.excluded.exited,
+            'seconds_in_stage': JobFunnelStage.seconds_in_stage + stmt.excluded.seconds_in_stage,
+        },
+    ))
+
+def backfill_funnel(batch_size=500):
+    """Seed history and funnel counts for applications created before status tracking existed.
+
+    Each application without a history row is recorded as having entered its
+    current status, and a missing status_changed_at falls back to created_at,
+    so later changes neither drive `current` negative nor report 0 days in
+    stage. Idempotent: seeded applications have a history row afterwards.
+    """
+    now = dt.utcnow()
+    db.session.execute(
+        update(Application).where(Application.status_changed_at.is_(None))
+        .values(status_changed_at=func.coalesce(Application.created_at, now), updated_at=Application.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    seeded = 0
+    while True:
+        rows = (
+            db.session.query(Application.id, Application.job_id, Application.status)
+            .filter(Application.status.isnot(None))
+            .filter(~exists().where(ApplicationStatusHistory.application_id == Application.id))
+            .order_by(Application.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            return seeded
+        record_status_changes([(a_id, job_id, None, status, None) for a_id, job_id, status in rows], now)
+        db.session.commit()
+        seeded += len(rows)
+
+def set_application_status(app_rec, status):
+    """Single entry point for status changes on a loaded Application; caller commits."""
+    if app_rec.status == status:
+        return
+    now = dt.utcnow()
+    record_status_changes([(app_rec.id, app_rec.job_id, app_rec.status, status, app_rec.status_changed_at)], now)
+    app_rec.status = status
+    app_rec.status_changed_at = now
+
+def review_update_funnel(app_rec):
+    all_reviews = Review.query.filter_by(application_id=app_rec.id).all()
     tech_scores = [r.score for r in all_reviews if r.reviewer_type == 'tech']
     hr_scores = [r.score for r in all_reviews if r.reviewer_type == 'hr']
-    avg_tech = sum(tech_scores)/len(tech_scores) if tech_scores else 0
-    avg_hr = sum(hr_scores)/len(hr_scores) if hr_scores else 0
+    avg_tech = sum(tech_scores) / len(tech_scores) if tech_scores else 0
+    avg_hr = sum(hr_scores) / len(hr_scores) if hr_scores else 0
     if avg_tech >= 70 and avg_hr >= 70:
-        app_rec.status = "Selected"
+        set_application_status(app_rec, "Selected")
     elif avg_tech >= 60 and avg_hr >= 60:
-        app_rec.status = "HR Checked"
+        set_application_status(app_rec, "HR Checked")
     elif avg_tech >= 60:
-        app_rec.status = "Technical Checked"
+        set_application_status(app_rec, "Technical Checked")
     elif all_reviews:
-        app_rec.status = "Shortlisted"
+        set_application_status(app_rec, "Shortlisted")
     db.session.commit()
-    flash("Review submitted", "success")
-    return redirect(url_for('applicants', job_id=request.form['job_id']))
 
-# ===== Hiring Funnel Automation =====
 def auto_update_funnel(app_id):
     app = Application.query.get(app_id)
     profile = CandidateProfile.query.filter_by(user_id=app.candidate_id).first()
-    if not profile:
+    # Once reviewers have scored an application its status follows the reviews, not the profile
+    if not profile or Review.query.filter_by(application_id=app.id).first():
         return
     if profile.tech_score >= 70 and profile.comm_score >= 70:
-        app.status = "Selected"
+        set_application_status(app, "Selected")
     elif profile.tech_score >= 60 and profile.comm_score >= 60:
-        app.status = "HR Checked"
+        set_application_status(app, "HR Checked")
     elif profile.tech_score >= 60:
-        app.status = "Technical Checked"
+        set_application_status(app, "Technical Checked")
     elif profile.tech_score > 0:
-        app.status = "Shortlisted"
+        set_application_status(app, "Shortlisted")
+    db.session.commit()
+
+def bulk_update_funnel(candidate_ids):
+    """Set-based auto_update_funnel for every unreviewed application of the given candidates."""
+    if not candidate_ids:
+        return
+    new_status = case(
+        ((CandidateProfile.tech_score >= 70) & (CandidateProfile.comm_score >= 70), "Selected"),
+        ((CandidateProfile.tech_score >= 60) & (CandidateProfile.comm_score >= 60), "HR Checked"),
+        (CandidateProfile.tech_score >= 60, "Technical Checked"),
+        (CandidateProfile.tech_score > 0, "Shortlisted"),
+        else_=Application.status,
+    )
+    # Select only the rows whose status actually changes so they can be recorded in the history
+    changes = (
+        db.session.query(Application.id, Application.job_id, Application.status, new_status, Application.status_changed_at)
+        .join(CandidateProfile, CandidateProfile.user_id == Application.candidate_id)
+        .filter(Application.candidate_id.in_(candidate_ids))
+        .filter(~exists().where(Review.application_id == Application.id))
+        .filter(new_status != Application.status)
+        .all()
+    )
+    if not changes:
+        return
+    now = dt.utcnow()
+    record_status_changes([(a_id, job_id, old, new, since) for a_id, job_id, old, new, since in changes], now)
+    db.session.execute(update(Application), [
+        {'id': a_id, 'status': new, 'status_changed_at': now} for a_id, _, _, new, _ in changes
+    ])
     db.session.commit()
 
 # ===== Dashboards =====
-@app.route('/leaderboard')
-def leaderboard():
-    skill = request.args.get('skill', '').strip()
-    query = CandidateProfile.query
+def top_candidates(limit=50, skill=''):
+    """Profiles ordered by the indexed composite score, with a dense rank computed in SQL."""
+    rank = func.dense_rank().over(order_by=CandidateProfile.composite_score.desc()).label('rank')
+    query = db.session.query(CandidateProfile, User.email, rank).join(User, User.id == CandidateProfile.user_id)
     if skill:
         query = query.filter(CandidateProfile.extracted_skills.ilike(f"%{skill}%"))
-    profiles = query.order_by(CandidateProfile.tech_score.desc()).limit(50).all()
-    candidates = []
-    for p in profiles:
-        user = User.query.get(p.user_id)
-        candidates.append({
-            'email': user.email,
-            'tech_score': p.tech_score,
-            'skills': p.extracted_skills
-        })
-    return render_template('leaderboard.html', candidates=candidates, skill=skill)
+    return query.order_by(CandidateProfile.composite_score.desc(), CandidateProfile.id).limit(limit).all()
 
-@app.route('/feedback/<int:job_id>')
+@bp.route('/leaderboard')
+def leaderboard():
+    skill = request.args.get('skill', '').strip()
+    def build():
+        candidates = []
+        for p, email, rank in top_candidates(50, skill):
+            candidates.append({
+                'rank': rank,
+                'email': email,
+                'tech_score': p.tech_score,
+                'comm_score': p.comm_score,
+                'composite_score': p.composite_score,
+                'skills': p.extracted_skills
+            })
+        return candidates
+    return cached_view('leaderboard', skill.lower(), ('candidate_profile',), build,
+                       lambda candidates: render_template('leaderboard.html', candidates=candidates, skill=skill))
+
+@bp.route('/feedback/<int:job_id>')
 def feedback_view(job_id):
     job = Job.query.get(job_id)
     if not job or job.recruiter_id != session.get('user_id'):
         flash("Unauthorized to view feedback for this job.", "error")
-        return redirect(url_for('dashboard'))
-    apps = Application.query.filter_by(job_id=job_id).all()
-    data = []
-    for app in apps:
-        user = User.query.get(app.candidate_id)
-        reviews = Review.query.filter_by(application_id=app.id).all()
-        data.append({
-            'candidate': user.email,
-            'status': app.status,
-            'reviews': reviews
+        return redirect(url_for('portal.dashboard'))
+    def build():
+        data = []
+        # Hot rows first, then anything moved to the archive
+        sources = [(Application, Review, False), (ArchivedApplication, ArchivedReview, True)]
+        for app_model, review_model, archived in sources:
+            for app in app_model.query.filter_by(job_id=job_id).all():
+                user = User.query.get(app.candidate_id)
+                reviews = review_model.query.filter_by(application_id=app.id).all()
+                data.append({
+                    'candidate': user.email,
+                    'status': app.status,
+                    'archived': archived,
+                    'reviews': [{'reviewer_type': r.reviewer_type, 'score': r.score, 'comment': r.comment} for r in reviews]
+                })
+        return data
+    return cached_view('feedback', job_id, ('application', 'review'), build,
+                       lambda data: render_template('feedback.html', job=job, data=data))
+
+def job_funnel(job_id):
+    """Funnel stats for one job from the summary table: one row per stage, no application scan."""
+    rows = {r.stage: r for r in JobFunnelStage.query.filter_by(job_id=job_id).all()}
+    applied = rows["Applied"].entered if "Applied" in rows else 0
+    stages = []
+    for stage in FUNNEL_STAGES:
+        r = rows.get(stage)
+        entered = r.entered if r else 0
+        exited = r.exited if r else 0
+        stages.append({
+            'stage': stage,
+            'entered': entered,
+            'current': r.current if r else 0,
+            'exited': exited,
+            'conversion': round(entered / applied, 3) if applied else 0.0,
+            'avg_days_in_stage': round(r.seconds_in_stage / exited / 86400.0, 2) if exited else None,
         })
-    return render_template('feedback.html', job=job, data=data)
+    return stages
+
+@bp.route('/analytics/<int:job_id>')
+def job_analytics(job_id):
+    job = Job.query.get(job_id)
+    if not job or job.recruiter_id != session.get('user_id'):
+        flash("Unauthorized to view analytics for this job.", "error")
+        return redirect(url_for('portal.dashboard'))
+    return render_template('analytics.html', job=job, stages=job_funnel(job_id))
+
+@bp.route('/analytics/<int:job_id>.json')
+def job_analytics_json(job_id):
+    job = Job.query.get(job_id)
+    if not job or job.recruiter_id != session.get('user_id'):
+        return jsonify({"error": "Unauthorized"}), 403
+    return jsonify({"job_id": job.id, "title": job.title, "stages": job_funnel(job_id)})
+
+# ===== Candidate Export =====
+EXPORT_FORMATS = {'csv': 'text/csv', 'csv.gz': 'application/gzip'}
 
-@app.route('/export/candidates.csv')
+EXPORT_TABLES = ('user', 'candidate_profile', 'application', 'review')
+
+def export_etag(stamp, fmt):
+    return f"candidates-{stamp}.{fmt}"
+
+def send_export_artifact(job):
+    # Validators come from the data version the artifact was built from, so a
+    # re-download of unchanged data is a 304 even across rebuilt artifacts.
+    resp = send_file(job.path, mimetype=EXPORT_FORMATS[job.fmt], as_attachment=True,
+                     download_name=f'candidates_export_{dt.utcnow().strftime("%Y%m%d")}.{job.fmt}',
+                     etag=export_etag(job.stamp, job.fmt), last_modified=job.finished_at, max_age=0)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
+
+@bp.route('/export/candidates.csv')
 def export_candidates_csv():
+    """Serve the export for the current data version, starting a background job if it isn't built yet."""
     if session.get('role') != 'recruiter':
         flash("Recruiters only. Please log in as a recruiter.", "error")
-        return redirect(url_for('dashboard'))
-
-    users = User.query.filter_by(role='candidate').all()
-
-    # Build dataset
-    data = []
-    for u in users:
-        p = CandidateProfile.query.filter_by(user_id=u.id).first()
-        tech = float(p.tech_score) if p and p.tech_score is not None else 0.0
-        comm = float(p.comm_score) if p and p.comm_score is not None else 0.0
-        composite = round((tech + comm) / 2.0, 2)
-
-        resume_filename = "Not uploaded"
-        resume_text = ""
-        if p and p.resume_path and os.path.exists(p.resume_path):
-            resume_filename = os.path.basename(p.resume_path)
-            try:
-                resume_text = extract_text_from_pdf(p.resume_path) or ""
-            except Exception:
-                resume_text = ""
-
-        # Try to extract phone from resume text
-        phone = ""
-        if resume_text:
-            m = re.search(r'(\+?\d[\d \-\(\)]{7,}\d)', resume_text)
-            if m:
-                phone = m.group(1).strip()
-
-        # Leadership inference from resume
-        leadership = ""
-        if resume_text:
-            t = resume_text.lower()
-            indicators = ['team lead', 'lead developer', 'led ', 'lead ', 'managed', 'manager', 'mentored', 'supervised', 'head of']
-            leadership = "Yes" if any(ind in t for ind in indicators) else "No"
-
-        # Applications summary
-        apps = Application.query.filter_by(candidate_id=u.id).order_by(Application.created_at.desc()).all()
-        num_jobs = len({a.job_id for a in apps}) if apps else 0
-        current_status = apps[0].status if apps else "Applied"
-
-        # Latest review across all applications (by highest ID)
-        latest_review = ""
-        if apps:
-            app_ids = [a.id for a in apps]
-            r = Review.query.filter(Review.application_id.in_(app_ids)).order_by(Review.id.desc()).first()
-            if r:
-                snippet = (r.comment or "").strip().replace('\n', ' ')
-                if len(snippet) > 100:
-                    snippet = snippet[:100] + "..."
-                latest_review = f"{r.reviewer_type.upper()} {int(r.score) if r.score is not None else ''}: {snippet}"
-
-        linkedin = p.linkedin_url if p and p.linkedin_url else ""
-        github = p.github_url if p and p.github_url else ""
-        merged_skills = p.extracted_skills if p and p.extracted_skills else ""
-
-        # Placeholders for fields not stored separately
-        manual_skills = ""
-        ai_skills = ""
-        candidate_name = ""
-
-        data.append({
-            "name": candidate_name,
-            "email": u.email,
-            "phone": phone,
-            "linkedin": linkedin,
-            "github": github,
-            "resume": resume_filename,
-            "manual_skills": manual_skills,
-            "ai_skills": ai_skills,
-            "merged_skills": merged_skills,
-            "tech_score": tech,
-            "comm_score": comm,
-            "composite": composite,
-            "status": current_status,
-            "num_jobs": num_jobs,
-            "latest_review": latest_review,
-        })
-
-    # Dense ranking based on composite score (desc)
-    scores = sorted({row["composite"] for row in data}, reverse=True)
-    rank_map = {score: idx + 1 for idx, score in enumerate(scores)}
-    for row in data:
-        row["rank"] = rank_map[row["composite"]]
-
-    # Sort by composite desc for output
-    data.sort(key=lambda r: r["composite"], reverse=True)
-
-    # Generate CSV
-    output = io.StringIO(newline='')
-    writer = csv.writer(output)
-    writer.writerow([
-        "Candidate Name",
-        "Email",
-        "Phone",
-        "LinkedIn URL",
-        "GitHub URL",
-        "Uploaded Resume Filename",
-        "Manual Skills",
-        "AI-Extracted Skills",
-        "Merged & Deduplicated Skills",
-        "GitHub Technical Score",
-        "Communication Score",
-        "Total Composite Score",
-        "Overall Rank",
-        "Current Application Status",
-        "Number of Jobs Applied",
-        "Latest Interview Review"
-    ])
-
-    for row in data:
-        writer.writerow([
-            row["name"],
-            row["email"],
-            row["phone"],
-            row["linkedin"],
-            row["github"],
-            row["resume"],
-            row["manual_skills"] or "",
-            row["ai_skills"] or "",
-            row["merged_skills"] or "",
-            row["tech_score"],
-            row["comm_score"],
-            row["composite"],
-            row["rank"],
-            row["status"],
-            row["num_jobs"],
-            row["latest_review"]
-        ])
-
-    csv_data = output.getvalue()
-    response = Response(csv_data, mimetype='text/csv')
-    response.headers['Content-Disposition'] = f'attachment; filename=candidates_export_{dt.utcnow().strftime("%Y%m%d")}.csv'
+        return redirect(url_for('portal.dashboard'))
+    fmt = 'csv.gz' if request.args.get('compress') else 'csv'
+    versions, last_modified = data_version_stamp(*EXPORT_TABLES)
+    stamp = "-".join(str(v) for v in versions)
+    # Client already holds this data version: answer before touching export jobs
+    resp = not_modified(export_etag(stamp, fmt), last_modified)
+    if resp:
+        return resp
+    job = start_export_job(current_app._get_current_object(), stamp, fmt,
+                           current_app.config['EXPORT_FOLDER'], current_app.config['EXPORT_JOB_STALE_AFTER'])
+    if job.status == 'done':
+        return send_export_artifact(job)
+    return redirect(url_for('portal.export_job_status', job_id=job.id))
+
+@bp.route('/export/jobs/<int:job_id>')
+def export_job_status(job_id):
+    if session.get('role') != 'recruiter':
+        flash("Recruiters only. Please log in as a recruiter.", "error")
+        return redirect(url_for('portal.dashboard'))
+    job = ExportJob.query.get_or_404(job_id)
+    info = {
+        "id": job.id,
+        "status": job.status,
+        "format": job.fmt,
+        "processed": job.processed,
+        "total": job.total,
+        "error": job.error,
+        "download_url": url_for('portal.export_job_download', job_id=job.id) if job.status == 'done' else None,
+    }
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(info)
+    return render_template('export_status.html', job=info)
+
+@bp.route('/export/jobs/<int:job_id>/download')
+def export_job_download(job_id):
+    if session.get('role') != 'recruiter':
+        flash("Recruiters only. Please log in as a recruiter.", "error")
+        return redirect(url_for('portal.dashboard'))
+    job = ExportJob.query.get_or_404(job_id)
+    if job.status != 'done' or not os.path.exists(job.path):
+        flash("This export is no longer available. Starting a fresh one.", "error")
+        return redirect(url_for('portal.export_candidates_csv', compress=1 if job.fmt == 'csv.gz' else None))
+    return send_export_artifact(job)
+
+def next_watermark():
+    """Watermark for the next changes sync, moved back by EXPORT_WATERMARK_OVERLAP.
+
+    updated_at is stamped at flush, before commit, so a row from a transaction
+    still in flight when the export reads can carry an older timestamp than
+    the read. The overlap re-sends such rows; consumers dedupe by id.
+    """
+    return (dt.utcnow() - current_app.config['EXPORT_WATERMARK_OVERLAP']).isoformat() + 'Z'
+
+def parse_watermark(value):
+    """ISO-8601 timestamp -> naive UTC datetime (the format of updated_at columns)."""
+    ts = dt.fromisoformat(value.replace('Z', '+00:00'))
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+@bp.route('/export/candidates/changes')
+def export_candidate_changes():
+    """Rows for candidates changed after ?since=<ISO timestamp>, as CSV or NDJSON (?format=ndjson).
+
+    The X-Export-Watermark response header is the value to pass as `since`
+    on the next sync. Without `since` every candidate is returned.
+    """
+    token = request.headers.get('X-Export-Token', '')
+    export_token = current_app.config['EXPORT_TOKEN']
+    if session.get('role') != 'recruiter' and not (export_token and token == export_token):
+        return jsonify({"error": "Unauthorized"}), 401
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+    since = None
+    if request.args.get('since'):
+        try:
+            since = parse_watermark(request.args['since'])
+        except ValueError:
+            return jsonify({"error": "since must be an ISO-8601 timestamp"}), 400
+    # Taken before reading, so rows written during the export are picked up next time
+    watermark = next_watermark()
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = Response(stream_with_context(iter_changed_rows(since, fmt)), mimetype=mimetype)
+    response.headers['X-Export-Watermark'] = watermark
+    response.headers['Content-Disposition'] = f'attachment; filename=candidates_changes_{dt.utcnow().strftime("%Y%m%dT%H%M%S")}.{fmt}'
     return response
 
+# ===== Scheduled Jobs =====
+@bp.cli.command('refresh-github-scores')
+@click.option('--batch-size', default=20, show_default=True, help="Profiles per batch.")
+@click.option('--pause', default=5.0, show_default=True, help="Seconds to sleep between batches.")
+@click.option('--stale-hours', default=24.0, show_default=True, help="Skip profiles refreshed more recently than this.")
+@click.option('--max-batches', default=0, show_default=True, help="Stop after N batches (0 = until done).")
+def refresh_github_scores(batch_size, pause, stale_hours, max_batches):
+    """Recompute GitHub tech scores, oldest refresh first.
+
+    Progress is stored in github_refreshed_at after every batch, so an
+    interrupted or rate-limited run resumes where it stopped. Meant to be
+    run from cron (e.g. hourly). Profiles whose fetch fails keep their score
+    and are retried on the next run.
+    """
+    cutoff = dt.utcnow() - timedelta(hours=stale_hours)
+    batches = 0
+    refreshed = 0
+    failed = set()  # ids whose fetch failed; still stale, so skipped explicitly for the rest of this run
+    while not max_batches or batches < max_batches:
+        profiles = (
+            CandidateProfile.query
+            .filter(CandidateProfile.github_url.isnot(None), CandidateProfile.github_url != '')
+            .filter(or_(CandidateProfile.github_refreshed_at.is_(None), CandidateProfile.github_refreshed_at < cutoff))
+            .filter(CandidateProfile.id.notin_(failed))
+            .order_by(CandidateProfile.github_refreshed_at.asc().nulls_first(), CandidateProfile.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not profiles:
+            break
+        rows = []
+        changed = []
+        rate_limited = False
+        for p in profiles:
+            # Wait at most one pause for a token so a run never stalls for an hour
+            gh = analyze_github(p.github_url, etag=p.github_etag, max_wait=pause)
+            if gh['rate_limited']:
+                rate_limited = True
+                break
+            if gh['error']:
+                # Leave score, ETag and github_refreshed_at alone so the next run retries it
+                failed.add(p.id)
+                continue
+            row = {'id': p.id, 'github_refreshed_at': dt.utcnow()}
+            if not gh['not_modified']:
+                row['github_etag'] = gh['etag']
+                if gh['tech_score'] != p.tech_score:
+                    row['tech_score'] = gh['tech_score']
+                    row['composite_score'] = composite_score(gh['tech_score'], p.comm_score)
+                    changed.append(p.user_id)
+            rows.append(row)
+        if rows:
+            # Rows have different key sets, so group them for executemany
+            groups = {}
+            for row in rows:
+                groups.setdefault(tuple(sorted(row)), []).append(row)
+            for group in groups.values():
+                db.session.execute(update(CandidateProfile), group)
+            db.session.commit()
+            bulk_update_funnel(changed)
+            refreshed += len(rows)
+        batches += 1
+        if rate_limited:
+            click.echo("GitHub rate limit reached; stopping. Re-run to resume.")
+            break
+        time.sleep(pause)
+    click.echo(f"Refreshed {refreshed} profile(s) in {batches} batch(es); {len(failed)} failed and will be retried.")
+
+@bp.cli.command('export-changes')
+@click.option('--since', default=None, help="ISO-8601 watermark from the previous run; omit for a full export.")
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), default='ndjson', show_default=True)
+@click.option('--output', type=click.File('w', encoding='utf-8'), default='-', help="Output file (default stdout).")
+def export_changes(since, fmt, output):
+    """Write candidates changed since a watermark; prints the next watermark to stderr."""
+    watermark = next_watermark()
+    for chunk in iter_changed_rows(parse_watermark(since) if since else None, fmt):
+        output.write(chunk)
+    click.echo(f"watermark={watermark}", err=True)
+
+@bp.cli.command('archive-applications')
+@click.option('--days', default=180, show_default=True, help="Archive jobs closed more than this many days ago.")
+@click.option('--batch-size', default=500, show_default=True, help="Applications moved per transaction.")
+@click.option('--vacuum/--no-vacuum', default=False, help="VACUUM the hot database afterwards to return freed pages.")
+def archive_applications(days, batch_size, vacuum):
+    """Move applications and reviews of jobs closed before the cutoff into the archive database.
+
+    Open jobs are never archived. Rows are copied to the archive and
+    committed before they are deleted from the hot tables; rows left in both
+    by an interrupted run are recognised and only deleted on the next run.
+    Any other id already present in the archive is a conflict and stops the
+    run instead of overwriting the archived row.
+    """
+    cutoff = dt.utcnow() - timedelta(days=days)
+    closed = db.session.query(Job.id).filter(Job.closed_at.isnot(None), Job.closed_at < cutoff)
+    job_ids = {j for (j,) in closed.all()}
+    moved_apps = moved_reviews = 0
+    while job_ids:
+        apps = Application.query.filter(Application.job_id.in_(job_ids)).order_by(Application.id).limit(batch_size).all()
+        if not apps:
+            break
+        app_ids = [a.id for a in apps]
+        reviews = Review.query.filter(Review.application_id.in_(app_ids)).all()
+        # Copies from an interrupted run match the hot row; anything else means a reused id
+        copied = {a.id: a for a in ArchivedApplication.query.filter(ArchivedApplication.id.in_(app_ids))}
+        copied_reviews = {r.id: r for r in ArchivedReview.query.filter(ArchivedReview.id.in_([r.id for r in reviews]))}
+        for a in apps:
+            c = copied.get(a.id)
+            if c and (c.candidate_id, c.job_id, c.created_at) != (a.candidate_id, a.job_id, a.created_at):
+                raise click.ClickException(f"Application id {a.id} is already archived for a different application.")
+        for r in reviews:
+            c = copied_reviews.get(r.id)
+            if c and c.application_id != r.application_id:
+                raise click.ClickException(f"Review id {r.id} is already archived for a different application.")
+        now = dt.utcnow()
+        new_apps = [a for a in apps if a.id not in copied]
+        new_reviews = [r for r in reviews if r.id not in copied_reviews]
+        if new_apps:
+            db.session.execute(insert(ArchivedApplication), [
+                {'id': a.id, 'candidate_id': a.candidate_id, 'job_id': a.job_id, 'status': a.status,
+                 'created_at': a.created_at, 'status_changed_at': a.status_changed_at,
+                 'updated_at': a.updated_at, 'archived_at': now}
+                for a in new_apps
+            ])
+        if new_reviews:
+            db.session.execute(insert(ArchivedReview), [
+                {'id': r.id, 'application_id': r.application_id, 'reviewer_type': r.reviewer_type,
+                 'score': r.score, 'comment': r.comment, 'updated_at': r.updated_at, 'archived_at': now}
+                for r in new_reviews
+            ])
+        db.session.commit()
+        db.session.execute(delete(Review).where(Review.application_id.in_(app_ids)))
+        db.session.execute(delete(Application).where(Application.id.in_(app_ids)))
+        db.session.commit()
+        db.session.expunge_all()
+        moved_apps += len(apps)
+        moved_reviews += len(reviews)
+    if vacuum:
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+    click.echo(f"Archived {moved_apps} application(s) and {moved_reviews} review(s) for {len(job_ids)} closed job(s).")
+
+@bp.cli.command('init-db')
+def init_db():
+    """Create database tables (hot and archive). Run once per deploy, before starting workers."""
+    db.create_all()
+    click.echo("Database initialized.")
+
+@bp.cli.command('migrate-db')
+def migrate_db():
+    """Add columns and indexes missing from existing tables and backfill them (including the funnel).
+
+    Safe to run on every release.
+    """
+    added, rebuilt, backfilled = upgrade_schema()
+    for column in added:
+        click.echo(f"Added column {column}.")
+    for table in rebuilt:
+        click.echo(f"Rebuilt table {table} with AUTOINCREMENT ids.")
+    click.echo(f"Database schema up to date ({len(added)} column(s) added, {backfilled} row(s) backfilled).")
+    click.echo(f"Seeded funnel history for {backfill_funnel()} application(s).")
+
+@bp.cli.command('backfill-funnel')
+@click.option('--batch-size', default=500, show_default=True, help="Applications seeded per transaction.")
+def backfill_funnel_command(batch_size):
+    """Seed funnel counts and status_changed_at for applications without status history."""
+    click.echo(f"Seeded funnel history for {backfill_funnel(batch_size)} application(s).")
+
+# ===== App Factory =====
+def create_app(test_config=None):
+    # python-dotenv is only needed here, not on every import of the routes
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///jobportal.db'
+    app.config['SQLALCHEMY_BINDS'] = {'archive': 'sqlite:///jobportal_archive.db'}
+    app.config['SECRET_KEY'] = 'demo-secret-key-for-interview'
+    app.config['UPLOAD_FOLDER'] = 'uploads'
+    app.config['EXPORT_FOLDER'] = 'exports'
+    app.config['INTERVIEW_SECRET'] = os.getenv("INTERVIEW_SECRET", "")
+    app.config['EXPORT_TOKEN'] = os.getenv("EXPORT_TOKEN", "")
+    app.config['EXPORT_JOB_STALE_AFTER'] = timedelta(minutes=int(os.getenv("EXPORT_JOB_STALE_MINUTES", "15")))
+    app.config['EXPORT_WATERMARK_OVERLAP'] = timedelta(seconds=int(os.getenv("EXPORT_WATERMARK_OVERLAP_SECONDS", "120")))
+    app.config['CACHE_MAX_ENTRIES'] = int(os.getenv("CACHE_MAX_ENTRIES", "256"))
+    app.config['CACHE_SHARED_DB'] = os.getenv("CACHE_SHARED_DB", "")
+    app.config['COMPRESS_LEVEL'] = int(os.getenv("COMPRESS_LEVEL", "6"))
+    if test_config:
+        app.config.update(test_config)
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+    db.init_app(app)
+    app.extensions['view_cache'] = ViewCache(app.config['CACHE_MAX_ENTRIES'], app.config['CACHE_SHARED_DB'])
+    init_compression(app)
+    app.register_blueprint(bp)
+    return app
+
 if __name__ == '__main__':
+    app = create_app()
+    # Local development convenience; deployments run `flask --app app init-db` instead
+    with app.app_context():
+        db.create_all()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,69 @@
+"""Portal cold-start benchmark: module import, create_app(), and first request latency.
+
+Every sample runs in a fresh interpreter, the same way a gunicorn worker boots.
+Schema setup (`flask --app app init-db`) is a deploy step and is not timed.
+
+    python benchmarks/startup.py --runs 10
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE = r"""
+import json, os, sys, time
+sys.path.insert(0, {root!r})
+t0 = time.perf_counter()
+import app as portal
+t1 = time.perf_counter()
+application = portal.create_app({{'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + {db!r}}})
+t2 = time.perf_counter()
+with application.app_context():
+    portal.db.create_all()
+client = application.test_client()
+t3 = time.perf_counter()
+status = client.get('/login').status_code
+t4 = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (t1 - t0) * 1000,
+    'create_app_ms': (t2 - t1) * 1000,
+    'first_request_ms': (t4 - t3) * 1000,
+    'modules': len(sys.modules),
+    'status': status,
+}}))
+"""
+
+
+def run_sample(workdir):
+    db_path = os.path.join(workdir, "bench.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    code = SAMPLE.format(root=ROOT, db=db_path)
+    out = subprocess.run([sys.executable, "-c", code], cwd=workdir, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        run_sample(workdir)  # warm the OS file cache; not counted
+        samples = [run_sample(workdir) for _ in range(args.runs)]
+
+    print(f"{'metric':<18}{'median':>10}{'p90':>10}{'min':>10}")
+    for key in ("import_ms", "create_app_ms", "first_request_ms"):
+        values = sorted(s[key] for s in samples)
+        p90 = values[min(len(values) - 1, int(len(values) * 0.9))]
+        print(f"{key:<18}{statistics.median(values):>10.1f}{p90:>10.1f}{values[0]:>10.1f}")
+    print(f"modules loaded after first request: {samples[-1]['modules']}")
+
+
+if __name__ == "__main__":
+    main()
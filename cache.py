@@ -0,0 +1,94 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# Read-through cache for view data. Keys embed the data version stamps
+# (see models.DataVersion), so writes invalidate entries by changing the key;
+# stale entries are never read again and simply age out of the LRU.
+# Sizes come from app config (CACHE_MAX_ENTRIES, CACHE_SHARED_DB) in create_app.
+
+
+class LRUCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteCache:
+    """Cross-process tier: JSON values in a small SQLite table, newest rows kept."""
+
+    def __init__(self, path, max_rows=2000):
+        self.path = path
+        self.max_rows = max_rows
+        self._writes = 0
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored REAL NOT NULL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key):
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error:
+            return None
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value):
+        try:
+            with self._connect() as conn:
+                conn.execute("INSERT OR REPLACE INTO cache (key, value, stored) VALUES (?, ?, ?)",
+                             (key, json.dumps(value), time.time()))
+                self._writes += 1
+                if self._writes % 100 == 0:
+                    conn.execute("DELETE FROM cache WHERE key NOT IN "
+                                 "(SELECT key FROM cache ORDER BY stored DESC LIMIT ?)", (self.max_rows,))
+        except sqlite3.Error:
+            pass
+
+
+class ViewCache:
+    """In-process LRU in front of an optional shared SQLite tier (disabled when shared_path is empty)."""
+
+    def __init__(self, max_entries=256, shared_path=""):
+        self.local = LRUCache(max_entries)
+        self.shared = SQLiteCache(shared_path) if shared_path else None
+
+    def get_or_set(self, key, build):
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        if self.shared is not None:
+            value = self.shared.get(key)
+        if value is None:
+            value = build()
+            if self.shared is not None:
+                self.shared.set(key, value)
+        self.local.set(key, value)
+        return value
@@ -0,0 +1,131 @@
+import zlib
+from flask import request
+
+# Response compression for text-like responses (pages, JSON, CSV, NDJSON).
+# Negotiates br (when the optional `brotli` package is installed) or gzip from
+# Accept-Encoding. Buffered bodies are compressed in one go; streamed bodies
+# (generators, send_file) are compressed chunk by chunk and flushed every
+# COMPRESS_FLUSH_BYTES so clients still receive data progressively.
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/x-ndjson', 'application/javascript')
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def choose_encoding(accept_encodings):
+    """Best supported coding from the request's Accept-Encoding, or None for identity."""
+    options = []
+    if _brotli() is not None and accept_encodings['br']:
+        options.append((accept_encodings['br'], 1, 'br'))
+    if accept_encodings['gzip']:
+        options.append((accept_encodings['gzip'], 0, 'gzip'))
+    if not options:
+        return None
+    # Highest q-value wins; br breaks ties
+    return max(options)[2]
+
+
+class _GzipCompressor:
+    def __init__(self, level):
+        # wbits=31: gzip container instead of raw zlib
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._z.compress(data)
+
+    def flush(self):
+        return self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._z.flush(zlib.Z_FINISH)
+
+
+class _BrotliCompressor:
+    def __init__(self, level):
+        brotli = _brotli()
+        self._c = brotli.Compressor(quality=min(level, 11))
+
+    def compress(self, data):
+        return self._c.process(data)
+
+    def flush(self):
+        return self._c.flush()
+
+    def finish(self):
+        return self._c.finish()
+
+
+def _compressor(encoding, level):
+    return _BrotliCompressor(level) if encoding == 'br' else _GzipCompressor(level)
+
+
+def _compress_stream(chunks, compressor, flush_bytes):
+    pending = 0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            out = compressor.compress(chunk)
+            pending += len(chunk)
+            if pending >= flush_bytes:
+                out += compressor.flush()
+                pending = 0
+            if out:
+                yield out
+        yield compressor.finish()
+    finally:
+        # Releases the file handle of send_file responses
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def _is_compressible(response):
+    mimetype = response.mimetype or ''
+    return mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def compress_response(response, request, config):
+    if not _is_compressible(response):
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or request.method == 'HEAD'
+            or 'Content-Encoding' in response.headers or 'Range' in request.headers):
+        return response
+    streamed = response.direct_passthrough or not response.is_sequence
+    if not streamed and response.content_length is not None and response.content_length < config['COMPRESS_MIN_SIZE']:
+        return response
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    compressor = _compressor(encoding, config['COMPRESS_LEVEL'])
+    if streamed:
+        response.response = _compress_stream(response.response, compressor, config['COMPRESS_FLUSH_BYTES'])
+        response.direct_passthrough = False
+        response.headers.pop('Content-Length', None)
+        response.headers.pop('Accept-Ranges', None)
+    else:
+        response.set_data(compressor.compress(response.get_data()) + compressor.finish())
+    response.headers['Content-Encoding'] = encoding
+    # The encoded bytes differ from the identity body, so a strong validator
+    # would be wrong; a weak one still matches If-None-Match (weak comparison).
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    app.config.setdefault('COMPRESS_LEVEL', 6)
+    app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+    app.config.setdefault('COMPRESS_FLUSH_BYTES', 16 * 1024)
+
+    @app.after_request
+    def _compress(response):
+        return compress_response(response, request, app.config)
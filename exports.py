@@ -0,0 +1,296 @@
+import os
+import re
+import io
+import csv
+import gzip
+import json
+import tempfile
+import threading
+from datetime import datetime
+from sqlalchemy import distinct, func, select, union, update
+from sqlalchemy.orm import aliased
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, User, CandidateProfile, Application, Review, ArchivedApplication, ArchivedReview, ExportJob
+from utils import extract_text_from_pdf
+
+CSV_HEADER = [
+    "Candidate Name",
+    "Email",
+    "Phone",
+    "LinkedIn URL",
+    "GitHub URL",
+    "Uploaded Resume Filename",
+    "Manual Skills",
+    "AI-Extracted Skills",
+    "Merged & Deduplicated Skills",
+    "GitHub Technical Score",
+    "Communication Score",
+    "Total Composite Score",
+    "Overall Rank",
+    "Current Application Status",
+    "Number of Jobs Applied",
+    "Latest Interview Review"
+]
+
+def ranked_candidates_query(candidate_ids=None):
+    """Candidates in composite order with a dense rank computed in SQL.
+
+    The rank is always over all candidates; `candidate_ids` only limits
+    which rows are returned. For a subset the rank is counted per row
+    (distinct higher composite scores, an index range scan) instead of
+    ranking every candidate.
+    """
+    composite_col = func.coalesce(CandidateProfile.composite_score, 0.0)
+    if candidate_ids is not None:
+        higher, higher_user = aliased(CandidateProfile), aliased(User)
+        rank = (
+            select(func.count(distinct(higher.composite_score)) + 1)
+            .join(higher_user, higher_user.id == higher.user_id)
+            .where(higher_user.role == 'candidate', higher.composite_score > composite_col)
+            .scalar_subquery()
+        )
+        return (
+            db.session.query(User, CandidateProfile, rank.label('rank'))
+            .outerjoin(CandidateProfile, CandidateProfile.user_id == User.id)
+            .filter(User.role == 'candidate', User.id.in_(candidate_ids))
+            .order_by(composite_col.desc(), User.id)
+        )
+    ranks = (
+        db.session.query(User.id.label('user_id'), func.dense_rank().over(order_by=composite_col.desc()).label('rank'))
+        .outerjoin(CandidateProfile, CandidateProfile.user_id == User.id)
+        .filter(User.role == 'candidate')
+        .subquery()
+    )
+    return (
+        db.session.query(User, CandidateProfile, ranks.c.rank)
+        .join(ranks, ranks.c.user_id == User.id)
+        .outerjoin(CandidateProfile, CandidateProfile.user_id == User.id)
+        .order_by(ranks.c.rank, User.id)
+    )
+
+def changed_candidate_ids(since):
+    """Candidates whose profile, applications or reviews changed after `since` (three indexed range scans)."""
+    return union(
+        select(CandidateProfile.user_id).where(CandidateProfile.updated_at > since),
+        select(Application.candidate_id).where(Application.updated_at > since),
+        select(Application.candidate_id)
+        .join(Review, Review.application_id == Application.id)
+        .where(Review.updated_at > since),
+    )
+
+def iter_changed_rows(since, fmt):
+    """Yield the changed-since export as CSV lines or newline-delimited JSON.
+
+    Rows are upserts: a candidate can appear in consecutive syncs (the
+    watermark overlaps), so consumers keep the latest row per id (email in
+    CSV). `rank` is as of this export; ranks of candidates that did not
+    change themselves are not re-sent, so order by composite score.
+    """
+    query = ranked_candidates_query(changed_candidate_ids(since) if since else None)
+    if fmt == 'csv':
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(CSV_HEADER)
+        yield buf.getvalue()
+    for u, p, rank in query.yield_per(200):
+        row = candidate_row(u, p, rank)
+        if fmt == 'csv':
+            buf = io.StringIO()
+            csv.writer(buf).writerow(csv_fields(row))
+            yield buf.getvalue()
+        else:
+            row["id"] = u.id
+            row["updated_at"] = p.updated_at.isoformat() if p and p.updated_at else None
+            yield json.dumps(row) + "\n"
+
+def candidate_row(u, p, rank):
+    tech = float(p.tech_score) if p and p.tech_score is not None else 0.0
+    comm = float(p.comm_score) if p and p.comm_score is not None else 0.0
+    composite = float(p.composite_score) if p and p.composite_score is not None else 0.0
+
+    resume_filename = "Not uploaded"
+    resume_text = ""
+    if p and p.resume_path and os.path.exists(p.resume_path):
+        resume_filename = os.path.basename(p.resume_path)
+        try:
+            resume_text = extract_text_from_pdf(p.resume_path) or ""
+        except Exception:
+            resume_text = ""
+
+    # Try to extract phone from resume text
+    phone = ""
+    if resume_text:
+        m = re.search(r'(\+?\d[\d \-\(\)]{7,}\d)', resume_text)
+        if m:
+            phone = m.group(1).strip()
+
+    # Applications summary (archived applications keep their ids, so they merge cleanly)
+    apps = Application.query.filter_by(candidate_id=u.id).order_by(Application.created_at.desc()).all()
+    archived = (ArchivedApplication.query.filter_by(candidate_id=u.id)
+                .order_by(ArchivedApplication.created_at.desc()).all())
+    num_jobs = len({a.job_id for a in apps + archived})
+    current_status = (apps or archived)[0].status if (apps or archived) else "Applied"
+
+    # Latest review across all applications (by highest ID)
+    latest_review = ""
+    reviews = []
+    if apps:
+        reviews.append(Review.query.filter(Review.application_id.in_([a.id for a in apps]))
+                       .order_by(Review.id.desc()).first())
+    if archived:
+        reviews.append(ArchivedReview.query.filter(ArchivedReview.application_id.in_([a.id for a in archived]))
+                       .order_by(ArchivedReview.id.desc()).first())
+    reviews = [r for r in reviews if r]
+    if reviews:
+        r = max(reviews, key=lambda rv: rv.id)
+        snippet = (r.comment or "").strip().replace('\n', ' ')
+        if len(snippet) > 100:
+            snippet = snippet[:100] + "..."
+        latest_review = f"{r.reviewer_type.upper()} {int(r.score) if r.score is not None else ''}: {snippet}"
+
+    return {
+        # Placeholders for fields not stored separately
+        "name": "",
+        "email": u.email,
+        "phone": phone,
+        "linkedin": p.linkedin_url if p and p.linkedin_url else "",
+        "github": p.github_url if p and p.github_url else "",
+        "resume": resume_filename,
+        "manual_skills": "",
+        "ai_skills": "",
+        "merged_skills": p.extracted_skills if p and p.extracted_skills else "",
+        "tech_score": tech,
+        "comm_score": comm,
+        "composite": composite,
+        "rank": rank,
+        "status": current_status,
+        "num_jobs": num_jobs,
+        "latest_review": latest_review,
+    }
+
+def csv_fields(row):
+    return [
+        row["name"],
+        row["email"],
+        row["phone"],
+        row["linkedin"],
+        row["github"],
+        row["resume"],
+        row["manual_skills"] or "",
+        row["ai_skills"] or "",
+        row["merged_skills"] or "",
+        row["tech_score"],
+        row["comm_score"],
+        row["composite"],
+        row["rank"],
+        row["status"],
+        row["num_jobs"],
+        row["latest_review"]
+    ]
+
+def artifact_path(folder, stamp, fmt):
+    return os.path.abspath(os.path.join(folder, f"candidates_{stamp}.{fmt}"))
+
+def write_candidates_export(path, fmt, on_progress=None):
+    """Write every candidate row to `path` (plain or gzip CSV), replacing it atomically."""
+    rows = ranked_candidates_query().all()
+    total = len(rows)
+    # Unique temp file in the target directory, so overlapping builds never share one
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    os.close(fd)
+    opener = gzip.open if fmt == 'csv.gz' else open
+    try:
+        with opener(tmp_path, 'wt', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_HEADER)
+            for i, (u, p, rank) in enumerate(rows, 1):
+                writer.writerow(csv_fields(candidate_row(u, p, rank)))
+                if on_progress and (i % 50 == 0 or i == total):
+                    on_progress(i, total)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return total
+
+class ExportJobReaped(Exception):
+    """The job was marked failed as stale and another worker may have taken over its key."""
+
+def run_export_job(app, job_id):
+    """Thread target: build the artifact for an ExportJob and record progress on the row.
+
+    Every write is conditional on the job still holding its active_key, so a job
+    reaped as stale stops at its next progress update and never overwrites the
+    failed status.
+    """
+    with app.app_context():
+        job = ExportJob.query.get(job_id)
+        key = job.active_key
+        if key is None:
+            return  # reaped before this thread started
+
+        def update_job(**values):
+            # Own connection: committing the session would expire every loaded row and re-SELECT it
+            with db.engine.begin() as conn:
+                return conn.execute(update(ExportJob.__table__)
+                                    .where(ExportJob.id == job_id, ExportJob.active_key == key)
+                                    .values(**values)).rowcount
+
+        def progress(done, total):
+            if not update_job(processed=done, total=total, heartbeat_at=datetime.utcnow()):
+                raise ExportJobReaped(job_id)
+
+        try:
+            if not update_job(status='running', heartbeat_at=datetime.utcnow()):
+                return
+            total = write_candidates_export(job.path, job.fmt, progress)
+            outcome = dict(status='done', processed=total, total=total)
+        except ExportJobReaped:
+            return
+        except Exception as e:
+            outcome = dict(status='failed', error=str(e)[:500])
+        finished = update_job(active_key=None, finished_at=datetime.utcnow(), **outcome)
+        if finished and outcome['status'] == 'done':
+            prune_artifacts(job)
+
+def prune_artifacts(latest):
+    """Drop artifacts of older finished jobs in the same format; only the newest stamp is served."""
+    old_jobs = ExportJob.query.filter(ExportJob.fmt == latest.fmt, ExportJob.status == 'done',
+                                      ExportJob.id != latest.id).all()
+    for old in old_jobs:
+        if old.path != latest.path and os.path.exists(old.path):
+            os.remove(old.path)
+        old.status = 'expired'
+    db.session.commit()
+
+def start_export_job(app, stamp, fmt, folder, stale_after):
+    """Return the ExportJob for this data version, reusing a finished or in-flight one."""
+    job = (ExportJob.query.filter_by(stamp=stamp, fmt=fmt, status='done')
+           .order_by(ExportJob.id.desc()).first())
+    if job and os.path.exists(job.path):
+        return job
+    key = f"{stamp}:{fmt}"
+    now = datetime.utcnow()
+    job = ExportJob.query.filter_by(active_key=key).first()
+    if job and now - (job.heartbeat_at or job.created_at) < stale_after:
+        return job
+    if job:
+        # A worker that died mid-export leaves its job running forever; release its key after stale_after
+        db.session.execute(update(ExportJob).where(ExportJob.id == job.id, ExportJob.active_key == key)
+                           .values(status='failed', error="No progress before the stale timeout",
+                                   active_key=None, finished_at=now))
+        db.session.commit()
+    os.makedirs(folder, exist_ok=True)
+    # Two requests for the same data version (double click, two workers) race here;
+    # the unique active_key lets exactly one insert win and both return its job
+    inserted = db.session.execute(
+        sqlite_insert(ExportJob)
+        .values(stamp=stamp, fmt=fmt, status='queued', path=artifact_path(folder, stamp, fmt), active_key=key)
+        .on_conflict_do_nothing(index_elements=['active_key'])
+    ).rowcount
+    db.session.commit()
+    job = (ExportJob.query.filter_by(active_key=key).first()
+           or ExportJob.query.filter_by(stamp=stamp, fmt=fmt).order_by(ExportJob.id.desc()).first())
+    if inserted:
+        threading.Thread(target=run_export_job, args=(app, job.id), daemon=True).start()
+    return job
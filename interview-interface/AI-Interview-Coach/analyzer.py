@@ -1,106 +1,106 @@
 from flask import Flask, request, jsonify
-from sentence_transformers import SentenceTransformer, util
-import json
 import os
 import re
+import time
+import threading
+
+from app.ai.embedding_protocol import EmbeddingClient
+from app.ai.embedding_store import cosine_rows
+from app.ai.model_artifacts import resolve_model_source
+from app.catalog import QuestionCatalog
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MAX_BATCH_ITEMS = 50
 app = Flask(__name__)
 
-print("Loading AI model...")
-model = SentenceTransformer('all-MiniLM-L6-v2')
-print("Model loaded.")
-
-with open(os.path.join(BASE_DIR, 'questions.json'), 'r', encoding='utf-8') as f:
-    questions_data = json.load(f)
-
-def find_ideal_answer(question_text):
-    for category in questions_data.values():
-        for q in category:
-            if q["question"] == question_text:
-                return q.get("ideal_answer", "")
-    return ""
-
-def contains_key_concepts(user_answer, ideal_answer):
-    key_terms = set()
-    lower_ideal = ideal_answer.lower()
-    
-    if "hash table" in lower_ideal:
-        key_terms.update(["hash", "bucket", "collision", "o(1)"])
-    elif "time complexity" in lower_ideal:
-        key_terms.update(["o(", "complexity", "runtime", "scale"])
-    elif "tcp" in lower_ideal or "udp" in lower_ideal:
-        key_terms.update(["tcp", "udp", "reliable", "connection", "speed"])
-    elif "recursion" in lower_ideal:
-        key_terms.update(["base case", "stack", "function calls", "iterative"])
-    elif "closure" in lower_ideal:
-        key_terms.update(["enclosing scope", "private", "function factory"])
-    elif "garbage collection" in lower_ideal:
-        key_terms.update(["reference counting", "memory", "cyclic", "free"])
-    elif "api gateway" in lower_ideal:
-        key_terms.update(["microservices", "routing", "authentication", "entry point"])
-    elif "cap theorem" in lower_ideal:
-        key_terms.update(["consistency", "availability", "partition tolerance"])
-    elif "authentication" in lower_ideal:
-        key_terms.update(["identity", "login", "authorization", "permissions"])
-    elif "global state" in lower_ideal:
-        key_terms.update(["mutable", "bug", "test", "pure function"])
-    elif "lazy loading" in lower_ideal:
-        key_terms.update(["delay", "performance", "memory", "initialize"])
-    elif "https" in lower_ideal:
-        key_terms.update(["tls", "ssl", "encrypt", "certificate", "man-in-the-middle"])
-    elif "process" in lower_ideal and "thread" in lower_ideal:
-        key_terms.update(["memory space", "isolation", "lightweight", "race condition"])
-    elif "sql query" in lower_ideal:
-        key_terms.update(["explain", "index", "slow query", "profiler"])
-    else:
-        key_terms = set(re.findall(r'\b\w{4,}\b', lower_ideal))
-    
+MODEL_NAME = 'all-MiniLM-L6-v2'
+MODEL_DIR = os.getenv('MODEL_DIR', os.path.join(BASE_DIR, '.cache', 'models', MODEL_NAME))
+MODEL_WAIT_SECONDS = 120
+
+# Filled in by the background loader; requests wait on `model_ready`
+encoder = None
+model_ready = threading.Event()
+model_error = None
+
+def load_encoder():
+    # With EMBEDDING_SOCKET set the shared embedding server owns the model
+    socket_path = os.getenv('EMBEDDING_SOCKET')
+    if socket_path:
+        print(f"Using embedding server at {socket_path}")
+        return EmbeddingClient(socket_path).encode
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(resolve_model_source(MODEL_NAME, MODEL_DIR))
+    return lambda texts: model.encode(texts, convert_to_numpy=True)
+
+def warm_up():
+    """Load the model off the import path, then run one encode so the first request is fast."""
+    global encoder, model_error
+    try:
+        started = time.perf_counter()
+        fn = load_encoder()
+        print(f"Model loaded in {(time.perf_counter() - started) * 1000:.0f} ms.")
+        started = time.perf_counter()
+        fn([entry.ideal_answer for entry in catalog.entries()[:8]] or ["warm-up"])
+        print(f"Warm-up encode took {(time.perf_counter() - started) * 1000:.0f} ms.")
+        encoder = fn
+        model_ready.set()
+    except Exception as e:
+        model_error = str(e)
+        print(f"Model warm-up failed: {e}")
+
+def encode(texts):
+    if not model_ready.wait(MODEL_WAIT_SECONDS):
+        raise RuntimeError(model_error or "Model is still loading.")
+    return encoder(texts)
+
+# Loaded once and indexed; reloads by itself when questions.json changes
+catalog = QuestionCatalog(os.path.join(BASE_DIR, 'questions.json'))
+
+print("Loading AI model in the background...")
+threading.Thread(target=warm_up, name="model-warmup", daemon=True).start()
+
+def contains_key_concepts(user_answer, key_terms):
     user_lower = user_answer.lower()
     matched = [term for term in key_terms if term in user_lower]
-    return matched, key_terms
-
-@app.route('/analyze', methods=['POST'])
-def analyze():
-    data = request.json
-    question = data.get('question', '').strip()
-    answer = data.get('answer', '').strip()
+    return matched, list(key_terms)
 
+def precheck(question, answer):
+    """(entry, None) when the answer needs embedding, else (None, final result)."""
     if not question or not answer:
-        return jsonify({"error": "Question and answer are required."}), 400
+        return None, {"error": "Question and answer are required."}
 
-    ideal = find_ideal_answer(question)
+    entry = catalog.get(question)
+    ideal = entry.ideal_answer if entry else ""
     if not ideal:
-        return jsonify({"score": 0, "feedback": "No reference answer found for this question."})
+        return None, {"score": 0, "feedback": "No reference answer found for this question."}
 
     word_count = len(answer.split())
     sentence_count = len([s for s in re.split(r'[.!?]+', answer) if s.strip()])
     if word_count < 25 or sentence_count < 2:
-        return jsonify({
+        return None, {
             "score": 1.5,
             "feedback": "⚠️ Your answer is too brief. Aim for at least 2-3 sentences (≈25+ words) covering core ideas, examples, and trade-offs."
-        })
+        }
+    return entry, None
 
-    embeddings = model.encode([answer, ideal, question], convert_to_tensor=True)
-    similarity = util.cos_sim(embeddings[0], embeddings[1]).item()
-    aq_sim = util.cos_sim(embeddings[0], embeddings[2]).item()
+def score_answer(question, answer, entry, similarity, aq_sim):
     if similarity < 0.20:
-        return jsonify({
+        return {
             "score": 2.0,
             "feedback": "❌ Your response appears off-topic. Please re-read the question and address it directly with relevant details."
-        })
+        }
 
     # Detect copying/echoing the question
     answer_tokens = set(re.findall(r'\b\w{3,}\b', answer.lower()))
     question_tokens = set(re.findall(r'\b\w{3,}\b', question.lower()))
     jaccard = (len(answer_tokens & question_tokens) / len(answer_tokens | question_tokens)) if (answer_tokens | question_tokens) else 0.0
     if aq_sim > 0.85 or jaccard > 0.6:
-        return jsonify({
+        return {
             "score": 1.8,
             "feedback": "❌ Your answer closely mirrors the question. Provide an explanatory response with definitions, key concepts, and examples."
-        })
+        }
 
-    matched_concepts, all_concepts = contains_key_concepts(answer, ideal)
+    matched_concepts, all_concepts = contains_key_concepts(answer, entry.key_terms)
     concept_coverage = len(matched_concepts) / len(all_concepts) if all_concepts else 0
 
     # Normalize similarity to reduce inflated scores for generic answers
@@ -128,13 +128,85 @@ def analyze():
     if total_score < 5.0:
         feedback += " Tip: Break the concept into smaller parts and explain each step."
 
-    return jsonify({
+    return {
         "score": total_score,
         "feedback": feedback,
         "matched_concepts": matched_concepts,
         "missing_concepts": missing,
         "concept_coverage": round(concept_coverage, 2)
+    }
+
+def analyze_pairs(pairs):
+    """Score (question, answer) pairs; one encode call covers every pair that needs the model."""
+    results = [None] * len(pairs)
+    pending = []
+    for i, (question, answer) in enumerate(pairs):
+        entry, result = precheck(question, answer)
+        if result is not None:
+            results[i] = result
+        else:
+            pending.append((i, entry))
+    if pending:
+        n = len(pending)
+        texts = ([pairs[i][1] for i, _ in pending]
+                 + [entry.ideal_answer for _, entry in pending]
+                 + [pairs[i][0] for i, _ in pending])
+        vectors = encode(texts)
+        answers, ideals, questions = vectors[:n], vectors[n:2 * n], vectors[2 * n:]
+        similarities = cosine_rows(answers, ideals)
+        aq_sims = cosine_rows(answers, questions)
+        for k, (i, entry) in enumerate(pending):
+            question, answer = pairs[i]
+            results[i] = score_answer(question, answer, entry,
+                                      float(similarities[k]), float(aq_sims[k]))
+    return results
+
+@app.route('/healthz')
+def healthz():
+    return jsonify({"status": "ok"})
+
+@app.route('/readyz')
+def readyz():
+    if model_ready.is_set():
+        return jsonify({"status": "ready"})
+    return jsonify({"status": "failed" if model_error else "loading", "error": model_error}), 503
+
+@app.route('/analyze', methods=['POST'])
+def analyze():
+    data = request.json
+    question = data.get('question', '').strip()
+    answer = data.get('answer', '').strip()
+
+    result = analyze_pairs([(question, answer)])[0]
+    if "error" in result:
+        return jsonify(result), 400
+    return jsonify(result)
+
+@app.route('/analyze-batch', methods=['POST'])
+def analyze_batch():
+    """Score a whole transcript: {"items": [{"question": ..., "answer": ...}, ...]}."""
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items or len(items) > MAX_BATCH_ITEMS:
+        error = f"items must be a list of 1-{MAX_BATCH_ITEMS} question/answer objects."
+        return jsonify({"error": error}), 400
+
+    pairs = []
+    for item in items:
+        item = item if isinstance(item, dict) else {}
+        pairs.append((str(item.get('question') or '').strip(),
+                      str(item.get('answer') or '').strip()))
+    results = analyze_pairs(pairs)
+    scores = [r["score"] for r in results if "error" not in r]
+    return jsonify({
+        "results": results,
+        "aggregate": {
+            "items": len(results),
+            "scored": len(scores),
+            "average_score": round(sum(scores) / len(scores), 2) if scores else 0.0,
+        }
     })
 
+
 if __name__ == '__main__':
     app.run(host='127.0.0.1', port=5000, debug=False)
\ No newline at end of file
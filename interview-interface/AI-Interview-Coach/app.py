@@ -1,11 +1,13 @@
 from flask import Flask, render_template, request, jsonify
 import json
 import random
-import requests
 import os
-from collections import defaultdict
 import uuid
 
+from app.analyzer_client import AnalyzerUnavailable, CircuitOpenError, analyzer_from_env
+from app.catalog import content_hash
+from app.progress_store import get_progress_store
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 app = Flask(
     __name__,
@@ -15,13 +17,20 @@ app = Flask(
 
 # URL of the AI analyzer service (System B)
 SYSTEM_B_URL = "http://127.0.0.1:5000/analyze"
+# Shared analyzer: pooled HTTP client to System B, or in-process with ANALYZER_TRANSPORT=inprocess
+analyzer = analyzer_from_env(os.getenv("SYSTEM_B_URL", SYSTEM_B_URL))
 
 # Load interview questions
 with open(os.path.join(BASE_DIR, "questions.json"), "r", encoding="utf-8") as f:
     questions_data = json.load(f)
 
-# In-memory user profiles (use a database like SQLite for persistence in production)
-user_profiles = {}
+# Progress records questions by content hash, so edits to questions.json never shift them
+question_keys = {category: [content_hash(q["question"], q.get("ideal_answer", "")) for q in items]
+                 for category, items in questions_data.items()}
+
+# User progress shared by all workers (SQLite by default; PROGRESS_STORE=memory keeps it
+# per process)
+progress_store = get_progress_store()
 
 # Simple stopword set for concept extraction from questions
 STOPWORDS = {
@@ -65,18 +74,16 @@ def thank_you():
 def dashboard():
     """User progress dashboard."""
     user_id = request.cookies.get('user_id')
-    if not user_id or user_id not in user_profiles:
+    progress = progress_store.load(user_id) if user_id else None
+    if progress is None:
         # No data → show empty but valid dashboard
         return render_template("dashboard.html", user_skills={}, weakest_concept=None, recommended_questions=[])
 
-    profile = user_profiles[user_id]
-    concept_scores = profile.get("concept_scores", defaultdict(list))
-    
-    # Calculate average scores per concept (only if scores exist)
+    # Average score per concept (only if scores exist)
     user_skills = {}
-    for concept, scores in concept_scores.items():
-        if scores:
-            avg_score = round(sum(scores) / len(scores), 1)
+    for concept, stats in progress.concepts.items():
+        if stats.count:
+            avg_score = round(stats.mean, 1)
             if avg_score > 0:  # Avoid zero-initialized scores
                 user_skills[concept] = avg_score
     
@@ -106,10 +113,7 @@ def dashboard():
 def get_question():
     """Fetch an adaptive question based on user's weakest area."""
     user_id = get_user_id()
-    if user_id not in user_profiles:
-        user_profiles[user_id] = {"concept_scores": defaultdict(list), "used_by_cat": {}, "last_question_by_cat": {}}
-    
-    profile = user_profiles[user_id]
+    progress = progress_store.ensure_user(user_id)
     category = request.json.get("category")
     
     if not category or category not in questions_data:
@@ -117,41 +121,35 @@ def get_question():
 
     all_questions = questions_data[category]
 
-    # Track used questions per category to avoid immediate repeats
-    used_by_cat = profile.setdefault("used_by_cat", {})
-    last_q_by_cat = profile.setdefault("last_question_by_cat", {})
-    used = set(used_by_cat.get(category, []))
+    all_keyed = list(zip(question_keys[category], all_questions))
 
-    # Build candidate pool excluding used questions
-    candidates = [q for q in all_questions if q["question"] not in used]
+    # Build candidate pool (key, question) excluding used questions
+    candidates = [(key, q) for key, q in all_keyed
+                  if not progress_store.has_used(progress, category, key)]
 
     # Avoid repeating the very last question if possible
-    last_q = last_q_by_cat.get(category)
-    if last_q and len(candidates) > 1:
-        candidates = [q for q in candidates if q["question"] != last_q] or candidates
+    if len(candidates) > 1:
+        candidates = [(key, q) for key, q in candidates
+                      if not progress_store.is_last(progress, category, key)] or candidates
 
     # If all questions have been used, reset and start fresh
-    if not candidates:
-        used_by_cat[category] = []
-        used = set()
-        candidates = list(all_questions)
+    reset = not candidates
+    if reset:
+        candidates = all_keyed
 
-    # Score candidates by user's weakest concepts first
+    # Score candidates by user's weakest concepts first (recent scores weigh most)
     scored_questions = []
-    for q in candidates:
-        concept = extract_concept(q["question"])
-        scores = profile["concept_scores"].get(concept, [5.0])  # Default to medium score
-        avg_score = sum(scores) / len(scores)
-        scored_questions.append((q, avg_score))
+    for key, q in candidates:
+        stats = progress.concepts.get(extract_concept(q["question"]))
+        scored_questions.append(((key, q), stats.ewma if stats else 5.0))  # Default to medium score
 
-    # Sort by lowest average score (target weaknesses) and choose randomly among the bottom 3
+    # Sort by lowest score (target weaknesses) and choose randomly among the bottom 3
     scored_questions.sort(key=lambda x: x[1])
     k = min(3, len(scored_questions))
-    selected = random.choice(scored_questions[:k])[0]
+    key, selected = random.choice(scored_questions[:k])[0]
 
     # Mark as used and remember last question for this category
-    used_by_cat.setdefault(category, []).append(selected["question"])
-    last_q_by_cat[category] = selected["question"]
+    progress_store.mark_used(user_id, category, key, reset=reset)
     
     # Set cookie to persist user session
     resp = jsonify({"question": selected["question"]})
@@ -170,27 +168,33 @@ def submit_answer():
 
     try:
         # Send to AI analyzer (System B)
-        response = requests.post(SYSTEM_B_URL, json={"question": question, "answer": answer}, timeout=15)
-        if response.status_code == 200:
-            result = response.json()
+        status, result = analyzer.post_json({"question": question, "answer": answer})
+        if status == 200:
             
             # Extract concept from question (same logic as in /get-question)
             concept = extract_concept(question)
             
             # Save score to user profile for adaptive learning
             user_id = request.cookies.get('user_id')
-            if user_id and user_id in user_profiles:
-                profile = user_profiles[user_id]
-                score = result.get("score", 0)
-                if isinstance(score, (int, float)) and score > 0:
-                    profile["concept_scores"][concept].append(float(score))
+            score = result.get("score", 0)
+            if user_id and isinstance(score, (int, float)) and score > 0:
+                progress_store.add_scores(user_id, [(concept, float(score))])
             
             return jsonify(result)
         else:
             return jsonify({"error": "Analysis service returned an error."}), 500
-    except Exception as e:
+    except CircuitOpenError as e:
+        resp = jsonify({"error": "AI analysis service is temporarily unavailable. "
+                                 "Please retry shortly."})
+        resp.headers["Retry-After"] = str(int(e.retry_after))
+        return resp, 503
+    except AnalyzerUnavailable:
         return jsonify({"error": "AI analysis service is unreachable. Please ensure analyzer.py is running."}), 500
 
+@app.route("/metrics")
+def metrics():
+    return jsonify({"analyzer_client": analyzer.stats(), "progress": progress_store.stats()})
+
 # --- Run App ---
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
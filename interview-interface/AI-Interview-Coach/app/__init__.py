@@ -1,9 +1,15 @@
 import os
 import logging
+from typing import Optional
+
+import click
 from flask import Flask
 
 
-def create_app() -> Flask:
+def create_app(warm_up: Optional[bool] = None) -> Flask:
+    """Build the app. Unless disabled (WARMUP=0), the model is loaded and warmed in the
+    background so /readyz turns green before real traffic arrives. CLI commands never warm up.
+    """
     app = Flask(
         __name__,
         template_folder=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates'),
@@ -20,4 +26,40 @@ def create_app() -> Flask:
     from .routes import bp
     app.register_blueprint(bp)
 
+    # Map precomputed question embeddings now; missing ones are built on first use
+    from .ai.analyzer_service import (
+        build_embedding_store,
+        download_model,
+        export_onnx_model,
+        load_embedding_store,
+        start_warmup,
+    )
+    if not load_embedding_store():
+        app.logger.info("No precomputed question embeddings yet; "
+                        "run `flask --app wsgi build-embeddings`")
+
+    if warm_up is None:
+        # The flask CLI builds the app inside a click context; commands don't need a warm model
+        warm_up = (os.getenv("WARMUP", "1") != "0"
+                   and click.get_current_context(silent=True) is None)
+    if warm_up:
+        start_warmup()
+
+    @app.cli.command("build-embeddings")
+    def build_embeddings_command() -> None:
+        """Embed ideal answers and questions not yet in the embedding store."""
+        build_embedding_store()
+
+    @app.cli.command("download-model")
+    def download_model_command() -> None:
+        """Save MODEL_NAME to MODEL_DIR with a checksum manifest for offline startup."""
+        click.echo(download_model())
+
+    @app.cli.command("export-onnx")
+    @click.option("--no-quantize", is_flag=True, help="Skip the dynamic int8 copy.")
+    def export_onnx_command(no_quantize: bool) -> None:
+        """Export MODEL_NAME to ONNX (fp32 + int8) for EMBEDDING_BACKEND=onnx / onnx-int8."""
+        for path in export_onnx_model(quantize=not no_quantize):
+            click.echo(path)
+
     return app
@@ -0,0 +1,120 @@
+import math
+import time
+import threading
+from typing import Dict
+
+# admit() outcomes
+ADMITTED = "admitted"
+DEGRADED = "degraded"
+SHED = "shed"
+
+
+class AdmissionController:
+    """Bounds concurrent model work per process, with a short wait queue in front.
+
+    Up to ``max_in_flight`` requests run at once. Later ones wait (FIFO-ish, via a
+    condition variable) for at most ``queue_timeout_ms``; when ``max_queue``
+    requests are already waiting, or the wait times out, the request is shed.
+    With ``degrade_at`` > 0, a request that would join a queue at least that deep
+    is told to take the cheap keyword-only path instead of waiting.
+    Every ADMITTED result must be paired with ``release()``.
+    """
+
+    def __init__(self, max_in_flight: int = 4, max_queue: int = 16,
+                 queue_timeout_ms: float = 2000.0, degrade_at: int = 0):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = max(0.0, queue_timeout_ms) / 1000.0
+        self.degrade_at = max(0, degrade_at)
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+        self._service_ewma = 0.0
+        self._started: Dict[int, float] = {}
+        self._stats = {
+            "admitted": 0,
+            "queued": 0,
+            "shed": 0,
+            "timed_out": 0,
+            "degraded": 0,
+            "wait_ms_sum": 0.0,
+            "wait_ms_max": 0.0,
+            "max_queue_depth": 0,
+        }
+
+    def admit(self) -> str:
+        s = self._stats
+        with self._cond:
+            if self._in_flight < self.max_in_flight and self._waiting == 0:
+                return self._enter(0.0)
+            if self.degrade_at and self._waiting >= self.degrade_at:
+                s["degraded"] += 1
+                return DEGRADED
+            if self._waiting >= self.max_queue:
+                s["shed"] += 1
+                return SHED
+
+            self._waiting += 1
+            s["queued"] += 1
+            s["max_queue_depth"] = max(s["max_queue_depth"], self._waiting)
+            enqueued = time.perf_counter()
+            deadline = enqueued + self.queue_timeout
+            try:
+                while self._in_flight >= self.max_in_flight:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        s["shed"] += 1
+                        s["timed_out"] += 1
+                        return SHED
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+            return self._enter((time.perf_counter() - enqueued) * 1000.0)
+
+    def _enter(self, waited_ms: float) -> str:
+        # Called with the condition held
+        s = self._stats
+        self._in_flight += 1
+        s["admitted"] += 1
+        s["wait_ms_sum"] += waited_ms
+        s["wait_ms_max"] = max(s["wait_ms_max"], waited_ms)
+        self._started[threading.get_ident()] = time.perf_counter()
+        return ADMITTED
+
+    def release(self) -> None:
+        with self._cond:
+            started = self._started.pop(threading.get_ident(), None)
+            if started is not None:
+                elapsed = time.perf_counter() - started
+                self._service_ewma = (elapsed if not self._service_ewma
+                                      else 0.8 * self._service_ewma + 0.2 * elapsed)
+            self._in_flight = max(0, self._in_flight - 1)
+            self._cond.notify()
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue should have drained, at least 1."""
+        with self._cond:
+            backlog = self._waiting + self._in_flight
+            estimate = self._service_ewma * backlog / self.max_in_flight
+        return max(1, math.ceil(estimate))
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            s = dict(self._stats)
+            in_flight, waiting, service = self._in_flight, self._waiting, self._service_ewma
+        admitted = s["admitted"]
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "in_flight": in_flight,
+            "queue_depth": waiting,
+            "max_queue_depth": s["max_queue_depth"],
+            "admitted": admitted,
+            "queued": s["queued"],
+            "shed": s["shed"],
+            "timed_out": s["timed_out"],
+            "degraded": s["degraded"],
+            "avg_wait_ms": round(s["wait_ms_sum"] / admitted, 3) if admitted else 0.0,
+            "max_wait_ms": round(s["wait_ms_max"], 3),
+            "avg_service_ms": round(service * 1000.0, 3),
+        }
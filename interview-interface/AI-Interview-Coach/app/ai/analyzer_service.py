@@ -1,119 +1,280 @@
 import os
 import re
-import json
+import time
+import hashlib
+import logging
 import threading
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 
-try:
-    from sentence_transformers import SentenceTransformer, util
-except Exception as e:
-    SentenceTransformer = None  # type: ignore
-    util = None  # type: ignore
+import numpy as np
 
+from ..catalog import QuestionEntry, get_catalog
+from ..utils.text import normalize_question
+from .backends import SENTENCE_TRANSFORMERS, export_onnx, load_backend
+from .batcher import EncodeBatcher
+from .embedding_protocol import EmbeddingClient
+from . import model_artifacts
+from .embedding_store import EmbeddingStore, cosine_rows
+from .result_cache import SizedLRU
 
-_BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-_PROJECT_DIR = os.path.dirname(_BASE_DIR)
+logger = logging.getLogger(__name__)
 
-_MODEL = None
-_MODEL_LOCK = threading.Lock()
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+_BACKEND = None
+_BACKEND_LOCK = threading.Lock()
+_STORE = None
+_STORE_LOCK = threading.Lock()
+_BATCHER = None
+_BATCHER_LOCK = threading.Lock()
+_WARMUP_LOCK = threading.Lock()
+_WARMUP_THREAD: Optional[threading.Thread] = None
+# Reported by /readyz: idle -> loading -> ready | failed
+_STARTUP: Dict = {"state": "idle", "load_ms": None, "warmup_ms": None, "error": None}
 
-def _get_model():
-    global _MODEL
-    if _MODEL is not None:
-        return _MODEL
-    with _MODEL_LOCK:
-        if _MODEL is None:
-            model_name = os.getenv("MODEL_NAME", "all-MiniLM-L6-v2")
-            if SentenceTransformer is None:
-                raise RuntimeError(
-                    "sentence-transformers is not available. Ensure dependencies are installed."
+_EXAMPLE_CUES = re.compile(r"\b(for example|e\.g\.|such as|for instance)\b")
+
+# Retries and resubmissions of identical text skip the model entirely
+_RESULTS = SizedLRU(float(os.getenv("ANALYSIS_CACHE_MB", "32")))
+_ANSWER_VECTORS = SizedLRU(float(os.getenv("EMBEDDING_CACHE_MB", "16")))
+
+
+def _model_name() -> str:
+    return os.getenv("MODEL_NAME", "all-MiniLM-L6-v2")
+
+
+def _backend_name() -> str:
+    return os.getenv("EMBEDDING_BACKEND", SENTENCE_TRANSFORMERS)
+
+
+def _id_for(backend_name: str, model_name: Optional[str] = None) -> str:
+    model_name = model_name or _model_name()
+    if backend_name == SENTENCE_TRANSFORMERS:
+        return model_name
+    return f"{model_name}@{backend_name}"
+
+
+def _embedding_id() -> str:
+    """Model plus the backend that actually loaded (loading it if needed).
+
+    int8 vectors differ slightly, so each backend gets its own store and cache
+    keys; an ONNX backend that fell back to sentence-transformers encodes, and
+    is keyed, as sentence-transformers.
+    """
+    backend = _get_backend()
+    if isinstance(backend, EmbeddingClient):
+        return _id_for(_backend_name())  # checked against the server in _connect_embedding_server
+    return _id_for(backend.name)
+
+
+def _onnx_dir() -> str:
+    return os.getenv("ONNX_MODEL_DIR", os.path.join(_PROJECT_DIR, ".cache", "onnx", _model_name()))
+
+
+def _model_dir() -> str:
+    return os.getenv("MODEL_DIR", os.path.join(_PROJECT_DIR, ".cache", "models", _model_name()))
+
+
+def _get_backend():
+    global _BACKEND
+    if _BACKEND is not None:
+        return _BACKEND
+    with _BACKEND_LOCK:
+        if _BACKEND is None and os.getenv("EMBEDDING_SOCKET"):
+            # A shared embedding server owns the model; this worker only sends texts
+            _BACKEND = _connect_embedding_server(os.environ["EMBEDDING_SOCKET"])
+        elif _BACKEND is None:
+            _BACKEND = load_backend(
+                _backend_name(),
+                _model_name(),
+                onnx_dir=_onnx_dir(),
+                threads=int(os.getenv("ONNX_THREADS", "0")),
+                model_dir=_model_dir(),
+            )
+    return _BACKEND
+
+
+def _connect_embedding_server(socket_path: str) -> EmbeddingClient:
+    """Client for the shared embedding server, refused if it encodes with another model/backend.
+
+    The store and cache keys here come from this worker's MODEL_NAME and
+    EMBEDDING_BACKEND; vectors from a differently configured (or fallen back)
+    server would silently mix vector spaces. The error fails the warm-up, so
+    /readyz reports it.
+    """
+    client = EmbeddingClient(socket_path, timeout=float(os.getenv("EMBEDDING_TIMEOUT", "30")))
+    info = client.info()
+    served = _id_for(str(info.get("backend")), str(info.get("model")))
+    expected = _id_for(_backend_name())
+    if served != expected:
+        raise RuntimeError(f"Embedding server at {socket_path} encodes with {served}, "
+                           f"but this worker is configured for {expected}")
+    return client
+
+
+def _encode_direct(texts: List[str]) -> np.ndarray:
+    return _get_backend().encode(texts)
+
+
+def _get_batcher() -> EncodeBatcher:
+    global _BATCHER
+    if _BATCHER is None:
+        with _BATCHER_LOCK:
+            if _BATCHER is None:
+                _BATCHER = EncodeBatcher(
+                    _encode_direct,
+                    max_batch_size=int(os.getenv("ENCODE_BATCH_SIZE", "32")),
+                    max_wait_ms=float(os.getenv("ENCODE_BATCH_WAIT_MS", "5")),
                 )
-            _MODEL = SentenceTransformer(model_name)
-    return _MODEL
-
-
-def _load_questions() -> Dict[str, List[Dict[str, str]]]:
-    path = os.path.join(_PROJECT_DIR, "questions.json")
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-
-def _find_ideal_answer(question_text: str, questions_data: Dict[str, List[Dict[str, str]]]) -> str:
-    for category in questions_data.values():
-        for q in category:
-            if q.get("question") == question_text:
-                return q.get("ideal_answer", "")
-    return ""
-
-
-def _contains_key_concepts(user_answer: str, ideal_answer: str) -> Tuple[List[str], List[str]]:
-    key_terms = set()
-    lower_ideal = ideal_answer.lower()
-
-    if "hash table" in lower_ideal:
-        key_terms.update(["hash", "bucket", "collision", "o(1)"])
-    elif "time complexity" in lower_ideal:
-        key_terms.update(["o(", "complexity", "runtime", "scale"])
-    elif "tcp" in lower_ideal or "udp" in lower_ideal:
-        key_terms.update(["tcp", "udp", "reliable", "connection", "speed"])
-    elif "recursion" in lower_ideal:
-        key_terms.update(["base case", "stack", "function calls", "iterative"])
-    elif "closure" in lower_ideal:
-        key_terms.update(["enclosing scope", "private", "function factory"])
-    elif "garbage collection" in lower_ideal:
-        key_terms.update(["reference counting", "memory", "cyclic", "free"])
-    elif "api gateway" in lower_ideal:
-        key_terms.update(["microservices", "routing", "authentication", "entry point"])
-    elif "cap theorem" in lower_ideal:
-        key_terms.update(["consistency", "availability", "partition tolerance"])
-    elif "authentication" in lower_ideal:
-        key_terms.update(["identity", "login", "authorization", "permissions"])
-    elif "global state" in lower_ideal:
-        key_terms.update(["mutable", "bug", "test", "pure function"])
-    elif "lazy loading" in lower_ideal:
-        key_terms.update(["delay", "performance", "memory", "initialize"])
-    elif "https" in lower_ideal:
-        key_terms.update(["tls", "ssl", "encrypt", "certificate", "man-in-the-middle"])
-    elif "process" in lower_ideal and "thread" in lower_ideal:
-        key_terms.update(["memory space", "isolation", "lightweight", "race condition"])
-    elif "sql query" in lower_ideal:
-        key_terms.update(["explain", "index", "slow query", "profiler"])
-    else:
-        key_terms = set(re.findall(r"\b\w{4,}\b", lower_ideal))
+    return _BATCHER
+
+
+def _encode(texts: List[str]) -> np.ndarray:
+    """Encode through the micro-batcher so concurrent requests share one model call."""
+    return _get_batcher().encode(texts)
+
+
+def encoder_stats() -> Dict:
+    return _get_batcher().stats()
+
+
+def cache_stats() -> Dict:
+    return {"results": _RESULTS.stats(), "answer_embeddings": _ANSWER_VECTORS.stats()}
+
+
+def _answer_hash(answer: str) -> str:
+    return hashlib.sha256(answer.encode("utf-8")).hexdigest()
+
+
+def _encode_answers(answers: List[str]) -> np.ndarray:
+    """Answer vectors, encoding (in one call) only answers not in the embedding cache."""
+    model_id = _embedding_id()  # loads the backend, so the id is the one that encodes
+    keys = [(model_id, _answer_hash(answer)) for answer in answers]
+    vectors: List[Optional[np.ndarray]] = [_ANSWER_VECTORS.get(key) for key in keys]
+    missing = [i for i, vec in enumerate(vectors) if vec is None]
+    if missing:
+        encoded = _encode([answers[i] for i in missing])
+        for i, vec in zip(missing, encoded):
+            # Copy so the cache does not pin the whole batch array
+            vec = np.array(vec, dtype=np.float32)
+            vec.setflags(write=False)
+            _ANSWER_VECTORS.set(keys[i], vec)
+            vectors[i] = vec
+    return np.stack(vectors)
+
+
+def _get_store(embedding_id: Optional[str] = None) -> EmbeddingStore:
+    """The store for `embedding_id` (default: the loaded backend's), swapped when it changes."""
+    global _STORE
+    embedding_id = embedding_id or _embedding_id()
+    store = _STORE
+    if store is None or store.model_name != embedding_id:
+        with _STORE_LOCK:
+            if _STORE is None or _STORE.model_name != embedding_id:
+                default_dir = os.path.join(_PROJECT_DIR, ".cache", "embeddings")
+                _STORE = EmbeddingStore(os.getenv("EMBEDDINGS_DIR", default_dir), embedding_id)
+            store = _STORE
+    return store
+
+
+def export_onnx_model(quantize: bool = True) -> List[str]:
+    """Export MODEL_NAME to ONNX_MODEL_DIR for the onnx / onnx-int8 backends."""
+    return export_onnx(_model_name(), _onnx_dir(), quantize=quantize)
+
+
+def download_model() -> str:
+    """Save MODEL_NAME to MODEL_DIR with a checksum manifest, so startup never hits the hub."""
+    return model_artifacts.download_model(_model_name(), _model_dir())
 
+
+def warm_up() -> None:
+    """Load the backend, make sure question embeddings exist and run a first encode.
+
+    Each step is timed and logged; the outcome is what /readyz reports.
+    """
+    _STARTUP.update(state="loading", error=None)
+    try:
+        started = time.perf_counter()
+        backend = _get_backend()
+        load_ms = (time.perf_counter() - started) * 1000.0
+        logger.info("Embedding backend %s for %s loaded in %.0f ms",
+                    getattr(backend, "name", "?"), _model_name(), load_ms)
+
+        started = time.perf_counter()
+        if not load_embedding_store():
+            build_embedding_store()
+        # A few real-length texts, through the batcher, so its thread and the
+        # model's first-call allocations are out of the way before traffic
+        samples = [entry.ideal_answer for entry in get_catalog().entries()[:8]] or ["warm-up"]
+        _encode(samples)
+        warmup_ms = (time.perf_counter() - started) * 1000.0
+        logger.info("Warm-up (embedding store + %d-text encode) took %.0f ms",
+                    len(samples), warmup_ms)
+        _STARTUP.update(state="ready", load_ms=round(load_ms, 1), warmup_ms=round(warmup_ms, 1))
+    except Exception as e:
+        logger.exception("Model warm-up failed")
+        _STARTUP.update(state="failed", error=str(e))
+
+
+def start_warmup() -> None:
+    """Run warm_up() in a background thread unless one is running or already succeeded."""
+    global _WARMUP_THREAD
+    with _WARMUP_LOCK:
+        if _STARTUP["state"] == "ready" or (_WARMUP_THREAD and _WARMUP_THREAD.is_alive()):
+            return
+        _WARMUP_THREAD = threading.Thread(target=warm_up, name="model-warmup", daemon=True)
+        _WARMUP_THREAD.start()
+
+
+def readiness() -> Dict:
+    return dict(_STARTUP)
+
+
+def load_embedding_store() -> bool:
+    """Memory-map precomputed question embeddings (no model load). False if not built yet.
+
+    Before the backend has loaded this maps the configured backend's store; if
+    loading falls back to another backend, scoring switches to that one's store.
+    """
+    embedding_id = _embedding_id() if _BACKEND is not None else _id_for(_backend_name())
+    return _get_store(embedding_id).load(get_catalog().entries())
+
+
+def build_embedding_store() -> None:
+    """Embed every ideal answer and question not already in the store."""
+    _get_store().sync(get_catalog().entries(), _encode_direct)
+
+
+def _contains_key_concepts(
+    user_answer: str, key_terms: Tuple[str, ...]
+) -> Tuple[List[str], List[str]]:
     user_lower = user_answer.lower()
     matched = [term for term in key_terms if term in user_lower]
     return matched, list(key_terms)
 
 
-def analyze_answer(question: str, answer: str) -> Dict:
-    """Analyze an answer against an ideal answer and return scoring details."""
+def _precheck(
+    question: str, answer: str, entry: Optional[QuestionEntry]
+) -> Tuple[Optional[QuestionEntry], Optional[Dict]]:
+    """(catalog entry, None) if the answer needs embedding, else (None, final result)."""
     if not question or not answer:
-        return {"error": "Question and answer are required."}
+        return None, {"error": "Question and answer are required."}
 
-    questions_data = _load_questions()
-    ideal = _find_ideal_answer(question, questions_data)
+    ideal = entry.ideal_answer if entry else ""
     if not ideal:
-        return {"score": 0, "feedback": "No reference answer found for this question."}
+        return None, {"score": 0, "feedback": "No reference answer found for this question."}
 
     word_count = len(answer.split())
     sentence_count = len([s for s in re.split(r"[.!?]+", answer) if s.strip()])
     if word_count < 25 or sentence_count < 2:
-        return {
+        return None, {
             "score": 1.5,
             "feedback": "Your answer is too brief. Aim for at least 2-3 sentences (≈25+ words) covering core ideas, examples, and trade-offs.",
         }
+    return entry, None
 
-    model = _get_model()
-    embeddings = model.encode([answer, ideal, question], convert_to_tensor=True)
-    try:
-        sim_ai = float(util.cos_sim(embeddings[0], embeddings[1]).item())
-        sim_aq = float(util.cos_sim(embeddings[0], embeddings[2]).item())
-    except Exception:
-        sim_ai = 0.0
-        sim_aq = 0.0
 
+def _score(question: str, answer: str, entry: QuestionEntry, sim_ai: float, sim_aq: float) -> Dict:
     if sim_ai < 0.20:
         return {
             "score": 2.0,
@@ -134,13 +295,13 @@ def analyze_answer(question: str, answer: str) -> Dict:
             "feedback": "Your answer closely mirrors the question. Provide an explanatory response with definitions, key concepts, and examples.",
         }
 
-    matched, all_terms = _contains_key_concepts(answer, ideal)
+    matched, all_terms = _contains_key_concepts(answer, entry.key_terms)
     coverage = len(matched) / len(all_terms) if all_terms else 0
 
     norm_sim = max(0.0, (sim_ai - 0.30) / 0.70)
     base_score = norm_sim * 6.0
     concept_score = coverage * 4.0
-    structure_bonus = 0.5 if re.search(r"\b(for example|e\.g\.|such as|for instance)\b", answer.lower()) else 0.0
+    structure_bonus = 0.5 if _EXAMPLE_CUES.search(answer.lower()) else 0.0
     total_score = min(round(base_score + concept_score + structure_bonus, 1), 10.0)
 
     missing = [c for c in list(all_terms)[:3] if c not in matched]
@@ -165,3 +326,82 @@ def analyze_answer(question: str, answer: str) -> Dict:
         "missing_concepts": missing,
         "concept_coverage": round(coverage, 2),
     }
+
+
+def analyze_answers(pairs: Sequence[Tuple[str, str]]) -> List[Dict]:
+    """Score many (question, answer) pairs with a single encode of all answers that need it.
+
+    Results are in input order and identical to calling analyze_answer on each pair.
+    """
+    catalog = get_catalog()
+    # Results are only cached once a backend has loaded, so a cache key never
+    # names a backend other than the one that scored it
+    model_id = _embedding_id() if _BACKEND is not None else None
+    results: List[Optional[Dict]] = [None] * len(pairs)
+    keys: List[Optional[tuple]] = [None] * len(pairs)
+    pending: List[Tuple[int, QuestionEntry]] = []
+    for i, (question, answer) in enumerate(pairs):
+        entry = catalog.get(question) if question else None
+        if question and answer and model_id:
+            # The content hash changes with the ideal answer, so edits to the bank invalidate
+            keys[i] = (model_id, normalize_question(question),
+                       entry.content_hash if entry else "", _answer_hash(answer))
+            cached = _RESULTS.get(keys[i])
+            if cached is not None:
+                results[i] = dict(cached)
+                keys[i] = None  # already cached
+                continue
+        entry, result = _precheck(question, answer, entry)
+        if result is not None:
+            results[i] = result
+        else:
+            pending.append((i, entry))
+
+    if pending:
+        # Ideal answer and question vectors are precomputed; only the answers are encoded here
+        answer_vecs = _encode_answers([pairs[i][1] for i, _ in pending])
+        store = _get_store()
+        stored = [store.vectors(entry, catalog.entries, _encode_direct) for _, entry in pending]
+        sims_ai = cosine_rows(answer_vecs, np.stack([ideal for ideal, _ in stored]))
+        sims_aq = cosine_rows(answer_vecs, np.stack([question for _, question in stored]))
+        for k, (i, entry) in enumerate(pending):
+            question, answer = pairs[i]
+            results[i] = _score(question, answer, entry, float(sims_ai[k]), float(sims_aq[k]))
+
+    for key, result in zip(keys, results):
+        if key is not None and result is not None and "error" not in result:
+            _RESULTS.set(key, dict(result))
+    return results  # type: ignore[return-value]
+
+
+def analyze_answer(question: str, answer: str) -> Dict:
+    """Analyze an answer against an ideal answer and return scoring details."""
+    return analyze_answers([(question, answer)])[0]
+
+
+def analyze_answer_keywords(question: str, answer: str) -> Dict:
+    """Cheap fallback under overload: key-term coverage only, no model call.
+
+    Results carry ``"degraded": True`` and are never cached.
+    """
+    entry = get_catalog().get(question) if question else None
+    entry, result = _precheck(question, answer, entry)
+    if result is not None:
+        return result
+
+    matched, all_terms = _contains_key_concepts(answer, entry.key_terms)
+    coverage = len(matched) / len(all_terms) if all_terms else 0
+    structure_bonus = 0.5 if _EXAMPLE_CUES.search(answer.lower()) else 0.0
+    score = min(round(1.0 + coverage * 7.0 + structure_bonus, 1), 10.0)
+    missing = [c for c in list(all_terms)[:3] if c not in matched]
+    feedback = "Quick score: the coach is busy, so this reflects key-concept coverage only."
+    if missing:
+        feedback += f" Consider discussing: {', '.join(missing[:2])}."
+    return {
+        "score": score,
+        "feedback": feedback,
+        "matched_concepts": matched,
+        "missing_concepts": missing,
+        "concept_coverage": round(coverage, 2),
+        "degraded": True,
+    }
@@ -0,0 +1,153 @@
+import os
+import logging
+from typing import List, Optional
+
+import numpy as np
+
+from .model_artifacts import has_manifest, resolve_model_source, verify_manifest, write_manifest
+
+logger = logging.getLogger(__name__)
+
+# EMBEDDING_BACKEND values
+SENTENCE_TRANSFORMERS = "sentence-transformers"
+ONNX = "onnx"
+ONNX_INT8 = "onnx-int8"
+BACKENDS = (SENTENCE_TRANSFORMERS, ONNX, ONNX_INT8)
+
+ONNX_FILES = {ONNX: "model.onnx", ONNX_INT8: "model_int8.onnx"}
+
+
+class SentenceTransformerBackend:
+    """Reference backend: the full PyTorch model through sentence-transformers.
+
+    `model_name` may also be a local directory saved by ``download-model``.
+    """
+
+    name = SENTENCE_TRANSFORMERS
+
+    def __init__(self, model_name: str):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except Exception as e:
+            raise RuntimeError(
+                "sentence-transformers is not available. Ensure dependencies are installed."
+            ) from e
+        self._model = SentenceTransformer(model_name)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self._model.encode(texts, convert_to_numpy=True), dtype=np.float32)
+
+
+def mean_pool(token_embeddings: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    """Masked mean over tokens, then L2 normalization (MiniLM's sentence-transformers head)."""
+    mask = attention_mask[..., None].astype(np.float32)
+    summed = (token_embeddings * mask).sum(axis=1)
+    counts = np.clip(mask.sum(axis=1), 1e-9, None)
+    pooled = summed / counts
+    norms = np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+    return (pooled / norms).astype(np.float32)
+
+
+class OnnxBackend:
+    """The exported transformer run through ONNX Runtime on CPU (fp32 or dynamic int8).
+
+    Expects ``model.onnx`` / ``model_int8.onnx`` and ``tokenizer.json`` in
+    ``model_dir``, as written by ``flask --app wsgi export-onnx``.
+    """
+
+    def __init__(self, model_dir: str, variant: str = ONNX, threads: int = 0,
+                 max_length: int = 256):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        if has_manifest(model_dir):
+            verify_manifest(model_dir)
+        model_path = os.path.join(model_dir, ONNX_FILES[variant])
+        tokenizer_path = os.path.join(model_dir, "tokenizer.json")
+        for path in (model_path, tokenizer_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(path)
+
+        self.name = variant
+        self._tokenizer = Tokenizer.from_file(tokenizer_path)
+        self._tokenizer.enable_truncation(max_length=max_length)
+        self._tokenizer.enable_padding()
+        options = ort.SessionOptions()
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self._session = ort.InferenceSession(model_path, options,
+                                             providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self._session.get_inputs()}
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        encodings = self._tokenizer.encode_batch(list(texts))
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._inputs:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        token_embeddings = self._session.run(None, feeds)[0]
+        return mean_pool(token_embeddings, attention_mask)
+
+
+def load_backend(name: str, model_name: str, onnx_dir: Optional[str] = None, threads: int = 0,
+                 model_dir: Optional[str] = None):
+    """Build the configured backend, falling back to sentence-transformers if it can't load.
+
+    sentence-transformers loads from the checksummed `model_dir` when it has been
+    populated, and from the model hub otherwise.
+    """
+    if name in (ONNX, ONNX_INT8):
+        try:
+            return OnnxBackend(onnx_dir or "", name, threads=threads)
+        except Exception as e:
+            logger.warning("Embedding backend %s unavailable (%s); falling back to %s",
+                           name, e, SENTENCE_TRANSFORMERS)
+    elif name != SENTENCE_TRANSFORMERS:
+        logger.warning("Unknown EMBEDDING_BACKEND %r; using %s", name, SENTENCE_TRANSFORMERS)
+    return SentenceTransformerBackend(resolve_model_source(model_name, model_dir or ""))
+
+
+def export_onnx(model_name: str, out_dir: str, quantize: bool = True, opset: int = 14) -> List[str]:
+    """Export the transformer behind `model_name` to ONNX (and a dynamic int8 copy) in `out_dir`.
+
+    Needs torch and transformers (already required by sentence-transformers) and,
+    for the int8 copy, onnxruntime.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    repo = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+    tokenizer = AutoTokenizer.from_pretrained(repo)
+    model = AutoModel.from_pretrained(repo)
+    model.config.return_dict = False  # plain tuple outputs trace cleanly
+    model.eval()
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer.save_pretrained(out_dir)  # writes tokenizer.json (fast tokenizer)
+
+    sample = tokenizer(["An example sentence to trace the graph."], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids")
+                   if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "tokens"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "tokens"}
+    fp32_path = os.path.join(out_dir, ONNX_FILES[ONNX])
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+    written = [fp32_path]
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        int8_path = os.path.join(out_dir, ONNX_FILES[ONNX_INT8])
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        written.append(int8_path)
+    written.append(write_manifest(out_dir, model_name))
+    return written
@@ -0,0 +1,131 @@
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EncodeBatcher:
+    """Coalesces concurrent ``encode`` calls into one batched model call.
+
+    Callers enqueue their texts and block on a future. A single worker thread
+    waits for the first request, then keeps collecting until either
+    ``max_batch_size`` texts are queued or ``max_wait_ms`` has passed since
+    that first request, runs one ``encode_fn`` over everything collected and
+    hands each caller its slice of the result. A request larger than
+    ``max_batch_size`` is run on its own rather than split.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray],
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._pending: Deque[Tuple[List[str], Future, float]] = deque()
+        self._pending_texts = 0
+        self._cond = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "batches": 0,
+            "requests": 0,
+            "texts": 0,
+            "fill_sum": 0.0,
+            "queue_delay_ms_sum": 0.0,
+            "queue_delay_ms_max": 0.0,
+            "encode_ms_sum": 0.0,
+            "errors": 0,
+        }
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        future: Future = Future()
+        with self._cond:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="encode-batcher",
+                                                daemon=True)
+                self._worker.start()
+            self._pending.append((list(texts), future, time.perf_counter()))
+            self._pending_texts += len(texts)
+            self._cond.notify()
+        return future.result()
+
+    def _take_batch(self) -> List[Tuple[List[str], Future, float]]:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = self._pending[0][2] + self.max_wait
+            while self._pending_texts < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch, size = [], 0
+            while self._pending:
+                texts = self._pending[0][0]
+                if batch and size + len(texts) > self.max_batch_size:
+                    break
+                batch.append(self._pending.popleft())
+                size += len(texts)
+            self._pending_texts -= size
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            started = time.perf_counter()
+            texts = [text for request_texts, _, _ in batch for text in request_texts]
+            try:
+                vectors = np.asarray(self.encode_fn(texts))
+            except Exception as exc:
+                logger.exception("Batched encode of %d texts failed", len(texts))
+                for _, future, _ in batch:
+                    future.set_exception(exc)
+                self._record(batch, started, len(texts), failed=True)
+                continue
+            offset = 0
+            for request_texts, future, _ in batch:
+                future.set_result(vectors[offset:offset + len(request_texts)])
+                offset += len(request_texts)
+            self._record(batch, started, len(texts), failed=False)
+
+    def _record(self, batch, started: float, size: int, failed: bool) -> None:
+        finished = time.perf_counter()
+        delays = [(started - enqueued) * 1000.0 for _, _, enqueued in batch]
+        with self._stats_lock:
+            s = self._stats
+            s["batches"] += 1
+            s["requests"] += len(batch)
+            s["texts"] += size
+            s["fill_sum"] += min(1.0, size / self.max_batch_size)
+            s["queue_delay_ms_sum"] += sum(delays)
+            s["queue_delay_ms_max"] = max(s["queue_delay_ms_max"], max(delays))
+            s["encode_ms_sum"] += (finished - started) * 1000.0
+            if failed:
+                s["errors"] += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            s = dict(self._stats)
+        batches, requests = s["batches"], s["requests"]
+        with self._cond:
+            queued = len(self._pending)
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": batches,
+            "requests": requests,
+            "texts": s["texts"],
+            "errors": s["errors"],
+            "queued_requests": queued,
+            "avg_batch_texts": round(s["texts"] / batches, 2) if batches else 0.0,
+            "avg_requests_per_batch": round(requests / batches, 2) if batches else 0.0,
+            "avg_batch_fill": round(s["fill_sum"] / batches, 3) if batches else 0.0,
+            "avg_queue_delay_ms": round(s["queue_delay_ms_sum"] / requests, 3) if requests else 0.0,
+            "max_queue_delay_ms": round(s["queue_delay_ms_max"], 3),
+            "avg_encode_ms": round(s["encode_ms_sum"] / batches, 3) if batches else 0.0,
+        }
@@ -0,0 +1,145 @@
+"""Binary framing for the local embedding server, and the client web workers use.
+
+Every message is a 5-byte header ``!BI`` (op or status, payload length) followed
+by the payload. An encode request carries ``!I`` text count then, per text,
+``!I`` byte length and UTF-8 bytes. The reply is ``!II`` rows and dim followed
+by the float32 matrix in little-endian row-major order. Errors reply with
+STATUS_ERROR and a UTF-8 message.
+"""
+import json
+import socket
+import struct
+import threading
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+OP_ENCODE = 1
+OP_INFO = 2
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+_HEADER = struct.Struct("!BI")
+_COUNT = struct.Struct("!I")
+_SHAPE = struct.Struct("!II")
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            raise ConnectionError("embedding socket closed")
+        received += n
+    return bytes(buf)
+
+
+def send_frame(sock: socket.socket, kind: int, payload: bytes = b"") -> None:
+    sock.sendall(_HEADER.pack(kind, len(payload)) + payload)
+
+
+def recv_frame(sock: socket.socket) -> Tuple[int, bytes]:
+    kind, size = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    if size > MAX_FRAME_BYTES:
+        raise ConnectionError(f"embedding frame of {size} bytes exceeds the limit")
+    return kind, _recv_exact(sock, size) if size else b""
+
+
+def pack_texts(texts: List[str]) -> bytes:
+    parts = [_COUNT.pack(len(texts))]
+    for text in texts:
+        data = text.encode("utf-8")
+        parts.append(_COUNT.pack(len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def unpack_texts(payload: bytes) -> List[str]:
+    (count,), offset = _COUNT.unpack_from(payload), _COUNT.size
+    texts = []
+    for _ in range(count):
+        (size,) = _COUNT.unpack_from(payload, offset)
+        offset += _COUNT.size
+        texts.append(payload[offset:offset + size].decode("utf-8"))
+        offset += size
+    return texts
+
+
+def pack_matrix(vectors: np.ndarray) -> bytes:
+    matrix = np.ascontiguousarray(vectors, dtype="<f4")
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    return _SHAPE.pack(*matrix.shape) + matrix.tobytes()
+
+
+def unpack_matrix(payload: bytes) -> np.ndarray:
+    rows, dim = _SHAPE.unpack_from(payload)
+    return np.frombuffer(payload, dtype="<f4", offset=_SHAPE.size).reshape(rows, dim)
+
+
+class EmbeddingClient:
+    """Encodes through the embedding server, so web workers never load the model.
+
+    Keeps one connection per thread and reconnects once if the server restarted
+    since the connection was opened.
+    """
+
+    name = "remote"
+
+    def __init__(self, socket_path: str, timeout: float = 30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self._local.sock = sock
+        return sock
+
+    def _close(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    def _call(self, op: int, payload: bytes) -> bytes:
+        sock = getattr(self._local, "sock", None)
+        reused = sock is not None
+        try:
+            sock = sock or self._connect()
+            send_frame(sock, op, payload)
+            status, body = recv_frame(sock)
+        except ConnectionError:
+            self._close()
+            if not reused:
+                raise
+            # Stale connection (server restarted): one retry on a fresh socket
+            sock = self._connect()
+            try:
+                send_frame(sock, op, payload)
+                status, body = recv_frame(sock)
+            except OSError:
+                self._close()
+                raise
+        except OSError:
+            self._close()
+            raise
+        if status != STATUS_OK:
+            raise RuntimeError(f"embedding server error: {body.decode('utf-8', 'replace')}")
+        return body
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return unpack_matrix(self._call(OP_ENCODE, pack_texts(list(texts))))
+
+    def info(self) -> Dict:
+        return json.loads(self._call(OP_INFO, b"").decode("utf-8"))
@@ -0,0 +1,227 @@
+"""Standalone embedding server: a process pool owns the model, web workers connect over a socket.
+
+    python -m app.ai.embedding_server --socket /tmp/coach-embeddings.sock --workers 2 --threads 2
+
+Web workers set EMBEDDING_SOCKET to the same path and stop loading the model
+themselves. The server reads MODEL_NAME, EMBEDDING_BACKEND and ONNX_MODEL_DIR
+like the app does.
+"""
+import os
+import json
+import time
+import socket
+import logging
+import argparse
+import socketserver
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .embedding_protocol import (
+    OP_ENCODE,
+    OP_INFO,
+    STATUS_ERROR,
+    STATUS_OK,
+    pack_matrix,
+    recv_frame,
+    send_frame,
+    unpack_texts,
+)
+
+logger = logging.getLogger(__name__)
+
+_WORKER_BACKEND = None
+
+
+def _configure_logging() -> None:
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+    logging.basicConfig(level=getattr(logging, level, logging.INFO))
+
+
+def _init_worker(cores_queue, threads: int, backend_name: str, model_name: str,
+                 onnx_dir: str, model_dir: str) -> None:
+    """Pin this inference process to its own cores and load the backend once."""
+    global _WORKER_BACKEND
+    _configure_logging()
+    cores = cores_queue.get()
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    # Set before torch is imported so its OpenMP pool is sized to the pinned cores
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    except ImportError:
+        pass
+
+    from .backends import load_backend
+    started = time.perf_counter()
+    _WORKER_BACKEND = load_backend(backend_name, model_name, onnx_dir=onnx_dir, threads=threads,
+                                   model_dir=model_dir)
+    logger.info("Inference process %d loaded %s in %.0f ms on cores %s (%d threads)",
+                os.getpid(), model_name, (time.perf_counter() - started) * 1000.0,
+                sorted(cores) if cores else "any", threads)
+
+
+def _worker_encode(texts: List[str]) -> np.ndarray:
+    return np.asarray(_WORKER_BACKEND.encode(texts), dtype=np.float32)
+
+
+def _worker_warm_up() -> str:
+    _worker_encode(["warm-up"])
+    return _WORKER_BACKEND.name
+
+
+def _core_sets(workers: int, threads: int) -> List[Optional[List[int]]]:
+    """Give each worker `threads` distinct cores, wrapping if there are not enough."""
+    if not hasattr(os, "sched_getaffinity"):
+        return [None] * workers
+    available = sorted(os.sched_getaffinity(0))
+    return [[available[(w * threads + t) % len(available)] for t in range(threads)]
+            for w in range(workers)]
+
+
+class InferencePool:
+    """Inference processes, each with its own backend and pinned torch threads."""
+
+    def __init__(self, workers: int, threads: int, backend_name: str, model_name: str,
+                 onnx_dir: str, model_dir: str, min_split: int = 16):
+        self.workers = max(1, workers)
+        self.threads = max(1, threads)
+        self.min_split = min_split
+        # spawn: the children import torch fresh instead of inheriting a forked copy
+        ctx = multiprocessing.get_context("spawn")
+        cores_queue = ctx.Queue()
+        for cores in _core_sets(self.workers, self.threads):
+            cores_queue.put(cores)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(cores_queue, self.threads, backend_name, model_name, onnx_dir, model_dir),
+        )
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if len(texts) < self.min_split or self.workers == 1:
+            return self._executor.submit(_worker_encode, texts).result()
+        # Large requests (e.g. build-embeddings) are spread over every process
+        chunks = np.array_split(np.arange(len(texts)), self.workers)
+        futures = [self._executor.submit(_worker_encode, [texts[i] for i in chunk])
+                   for chunk in chunks if len(chunk)]
+        return np.concatenate([future.result() for future in futures])
+
+    def warm_up(self) -> str:
+        """Start the processes (each loads the model) and run a first encode before serving.
+
+        Returns the backend the processes actually loaded, which differs from the
+        configured one after a fallback.
+        """
+        futures = [self._executor.submit(_worker_warm_up) for _ in range(self.workers)]
+        return ",".join(sorted({future.result() for future in futures}))
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        sock = self.request
+        while True:
+            try:
+                op, payload = recv_frame(sock)
+            except OSError:
+                return
+            try:
+                if op == OP_ENCODE:
+                    vectors = self.server.encode(unpack_texts(payload))
+                    send_frame(sock, STATUS_OK, pack_matrix(vectors))
+                elif op == OP_INFO:
+                    send_frame(sock, STATUS_OK, json.dumps(self.server.info).encode("utf-8"))
+                else:
+                    send_frame(sock, STATUS_ERROR, f"unknown op {op}".encode("utf-8"))
+            except OSError:
+                return
+            except Exception as e:
+                logger.exception("Embedding request failed")
+                try:
+                    send_frame(sock, STATUS_ERROR, str(e).encode("utf-8"))
+                except OSError:
+                    return
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves ``encode`` over a Unix socket; one thread per connected web worker thread."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, encode: Callable[[List[str]], np.ndarray],
+                 info: Optional[Dict] = None):
+        _remove_stale_socket(socket_path)
+        self.encode = encode
+        self.info = info or {}
+        super().__init__(socket_path, _Handler)
+        os.chmod(socket_path, 0o660)
+
+    def server_close(self) -> None:
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+def _remove_stale_socket(path: str) -> None:
+    """Remove a socket file left by a crashed server; refuse if a server still answers."""
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+    else:
+        raise RuntimeError(f"An embedding server is already listening on {path}")
+    finally:
+        probe.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from .analyzer_service import _backend_name, _model_dir, _model_name, _onnx_dir
+
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--socket",
+                        default=os.getenv("EMBEDDING_SOCKET", "/tmp/coach-embeddings.sock"))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("EMBEDDING_WORKERS", "1")))
+    parser.add_argument("--threads", type=int, default=int(os.getenv("EMBEDDING_THREADS", "0")),
+                        help="torch threads per worker (default: cores / workers)")
+    args = parser.parse_args(argv)
+
+    _configure_logging()
+    threads = args.threads or max(1, (cpus or 1) // max(1, args.workers))
+    pool = InferencePool(args.workers, threads, _backend_name(), _model_name(), _onnx_dir(),
+                         _model_dir())
+    started = time.perf_counter()
+    backend = pool.warm_up()
+    logger.info("Inference pool warm in %.0f ms", (time.perf_counter() - started) * 1000.0)
+    # Web workers compare this with their own configuration before trusting the vectors
+    info = {"model": _model_name(), "backend": backend,
+            "workers": pool.workers, "threads": pool.threads}
+    server = EmbeddingServer(args.socket, pool.encode, info)
+    logger.info("Embedding server listening on %s (%d workers x %d threads)",
+                args.socket, pool.workers, pool.threads)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
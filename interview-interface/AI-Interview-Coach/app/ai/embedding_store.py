@@ -0,0 +1,183 @@
+import os
+import re
+import json
+import glob
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# encode(texts) -> float array of shape (len(texts), dim)
+Encoder = Callable[[List[str]], np.ndarray]
+
+_KEEP_FILES = 2
+
+
+def _atomic_write(path: str, write: Callable) -> None:
+    """Write `path` through a unique temp file in the same directory and rename it into place."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class EmbeddingStore:
+    """Ideal-answer and question embeddings for a question bank, precomputed per content hash.
+
+    Vectors live in ``<model>-<digest>.npy`` with shape (questions, 2, dim):
+    row ``[i, 0]`` is the ideal answer, ``[i, 1]`` the question text. The
+    ``.keys.json`` sidecar lists the content hash of each row, and the digest
+    is derived from those hashes, so each question bank version gets its own
+    file. Files are memory-mapped read-only. When the bank changes, rows of
+    unchanged questions are copied from the previous file and only new or
+    edited questions are encoded.
+    """
+
+    def __init__(self, directory: str, model_name: str):
+        self.directory = directory
+        self.model_name = model_name
+        self._prefix = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self._lock = threading.Lock()
+        # (vectors, row index by content hash); replaced as a whole, never mutated
+        self._state: Tuple[Optional[np.ndarray], Dict[str, int]] = (None, {})
+
+    def _paths(self, digest: str) -> Tuple[str, str]:
+        base = os.path.join(self.directory, f"{self._prefix}-{digest}")
+        return base + ".npy", base + ".keys.json"
+
+    @staticmethod
+    def _digest(keys: Sequence[str]) -> str:
+        return hashlib.sha256("\n".join(keys).encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def _keys_for(entries: Iterable) -> List[str]:
+        return list(dict.fromkeys(entry.content_hash for entry in entries))
+
+    def _open(self, npy_path: str, keys_path: str) -> Optional[Tuple[np.ndarray, List[str]]]:
+        try:
+            with open(keys_path, "r", encoding="utf-8") as f:
+                keys = json.load(f)["keys"]
+            vectors = np.load(npy_path, mmap_mode="r")
+        except (OSError, ValueError, KeyError):
+            return None
+        if vectors.ndim != 3 or vectors.shape[0] != len(keys) or vectors.shape[1] != 2:
+            return None
+        return vectors, keys
+
+    def _install(self, vectors: np.ndarray, keys: List[str]) -> None:
+        self._state = (vectors, {key: i for i, key in enumerate(keys)})
+
+    def load(self, entries: Iterable) -> bool:
+        """Memory-map the stored vectors for this question bank, if present. Never encodes."""
+        keys = self._keys_for(entries)
+        with self._lock:
+            opened = self._open(*self._paths(self._digest(keys)))
+            if opened is None:
+                return False
+            self._install(*opened)
+            return True
+
+    def _previous_rows(self) -> Dict[str, np.ndarray]:
+        """Vectors by content hash from the loaded store and older files on disk, newest first."""
+        found: Dict[str, np.ndarray] = {}
+        vectors, rows = self._state
+        if vectors is not None:
+            for key, row in rows.items():
+                found[key] = vectors[row]
+        pattern = os.path.join(self.directory, f"{self._prefix}-*.keys.json")
+        keys_files = sorted(glob.glob(pattern), key=os.path.getmtime, reverse=True)
+        for keys_path in keys_files:
+            opened = self._open(keys_path[: -len(".keys.json")] + ".npy", keys_path)
+            if opened is None:
+                continue
+            vectors, keys = opened
+            for i, key in enumerate(keys):
+                found.setdefault(key, vectors[i])
+        return found
+
+    def sync(self, entries: Iterable, encode: Encoder) -> None:
+        """Make the store cover `entries`, encoding only questions not embedded before."""
+        entries = list(entries)
+        keys = self._keys_for(entries)
+        with self._lock:
+            vectors, rows = self._state
+            if vectors is not None and all(key in rows for key in keys):
+                return
+            npy_path, keys_path = self._paths(self._digest(keys))
+            opened = self._open(npy_path, keys_path)
+            if opened is not None:
+                self._install(*opened)
+                return
+
+            previous = self._previous_rows()
+            by_key = {entry.content_hash: entry for entry in entries}
+            missing = [key for key in keys if key not in previous]
+            fresh: Dict[str, np.ndarray] = {}
+            if missing:
+                texts = ([by_key[key].ideal_answer for key in missing]
+                         + [by_key[key].question for key in missing])
+                encoded = np.asarray(encode(texts), dtype=np.float32)
+                n = len(missing)
+                for i, key in enumerate(missing):
+                    fresh[key] = np.stack([encoded[i], encoded[n + i]])
+            logger.info("Embedding store: %d question(s) reused, %d encoded",
+                        len(keys) - len(missing), len(missing))
+
+            vectors = np.stack([fresh[key] if key in fresh else previous[key] for key in keys])
+            vectors = vectors.astype(np.float32, copy=False)
+            os.makedirs(self.directory, exist_ok=True)
+            # Sidecar first, then the .npy: a present .npy always has its keys. Both go
+            # through unique temp files, as several workers may build the same version
+            _atomic_write(keys_path, lambda f: f.write(
+                json.dumps({"model": self.model_name, "keys": keys}).encode("utf-8")))
+            _atomic_write(npy_path, lambda f: np.save(f, vectors))
+            self._install(np.load(npy_path, mmap_mode="r"), keys)
+            self._prune(npy_path)
+
+    def _prune(self, current_npy: str) -> None:
+        files = sorted(glob.glob(os.path.join(self.directory, f"{self._prefix}-*.npy")),
+                       key=os.path.getmtime, reverse=True)
+        keep = {current_npy} | set(files[:_KEEP_FILES])
+        for npy_path in files:
+            if npy_path in keep:
+                continue
+            for path in (npy_path, npy_path[: -len(".npy")] + ".keys.json"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def vectors(
+        self, entry, entries: Callable[[], Iterable], encode: Encoder
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """(ideal_vector, question_vector) for a catalog entry, syncing the store on a miss."""
+        vectors, rows = self._state
+        row = rows.get(entry.content_hash)
+        if vectors is None or row is None:
+            # Include the entry itself in case the catalog reloaded since it was looked up
+            self.sync([*entries(), entry], encode)
+            vectors, rows = self._state
+            row = rows[entry.content_hash]
+        pair = vectors[row]
+        return pair[0], pair[1]
+
+
+def cosine_rows(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Cosine similarity of each row of `a` with the same row of `b` (0 for all-zero rows)."""
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    denom = np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1)
+    dots = np.einsum("ij,ij->i", a, b)
+    return np.divide(dots, denom, out=np.zeros_like(dots), where=denom > 0)
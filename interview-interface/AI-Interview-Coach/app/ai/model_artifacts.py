@@ -0,0 +1,85 @@
+import os
+import json
+import hashlib
+import logging
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+
+
+class ArtifactError(RuntimeError):
+    """A local model directory is incomplete or does not match its manifest."""
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_digests(directory: str) -> Dict[str, str]:
+    """sha256 of every file under `directory` (relative POSIX paths), excluding the manifest."""
+    digests = {}
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, directory).replace(os.sep, "/")
+            if rel != MANIFEST:
+                digests[rel] = _sha256(path)
+    return dict(sorted(digests.items()))
+
+
+def write_manifest(directory: str, model_name: str) -> str:
+    path = os.path.join(directory, MANIFEST)
+    manifest = {"model": model_name, "files": file_digests(directory)}
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+    return path
+
+
+def has_manifest(directory: str) -> bool:
+    return os.path.isfile(os.path.join(directory, MANIFEST))
+
+
+def verify_manifest(directory: str, model_name: str = "") -> None:
+    """Raise ArtifactError unless every file listed in the manifest is present and unchanged."""
+    try:
+        with open(os.path.join(directory, MANIFEST), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        expected = manifest["files"]
+    except (OSError, ValueError, KeyError) as e:
+        raise ArtifactError(f"Unreadable manifest in {directory}: {e}") from e
+    if model_name and manifest.get("model") != model_name:
+        raise ArtifactError(
+            f"{directory} holds {manifest.get('model')!r}, expected {model_name!r}"
+        )
+    for rel, digest in expected.items():
+        path = os.path.join(directory, *rel.split("/"))
+        if not os.path.isfile(path):
+            raise ArtifactError(f"{directory} is missing {rel}")
+        if _sha256(path) != digest:
+            raise ArtifactError(f"Checksum mismatch for {rel} in {directory}")
+
+
+def resolve_model_source(model_name: str, model_dir: str) -> str:
+    """The verified local directory for `model_name` if one exists, else the hub name."""
+    if model_dir and has_manifest(model_dir):
+        verify_manifest(model_dir, model_name)
+        return model_dir
+    logger.warning("No local model artifact in %s; %s may be downloaded from the model hub "
+                   "(run `flask --app wsgi download-model`)", model_dir, model_name)
+    return model_name
+
+
+def download_model(model_name: str, model_dir: str) -> str:
+    """Fetch `model_name` once, save it to `model_dir` and write its checksum manifest."""
+    from sentence_transformers import SentenceTransformer
+
+    SentenceTransformer(model_name).save(model_dir)
+    return write_manifest(model_dir, model_name)
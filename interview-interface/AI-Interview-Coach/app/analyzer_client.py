@@ -0,0 +1,371 @@
+import os
+import json
+import time
+import asyncio
+import random
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .async_http import AsyncConnectionPool, ConnectError, TransportError
+
+logger = logging.getLogger(__name__)
+
+# Responses worth retrying: the analyzer is restarting, overloaded or behind a failing proxy
+_RETRY_STATUSES = (502, 503, 504)
+
+
+class AnalyzerUnavailable(Exception):
+    """System B could not be reached or kept failing after retries."""
+
+
+class CircuitOpenError(AnalyzerUnavailable):
+    """Failing fast: the breaker is open after repeated failures."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Analyzer circuit open; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """closed -> open after `failure_threshold` consecutive failures -> half-open after
+    `reset_timeout` seconds (one trial call) -> closed on success, open again on failure."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self) -> None:
+        with self._lock:
+            state = self._state()
+            if state == "open" or (state == "half-open" and self._trial_running):
+                remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+                raise CircuitOpenError(max(1.0, remaining))
+            if state == "half-open":
+                self._trial_running = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def abandon(self) -> None:
+        """The call ended without a verdict (e.g. a local error); free the half-open trial."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_running:
+                    self.opened += 1
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class _AnalyzerHttpBase:
+    """Retry policy, circuit breaker and call metrics shared by the sync and async clients."""
+
+    transport = "http"
+    default_pool_size = 10
+    pool_size_env = "ANALYZER_POOL_SIZE"
+
+    def __init__(self, url: str, connect_timeout: float, read_timeout: float, retries: int,
+                 backoff: float, breaker: Optional[CircuitBreaker]):
+        self.url = url
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=1000)
+        self._stats = {"calls": 0, "attempts": 0, "retries": 0, "failures": 0,
+                       "short_circuited": 0, "latency_ms_sum": 0.0}
+
+    @classmethod
+    def from_env(cls, url: str, **kwargs):
+        breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv("ANALYZER_BREAKER_FAILURES", "5")),
+            reset_timeout=float(os.getenv("ANALYZER_BREAKER_RESET_S", "30")),
+        )
+        return cls(
+            url,
+            connect_timeout=float(os.getenv("ANALYZER_CONNECT_TIMEOUT", "2")),
+            read_timeout=float(os.getenv("ANALYZER_READ_TIMEOUT", "15")),
+            retries=int(os.getenv("ANALYZER_RETRIES", "2")),
+            pool_size=int(os.getenv(cls.pool_size_env, str(cls.default_pool_size))),
+            breaker=breaker,
+            **kwargs,
+        )
+
+    def _enter(self) -> None:
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            with self._lock:
+                self._stats["short_circuited"] += 1
+            raise
+
+    def _delay(self, attempts: int) -> float:
+        # Full jitter keeps retries from many workers from arriving in lockstep
+        return random.uniform(0, self.backoff * (2 ** (attempts - 1)))
+
+    def _give_up(self, attempts: int, error: Optional[Exception]) -> AnalyzerUnavailable:
+        self.breaker.record_failure()
+        with self._lock:
+            self._stats["failures"] += 1
+        logger.warning("Analyzer call failed after %d attempt(s): %s", attempts, error)
+        return AnalyzerUnavailable(str(error))
+
+    def _record(self, started: float, attempts: int) -> None:
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        with self._lock:
+            s = self._stats
+            s["calls"] += 1
+            s["attempts"] += attempts
+            s["retries"] += max(0, attempts - 1)
+            s["latency_ms_sum"] += elapsed_ms
+            self._latencies.append(elapsed_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            s = dict(self._stats)
+            latencies = list(self._latencies)
+        return {
+            "transport": self.transport,
+            "url": self.url,
+            "breaker": self.breaker.state,
+            "breaker_opened": self.breaker.opened,
+            "calls": s["calls"],
+            "attempts": s["attempts"],
+            "retries": s["retries"],
+            "failures": s["failures"],
+            "short_circuited": s["short_circuited"],
+            **_latency_summary(latencies, s["latency_ms_sum"], s["calls"]),
+        }
+
+
+class AnalyzerClient(_AnalyzerHttpBase):
+    """Shared HTTP client for System B (the analyzer).
+
+    One keep-alive ``requests.Session`` with a bounded connection pool, separate
+    connect/read timeouts, up to ``retries`` extra attempts with full-jitter
+    exponential backoff (only for idempotent calls), and a circuit breaker so a
+    dead analyzer costs callers a fast error instead of a hung worker.
+    """
+
+    def __init__(self, url: str, connect_timeout: float = 2.0, read_timeout: float = 15.0,
+                 retries: int = 2, backoff: float = 0.1, pool_size: int = 10,
+                 breaker: Optional[CircuitBreaker] = None):
+        super().__init__(url, connect_timeout, read_timeout, retries, backoff, breaker)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def post_json(self, payload: Dict[str, Any], idempotent: bool = True) -> Tuple[int, Any]:
+        """POST `payload` to the analyzer; returns (status code, decoded JSON body).
+
+        Raises CircuitOpenError while the breaker is open and AnalyzerUnavailable
+        when every attempt failed to produce a non-5xx response.
+        """
+        self._enter()
+        started = time.perf_counter()
+        attempts = 0
+        error: Optional[Exception] = None
+        verdict = False
+        try:
+            while True:
+                attempts += 1
+                try:
+                    response = self.session.post(self.url, json=payload,
+                                                 timeout=(self.connect_timeout, self.read_timeout))
+                except requests.ConnectTimeout as e:
+                    error = e  # never reached the server: always safe to retry
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = e
+                    if not idempotent:
+                        break
+                else:
+                    if response.status_code not in _RETRY_STATUSES:
+                        verdict = True
+                        self.breaker.record_success()
+                        return response.status_code, _json_or_error(response)
+                    error = AnalyzerUnavailable(f"analyzer returned {response.status_code}")
+                    if not idempotent:
+                        break
+                if attempts > self.retries:
+                    break
+                time.sleep(self._delay(attempts))
+            verdict = True
+            raise self._give_up(attempts, error) from error
+        finally:
+            if not verdict:
+                self.breaker.abandon()
+            self._record(started, attempts)
+
+
+class AsyncAnalyzerClient(_AnalyzerHttpBase):
+    """asyncio twin of AnalyzerClient, for the ASGI front end.
+
+    Waiting on the analyzer holds no thread, so one process can keep thousands of
+    submissions in flight; ``pool_size`` bounds the sockets to System B and extra
+    requests queue for a pooled connection for up to ``pool_timeout`` seconds.
+    """
+
+    transport = "http-async"
+    default_pool_size = 200
+    # Its own setting: a pool sized for threaded front ends would cap this one at a few sockets
+    pool_size_env = "ANALYZER_ASYNC_POOL_SIZE"
+
+    def __init__(self, url: str, connect_timeout: float = 2.0, read_timeout: float = 15.0,
+                 retries: int = 2, backoff: float = 0.1, pool_size: int = 200,
+                 breaker: Optional[CircuitBreaker] = None, pool_timeout: float = 30.0):
+        super().__init__(url, connect_timeout, read_timeout, retries, backoff, breaker)
+        self.pool = AsyncConnectionPool(url, max_connections=pool_size,
+                                        connect_timeout=connect_timeout,
+                                        read_timeout=read_timeout, pool_timeout=pool_timeout)
+
+    async def post_json(self, payload: Dict[str, Any],
+                        idempotent: bool = True) -> Tuple[int, Any]:
+        self._enter()
+        started = time.perf_counter()
+        attempts = 0
+        error: Optional[Exception] = None
+        verdict = False
+        body = json.dumps(payload).encode("utf-8")
+        try:
+            while True:
+                attempts += 1
+                try:
+                    response = await self.pool.post(body)
+                except ConnectError as e:
+                    error = e  # the request never reached System B
+                except TransportError as e:
+                    error = e
+                    if not idempotent:
+                        break
+                else:
+                    if response.status_code not in _RETRY_STATUSES:
+                        verdict = True
+                        self.breaker.record_success()
+                        return response.status_code, _json_or_error(response)
+                    error = AnalyzerUnavailable(f"analyzer returned {response.status_code}")
+                    if not idempotent:
+                        break
+                if attempts > self.retries:
+                    break
+                await asyncio.sleep(self._delay(attempts))
+            verdict = True
+            raise self._give_up(attempts, error) from error
+        finally:
+            if not verdict:
+                self.breaker.abandon()
+            self._record(started, attempts)
+
+    async def aclose(self) -> None:
+        await self.pool.aclose()
+
+
+class InProcessAnalyzer:
+    """Same interface and response shapes as AnalyzerClient, but scores in this process.
+
+    Skips loopback HTTP, JSON and System B's Flask stack by calling
+    ``analyze_answer`` directly; the model is loaded here on first use.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=1000)
+        self._stats = {"calls": 0, "failures": 0, "latency_ms_sum": 0.0}
+
+    def post_json(self, payload: Dict[str, Any], idempotent: bool = True) -> Tuple[int, Any]:
+        from .ai.analyzer_service import analyze_answer
+
+        question = str(payload.get("question") or "").strip()
+        answer = str(payload.get("answer") or "").strip()
+        started = time.perf_counter()
+        failed = False
+        try:
+            result = analyze_answer(question, answer)
+        except Exception as e:
+            failed = True
+            logger.exception("In-process analysis failed")
+            raise AnalyzerUnavailable(str(e)) from e
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+            with self._lock:
+                self._stats["calls"] += 1
+                self._stats["failures"] += int(failed)
+                self._stats["latency_ms_sum"] += elapsed_ms
+                self._latencies.append(elapsed_ms)
+        # Mirror System B's /analyze: 400 for validation errors, 200 otherwise
+        return (400 if "error" in result else 200), result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            s = dict(self._stats)
+            latencies = list(self._latencies)
+        return {
+            "transport": "inprocess",
+            "calls": s["calls"],
+            "failures": s["failures"],
+            **_latency_summary(latencies, s["latency_ms_sum"], s["calls"]),
+        }
+
+
+def analyzer_from_env(url: str):
+    """ANALYZER_TRANSPORT=inprocess scores in this process; anything else uses HTTP to `url`."""
+    if os.getenv("ANALYZER_TRANSPORT", "http").lower() == "inprocess":
+        if os.getenv("WARMUP", "1") != "0":
+            from .ai.analyzer_service import start_warmup
+            start_warmup()  # load the model now rather than on the first answer
+        return InProcessAnalyzer()
+    return AnalyzerClient.from_env(url)
+
+
+def _latency_summary(latencies, total_ms: float, calls: int) -> Dict[str, float]:
+    ordered = sorted(latencies)
+
+    def pct(p: float) -> float:
+        if not ordered:
+            return 0.0
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 3)
+
+    return {
+        "avg_latency_ms": round(total_ms / calls, 3) if calls else 0.0,
+        "p50_latency_ms": pct(0.50),
+        "p95_latency_ms": pct(0.95),
+        "p99_latency_ms": pct(0.99),
+    }
+
+
+def _json_or_error(response) -> Any:
+    try:
+        return response.json()
+    except ValueError:
+        return {"error": "Analyzer returned a non-JSON response."}
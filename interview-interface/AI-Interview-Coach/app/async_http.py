@@ -0,0 +1,182 @@
+"""Minimal asyncio HTTP/1.1 keep-alive pool for the ASGI front end's calls to System B.
+
+httpx's connection pool re-checks every pooled socket on each request, which on
+a small box costs more CPU than the proxying itself. The analyzer only needs
+POSTs to one origin with small JSON bodies, so this keeps a LIFO stack of idle
+connections, a semaphore bounding open sockets, and reads Content-Length,
+chunked or close-delimited responses.
+"""
+import ssl
+import json
+import asyncio
+from urllib.parse import urlsplit
+from typing import Any, List, Optional, Tuple
+
+
+class TransportError(Exception):
+    """The request did not produce a complete HTTP response."""
+
+
+class ConnectError(TransportError):
+    """No connection to the server; the request was never sent."""
+
+
+class ConnectTimeout(ConnectError):
+    pass
+
+
+class ReadTimeout(TransportError):
+    pass
+
+
+class PoolTimeout(TransportError):
+    """Every connection stayed busy for the whole pool timeout."""
+
+
+class _Disconnected(TransportError):
+    # The server closed the connection before sending a status line
+    pass
+
+
+class Response:
+    def __init__(self, status_code: int, content: bytes):
+        self.status_code = status_code
+        self.content = content
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+
+_Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+class AsyncConnectionPool:
+    """Keep-alive connections to the origin of `url`, at most `max_connections` open."""
+
+    def __init__(self, url: str, max_connections: int = 200, connect_timeout: float = 2.0,
+                 read_timeout: float = 15.0, pool_timeout: float = 30.0):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.ssl = ssl.create_default_context() if parts.scheme == "https" else None
+        self.path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self.host_header = parts.netloc
+        self.max_connections = max(1, max_connections)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_timeout = pool_timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots = asyncio.Semaphore(self.max_connections)
+        self._idle: List[_Connection] = []
+
+    def _bind_loop(self) -> None:
+        # Streams and semaphores belong to one event loop; start over on a new one
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.max_connections)
+            self._idle = []
+
+    async def post(self, body: bytes, content_type: str = "application/json") -> Response:
+        self._bind_loop()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.pool_timeout)
+        except asyncio.TimeoutError:
+            raise PoolTimeout(f"no free connection to {self.host_header} "
+                              f"within {self.pool_timeout}s") from None
+        try:
+            head = (f"POST {self.path} HTTP/1.1\r\nHost: {self.host_header}\r\n"
+                    f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                    "\r\n").encode("latin-1")
+            while self._idle:
+                conn = self._idle.pop()
+                try:
+                    return await self._exchange(conn, head + body)
+                except _Disconnected:
+                    continue  # idle connection closed by the server; the request was not seen
+            return await self._exchange(await self._connect(), head + body)
+        finally:
+            self._slots.release()
+
+    async def _connect(self) -> _Connection:
+        try:
+            return await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port, ssl=self.ssl),
+                self.connect_timeout,
+            )
+        except asyncio.TimeoutError:
+            raise ConnectTimeout(f"connect to {self.host_header} timed out") from None
+        except OSError as e:
+            raise ConnectError(f"connect to {self.host_header} failed: {e}") from e
+
+    async def _exchange(self, conn: _Connection, request: bytes) -> Response:
+        reader, writer = conn
+        try:
+            writer.write(request)
+            status, content, keep_alive = await asyncio.wait_for(
+                self._read_response(reader), self.read_timeout
+            )
+        except asyncio.TimeoutError:
+            writer.close()
+            raise ReadTimeout(f"no response from {self.host_header} "
+                              f"within {self.read_timeout}s") from None
+        except TransportError:
+            writer.close()
+            raise
+        except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+            writer.close()
+            raise TransportError(f"bad response from {self.host_header}: {e!r}") from e
+        except BaseException:
+            # Cancelled mid-exchange (client disconnect, outer timeout): the connection
+            # may hold a partial response, so it can be neither reused nor left open
+            writer.close()
+            raise
+        if keep_alive:
+            self._idle.append(conn)
+        else:
+            writer.close()
+        return Response(status, content)
+
+    async def _read_response(self, reader: asyncio.StreamReader) -> Tuple[int, bytes, bool]:
+        try:
+            status_line = await reader.readline()
+        except ConnectionResetError as e:
+            raise _Disconnected("connection reset") from e
+        if not status_line:
+            raise _Disconnected("connection closed")
+        version, status = status_line.split(None, 2)[:2]
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip().lower()
+
+        connection = headers.get("connection", "")
+        keep_alive = (connection != "close" if version == b"HTTP/1.1"
+                      else connection == "keep-alive")
+        if headers.get("transfer-encoding", "").endswith("chunked"):
+            content = await self._read_chunked(reader)
+        elif "content-length" in headers:
+            content = await reader.readexactly(int(headers["content-length"]))
+        else:
+            content, keep_alive = await reader.read(), False
+        return int(status), content, keep_alive
+
+    @staticmethod
+    async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                while await reader.readline() not in (b"\r\n", b"\n", b""):
+                    pass  # trailers
+                return b"".join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+    async def aclose(self) -> None:
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
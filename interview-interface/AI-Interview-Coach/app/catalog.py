@@ -0,0 +1,156 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from .utils.text import derive_key_terms, extract_concept, normalize_question
+
+logger = logging.getLogger(__name__)
+
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_QUESTIONS_PATH = os.path.join(_PROJECT_DIR, "questions.json")
+
+
+def content_hash(question: str, ideal_answer: str = "") -> str:
+    """Stable id of a question: unchanged when questions.json is reordered or extended."""
+    return hashlib.sha256(f"{question}\0{ideal_answer}".encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class QuestionEntry:
+    question: str
+    ideal_answer: str
+    category: str
+    position: int
+    normalized: str
+    concept: str
+    key_terms: Tuple[str, ...]
+    keywords: Tuple[str, ...]
+    # Changes with the question or its ideal answer; keys derived data such as embeddings
+    content_hash: str
+
+
+class _Snapshot:
+    """One parsed questions.json with its indexes. Never mutated after construction."""
+
+    def __init__(self, data: Dict[str, List[Dict[str, str]]], mtime_ns: int, size: int):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.by_category: Dict[str, Tuple[QuestionEntry, ...]] = {}
+        self.by_text: Dict[str, QuestionEntry] = {}
+        self.by_normalized: Dict[str, QuestionEntry] = {}
+        self.by_concept: Dict[str, Tuple[QuestionEntry, ...]] = {}
+        concepts: Dict[str, List[QuestionEntry]] = {}
+        for category, items in data.items():
+            entries = []
+            for position, item in enumerate(items):
+                text = item["question"]
+                ideal = item.get("ideal_answer", "")
+                key_terms = tuple(derive_key_terms(ideal)) if ideal else ()
+                entry = QuestionEntry(
+                    question=text,
+                    ideal_answer=ideal,
+                    category=category,
+                    position=position,
+                    normalized=normalize_question(text),
+                    concept=extract_concept(text),
+                    key_terms=key_terms,
+                    # questions.json may carry explicit keywords; otherwise reuse the key terms
+                    keywords=tuple(item.get("keywords") or key_terms),
+                    content_hash=content_hash(text, ideal),
+                )
+                entries.append(entry)
+                # First occurrence wins, matching the old category-order linear scan
+                self.by_text.setdefault(text, entry)
+                self.by_normalized.setdefault(entry.normalized, entry)
+                concepts.setdefault(entry.concept, []).append(entry)
+            self.by_category[category] = tuple(entries)
+        self.by_concept = {concept: tuple(entries) for concept, entries in concepts.items()}
+
+    def matches(self, st: os.stat_result) -> bool:
+        return (self.mtime_ns, self.size) == (st.st_mtime_ns, st.st_size)
+
+
+class QuestionCatalog:
+    """questions.json loaded once and indexed by text, normalized text, category and concept.
+
+    Every lookup stats the file (cheap) and, if its mtime or size changed,
+    parses it into a fresh snapshot that replaces the old one in a single
+    assignment. Readers always see either the old or the new catalog, never a
+    mix; a file that fails to parse (e.g. mid-write) keeps the old snapshot.
+    """
+
+    def __init__(self, path: str = DEFAULT_QUESTIONS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._snapshot: Optional[_Snapshot] = None
+
+    def _current(self) -> _Snapshot:
+        snapshot = self._snapshot
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            if snapshot is None:
+                raise
+            return snapshot
+        if snapshot is not None and snapshot.matches(st):
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.matches(st):
+                return snapshot
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                fresh = _Snapshot(data, st.st_mtime_ns, st.st_size)
+            except (OSError, ValueError, KeyError, TypeError, AttributeError):
+                if snapshot is None:
+                    raise
+                logger.warning("Could not reload %s; keeping the previous question catalog",
+                               self.path, exc_info=True)
+                return snapshot
+            if snapshot is not None:
+                logger.info("Reloaded question catalog from %s", self.path)
+            self._snapshot = fresh
+            return fresh
+
+    def categories(self) -> List[str]:
+        return list(self._current().by_category)
+
+    def questions(self, category: str) -> Tuple[QuestionEntry, ...]:
+        return self._current().by_category.get(category, ())
+
+    def has_category(self, category: str) -> bool:
+        return category in self._current().by_category
+
+    def get(self, question_text: str) -> Optional[QuestionEntry]:
+        """Entry for a question: exact text first, then normalized (case, punctuation, spacing)."""
+        snapshot = self._current()
+        entry = snapshot.by_text.get(question_text)
+        if entry is None and question_text:
+            entry = snapshot.by_normalized.get(normalize_question(question_text))
+        return entry
+
+    def by_concept(self, concept: str) -> Tuple[QuestionEntry, ...]:
+        return self._current().by_concept.get(concept, ())
+
+    def entries(self) -> List[QuestionEntry]:
+        """Every question, in category then position order."""
+        return [entry for entries in self._current().by_category.values() for entry in entries]
+
+
+_catalog: Optional[QuestionCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> QuestionCatalog:
+    """Process-wide catalog for QUESTIONS_PATH (defaults to the project's questions.json)."""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = QuestionCatalog(os.getenv("QUESTIONS_PATH", DEFAULT_QUESTIONS_PATH))
+    return _catalog
@@ -0,0 +1,607 @@
+import os
+import time
+import atexit
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DB_PATH = os.path.join(_PROJECT_DIR, ".cache", "progress.sqlite3")
+
+# Weight of the newest score in a concept's moving average
+EWMA_ALPHA = 0.3
+
+
+@dataclass(frozen=True, slots=True)
+class ConceptStats:
+    """Running aggregate of one user's scores on one concept: fixed size however many answers."""
+
+    count: int = 0
+    total: float = 0.0
+    ewma: float = 0.0
+    last_seen: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def add(self, score: float, when: float) -> "ConceptStats":
+        ewma = score if not self.count else EWMA_ALPHA * score + (1 - EWMA_ALPHA) * self.ewma
+        return ConceptStats(self.count + 1, self.total + score, ewma, max(self.last_seen, when))
+
+
+@dataclass
+class Progress:
+    """One user's practice history. Snapshots handed out by a store must not be mutated.
+
+    ``used_by_cat`` holds a bitset per category and ``last_question_by_cat``
+    the bit of the latest pick. The store gives each question its bit, keyed on
+    the catalog content hash rather than the position in questions.json, so
+    callers ask the store (``has_used``, ``is_last``, ``mark_used``) by key.
+    """
+
+    concepts: Dict[str, ConceptStats] = field(default_factory=dict)
+    used_by_cat: Dict[str, int] = field(default_factory=dict)
+    last_question_by_cat: Dict[str, int] = field(default_factory=dict)
+
+    def is_used(self, category: str, bit: int) -> bool:
+        return bool(self.used_by_cat.get(category, 0) >> bit & 1)
+
+    def with_scores(self, scores: Iterable[Tuple[str, float, float]]) -> "Progress":
+        """A copy with (concept, score, timestamp) samples folded into the aggregates."""
+        concepts = dict(self.concepts)
+        for concept, score, when in scores:
+            concepts[concept] = concepts.get(concept, ConceptStats()).add(score, when)
+        return Progress(concepts, self.used_by_cat, self.last_question_by_cat)
+
+    def with_question(self, category: str, bit: int, reset: bool = False) -> "Progress":
+        used = dict(self.used_by_cat)
+        used[category] = (0 if reset else used.get(category, 0)) | (1 << bit)
+        last = dict(self.last_question_by_cat)
+        last[category] = bit
+        return Progress(self.concepts, used, last)
+
+
+class IdleLRU:
+    """Ordered by last access; entries beyond ``max_entries`` or idle for ``ttl_s`` are dropped.
+
+    Not thread-safe: callers hold their own lock. ``max_entries`` <= 0 stores nothing
+    and ``ttl_s`` <= 0 disables the idle timeout.
+    """
+
+    def __init__(self, max_entries: int, ttl_s: float = 0.0):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        self.evict_idle()
+        item = self._data.get(key)
+        if item is None:
+            return None
+        self._data[key] = (time.monotonic(), item[1])
+        self._data.move_to_end(key)
+        return item[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        self._data[key] = (time.monotonic(), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+        self.evict_idle()
+
+    def evict_idle(self) -> None:
+        if self.ttl_s <= 0:
+            return
+        cutoff = time.monotonic() - self.ttl_s
+        while self._data:
+            touched, _ = next(iter(self._data.values()))
+            if touched > cutoff:
+                break
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class ProgressStore(ABC):
+    """Where user progress lives. Scores may be buffered; question picks are written through."""
+
+    @abstractmethod
+    def load(self, user_id: str) -> Optional[Progress]:
+        """The user's progress, or None for an unknown user."""
+
+    @abstractmethod
+    def ensure_user(self, user_id: str) -> Progress:
+        """The user's progress, creating an empty profile for an unknown user."""
+
+    @abstractmethod
+    def add_scores(self, user_id: str, scores: Iterable[Tuple[str, float]]) -> None:
+        """Fold (concept, score) pairs into the user's per-concept aggregates."""
+
+    @abstractmethod
+    def mark_used(self, user_id: str, category: str, key: str, reset: bool = False) -> None:
+        """Mark question `key` used in `category` (clearing the others if `reset`)."""
+
+    @abstractmethod
+    def question_bit(self, category: str, key: str) -> Optional[int]:
+        """Bit of question `key`, or None if it is set in no profile this store returned."""
+
+    def has_used(self, progress: Progress, category: str, key: str) -> bool:
+        bit = self.question_bit(category, key)
+        return bit is not None and progress.is_used(category, bit)
+
+    def is_last(self, progress: Progress, category: str, key: str) -> bool:
+        bit = self.question_bit(category, key)
+        return bit is not None and progress.last_question_by_cat.get(category) == bit
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+    def stats(self) -> Dict[str, float]:
+        return {}
+
+
+class MemoryProgressStore(ProgressStore):
+    """Per-process store for one worker and tests; lost on restart.
+
+    At most ``max_users`` profiles are kept and a profile untouched for
+    ``idle_ttl_s`` is forgotten, so memory stays bounded under churn. Question
+    bits are assigned in order of first use per category, as in SQLite's
+    question_bits table.
+    """
+
+    def __init__(self, max_users: int = 10000, idle_ttl_s: float = 3600.0):
+        self._lock = threading.Lock()
+        self._users = IdleLRU(max_users, idle_ttl_s)
+        self._question_bits: Dict[str, Dict[str, int]] = {}
+
+    def load(self, user_id: str) -> Optional[Progress]:
+        with self._lock:
+            return self._users.get(user_id)
+
+    def ensure_user(self, user_id: str) -> Progress:
+        with self._lock:
+            progress = self._users.get(user_id)
+            if progress is None:
+                progress = Progress()
+                self._users.put(user_id, progress)
+            return progress
+
+    def add_scores(self, user_id: str, scores: Iterable[Tuple[str, float]]) -> None:
+        now = time.time()
+        with self._lock:
+            progress = self._users.get(user_id) or Progress()
+            self._users.put(user_id, progress.with_scores(
+                (concept, float(score), now) for concept, score in scores))
+
+    def mark_used(self, user_id: str, category: str, key: str, reset: bool = False) -> None:
+        with self._lock:
+            bits = self._question_bits.setdefault(category, {})
+            bit = bits.setdefault(key, len(bits))
+            progress = self._users.get(user_id) or Progress()
+            self._users.put(user_id, progress.with_question(category, bit, reset))
+
+    def question_bit(self, category: str, key: str) -> Optional[int]:
+        with self._lock:
+            return self._question_bits.get(category, {}).get(key)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            self._users.evict_idle()
+            return {"backend": "memory", "users": len(self._users),
+                    "evictions": self._users.evictions}
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS concept_stats (
+    user_id TEXT NOT NULL,
+    concept TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    total REAL NOT NULL,
+    ewma REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    PRIMARY KEY (user_id, concept)
+);
+CREATE TABLE IF NOT EXISTS question_bits (
+    category TEXT NOT NULL,
+    question_key TEXT NOT NULL,
+    bit INTEGER NOT NULL,
+    PRIMARY KEY (category, question_key),
+    UNIQUE (category, bit)
+);
+CREATE TABLE IF NOT EXISTS used_bits (
+    user_id TEXT NOT NULL,
+    category TEXT NOT NULL,
+    bits BLOB NOT NULL,
+    last_bit INTEGER NOT NULL,
+    PRIMARY KEY (user_id, category)
+);
+"""
+
+
+def _to_blob(bits: int) -> bytes:
+    return bits.to_bytes(max(1, (bits.bit_length() + 7) // 8), "little")
+
+
+def _from_blob(blob: bytes) -> int:
+    return int.from_bytes(blob, "little")
+
+
+class SqliteProgressStore(ProgressStore):
+    """SQLite (WAL) progress shared by every worker process on the host.
+
+    Each user is a handful of fixed-size rows: one running aggregate per concept
+    and one used-question bitset per category. A question key gets its bit the
+    first time it is asked; the bit is shared by every user and never reassigned,
+    so editing questions.json leaves the bitsets valid. Scores go to an in-process
+    write-behind buffer that a background thread folds into the aggregates every
+    ``flush_interval_ms`` or once ``flush_batch`` rows are queued, one
+    transaction per flush; a crash can lose at most that window. Question picks
+    are written immediately so the next request, on any worker, never repeats a
+    question. Reads go through an LRU of up to ``cache_users`` profiles (dropped
+    after ``cache_ttl_s`` idle), each validated against the user's row version
+    (bumped by every write, from any process) and merged with this process's
+    unflushed scores.
+    """
+
+    def __init__(self, path: str, flush_interval_ms: float = 200.0, flush_batch: int = 256,
+                 cache_users: int = 10000, cache_ttl_s: float = 3600.0):
+        self.path = path
+        self.flush_interval = max(0.001, flush_interval_ms / 1000.0)
+        self.flush_batch = max(1, flush_batch)
+        self.cache_users = max(0, cache_users)
+        self.cache_ttl_s = cache_ttl_s
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._reset_process_state()
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+            self._migrate(conn)
+        finally:
+            conn.close()
+        # Connections, buffered rows and the flusher thread never cross a fork
+        os.register_at_fork(after_in_child=self._reset_process_state)
+        atexit.register(self.close)
+
+    def _reset_process_state(self) -> None:
+        self._local = threading.local()
+        self._lock = threading.Lock()  # buffer, cache and counters
+        self._flushed = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()  # one flush at a time; readers never take it
+        # Rows stay buffered until their flush commits. The sequence is odd from that
+        # COMMIT until they leave the buffer, while they may be in both places.
+        self._pending: List[Tuple[str, str, float, float]] = []
+        self._flush_seq = 0
+        # question_bits as read so far, by category: key -> bit, and a mask of those bits.
+        # Replaced on update, never mutated, so readers need no lock.
+        self._bits: Dict[str, Dict[str, int]] = {}
+        self._known_bits: Dict[str, int] = {}
+        self._cache = IdleLRU(self.cache_users, self.cache_ttl_s)
+        self._wake = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._closed = False
+        self._stats = {
+            "buffered": 0,
+            "flushes": 0,
+            "rows_flushed": 0,
+            "flush_errors": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+        }
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection) -> None:
+        # Every worker opens the store at startup: check and convert under one write lock,
+        # so a worker never looks for a table that another one has just dropped
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master "
+                                                       "WHERE type = 'table'")}
+            rows = None
+            # Databases written before aggregation kept every score and asked question as a
+            # row; those recorded question text, so users start their rotation afresh
+            if "scores" in tables:
+                rows = conn.execute("SELECT user_id, concept, score, created_at FROM scores "
+                                    "ORDER BY rowid").fetchall()
+                SqliteProgressStore._fold_scores(conn, rows)
+            # Bitsets by position in questions.json went wrong whenever the file changed
+            stale = [t for t in ("scores", "used_questions", "last_questions", "used_positions")
+                     if t in tables]
+            for table in stale:
+                conn.execute(f"DROP TABLE {table}")
+            if stale:
+                conn.execute("UPDATE users SET version = version + 1")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        if rows is not None:
+            logger.info("Folded %d stored scores into per-concept aggregates", len(rows))
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def load(self, user_id: str) -> Optional[Progress]:
+        while True:
+            with self._lock:
+                while self._flush_seq % 2:
+                    self._flushed.wait()
+                seq = self._flush_seq
+            progress = self._read(user_id)
+            with self._lock:
+                # A flush that committed meanwhile may be in this snapshot and the buffer
+                if self._flush_seq == seq:
+                    pending = [(c, s, t) for u, c, s, t in self._pending if u == user_id]
+                    break
+        if pending:
+            return (progress or Progress()).with_scores(pending)
+        return progress
+
+    def _read(self, user_id: str) -> Optional[Progress]:
+        conn = self._conn()
+        conn.execute("BEGIN")  # one snapshot for the version and the rows it covers
+        try:
+            row = conn.execute("SELECT version FROM users WHERE user_id = ?",
+                               (user_id,)).fetchone()
+            if row is None:
+                return None
+            version = row[0]
+            with self._lock:
+                cached = self._cache.get(user_id)
+                if cached is not None and cached[0] == version:
+                    self._stats["cache_hits"] += 1
+                    return cached[1]
+                self._stats["cache_misses"] += 1
+
+            progress = Progress()
+            for concept, count, total, ewma, last_seen in conn.execute(
+                    "SELECT concept, count, total, ewma, last_seen FROM concept_stats "
+                    "WHERE user_id = ?", (user_id,)):
+                progress.concepts[concept] = ConceptStats(count, total, ewma, last_seen)
+            for category, bits, last_bit in conn.execute(
+                    "SELECT category, bits, last_bit FROM used_bits WHERE user_id = ?",
+                    (user_id,)).fetchall():
+                progress.used_by_cat[category] = _from_blob(bits)
+                progress.last_question_by_cat[category] = last_bit
+                self._learn_bits(conn, category, progress.used_by_cat[category])
+        finally:
+            conn.execute("COMMIT")
+
+        with self._lock:
+            self._cache.put(user_id, (version, progress))
+        return progress
+
+    def ensure_user(self, user_id: str) -> Progress:
+        progress = self.load(user_id)
+        if progress is None:
+            self._conn().execute(
+                "INSERT OR IGNORE INTO users (user_id, version, created_at) VALUES (?, 0, ?)",
+                (user_id, time.time()))
+            progress = self.load(user_id) or Progress()
+        return progress
+
+    def add_scores(self, user_id: str, scores: Iterable[Tuple[str, float]]) -> None:
+        now = time.time()
+        rows = [(user_id, concept, float(score), now) for concept, score in scores]
+        if not rows:
+            return
+        with self._lock:
+            self._pending.extend(rows)
+            self._stats["buffered"] += len(rows)
+            full = len(self._pending) >= self.flush_batch
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop,
+                                                 name="progress-flusher", daemon=True)
+                self._flusher.start()
+        if full:
+            self._wake.set()
+
+    def mark_used(self, user_id: str, category: str, key: str, reset: bool = False) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            bit = self._bit_for(conn, category, key)
+            row = conn.execute("SELECT bits FROM used_bits WHERE user_id = ? AND category = ?",
+                               (user_id, category)).fetchone()
+            bits = 0 if reset or row is None else _from_blob(row[0])
+            conn.execute("INSERT OR REPLACE INTO used_bits "
+                         "(user_id, category, bits, last_bit) VALUES (?, ?, ?, ?)",
+                         (user_id, category, _to_blob(bits | (1 << bit)), bit))
+            self._bump_versions(conn, [user_id])
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def question_bit(self, category: str, key: str) -> Optional[int]:
+        # Reading a profile learns the keys of all its bits, so a key unknown here is
+        # unused in every profile this store returned
+        return self._bits.get(category, {}).get(key)
+
+    def _bit_for(self, conn: sqlite3.Connection, category: str, key: str) -> int:
+        # Called inside a write transaction, which serializes assigning the next free bit
+        bit = self.question_bit(category, key)
+        if bit is None:
+            conn.execute("INSERT OR IGNORE INTO question_bits (category, question_key, bit) "
+                         "SELECT ?, ?, COALESCE(MAX(bit) + 1, 0) FROM question_bits "
+                         "WHERE category = ?", (category, key, category))
+            bit = conn.execute("SELECT bit FROM question_bits "
+                               "WHERE category = ? AND question_key = ?",
+                               (category, key)).fetchone()[0]
+            self._remember_bits(category, [(bit, key)])
+        return bit
+
+    def _learn_bits(self, conn: sqlite3.Connection, category: str, bits: int) -> None:
+        # Bits assigned by other processes since the last look are read from the database
+        if bits & ~self._known_bits.get(category, 0):
+            self._remember_bits(category, conn.execute(
+                "SELECT bit, question_key FROM question_bits WHERE category = ?", (category,)))
+
+    def _remember_bits(self, category: str, rows: Iterable[Tuple[int, str]]) -> None:
+        rows = list(rows)
+        with self._lock:
+            bits, known = dict(self._bits.get(category, {})), self._known_bits.get(category, 0)
+            for bit, key in rows:
+                bits[key] = bit
+                known |= 1 << bit
+            self._bits[category], self._known_bits[category] = bits, known
+
+    @staticmethod
+    def _bump_versions(conn: sqlite3.Connection, user_ids: Iterable[str]) -> None:
+        now = time.time()
+        rows = [(u,) for u in set(user_ids)]
+        conn.executemany("INSERT OR IGNORE INTO users (user_id, version, created_at) "
+                         "VALUES (?, 0, ?)", [(u, now) for (u,) in rows])
+        conn.executemany("UPDATE users SET version = version + 1 WHERE user_id = ?", rows)
+
+    @staticmethod
+    def _fold_scores(conn: sqlite3.Connection,
+                     rows: List[Tuple[str, str, float, float]]) -> None:
+        # Called inside a write transaction; rows are (user_id, concept, score, timestamp)
+        updated: Dict[Tuple[str, str], ConceptStats] = {}
+        for user_id, concept, score, when in rows:
+            key = (user_id, concept)
+            stats = updated.get(key)
+            if stats is None:
+                found = conn.execute("SELECT count, total, ewma, last_seen FROM concept_stats "
+                                     "WHERE user_id = ? AND concept = ?", key).fetchone()
+                stats = ConceptStats(*found) if found else ConceptStats()
+            updated[key] = stats.add(score, when)
+        conn.executemany(
+            "INSERT OR REPLACE INTO concept_stats "
+            "(user_id, concept, count, total, ewma, last_seen) VALUES (?, ?, ?, ?, ?, ?)",
+            [(u, c, s.count, s.total, s.ewma, s.last_seen) for (u, c), s in updated.items()])
+
+    def _flush_loop(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._pending)
+            if not batch:
+                return
+            try:
+                self._commit_batch(batch)
+            except sqlite3.Error:
+                logger.exception("Progress flush of %d rows failed; will retry", len(batch))
+                with self._lock:
+                    self._stats["flush_errors"] += 1
+                return
+            with self._lock:
+                self._stats["flushes"] += 1
+                self._stats["rows_flushed"] += len(batch)
+
+    def _commit_batch(self, batch: List[Tuple[str, str, float, float]]) -> None:
+        # `batch` is the head of the buffer; rows added meanwhile are appended after it
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._fold_scores(conn, batch)
+            self._bump_versions(conn, [row[0] for row in batch])
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        committed = False
+        with self._lock:
+            self._flush_seq += 1
+        try:
+            conn.execute("COMMIT")
+            committed = True
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            with self._lock:
+                if committed:
+                    del self._pending[:len(batch)]
+                self._flush_seq += 1
+                self._flushed.notify_all()
+
+    def close(self) -> None:
+        self._closed = True
+        self._wake.set()
+        self.flush()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            self._cache.evict_idle()
+            s = dict(self._stats)
+            pending, cached, evictions = len(self._pending), len(self._cache), self._cache.evictions
+        lookups = s["cache_hits"] + s["cache_misses"]
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "pending": pending,
+            "cached_users": cached,
+            "cache_evictions": evictions,
+            "buffered": s["buffered"],
+            "flushes": s["flushes"],
+            "rows_flushed": s["rows_flushed"],
+            "rows_per_flush": round(s["rows_flushed"] / s["flushes"], 2) if s["flushes"] else 0.0,
+            "flush_errors": s["flush_errors"],
+            "cache_hit_rate": round(s["cache_hits"] / lookups, 3) if lookups else 0.0,
+        }
+
+
+def progress_store_from_env() -> ProgressStore:
+    """PROGRESS_STORE=sqlite (default, at PROGRESS_DB) or memory (per process, not persisted)."""
+    cache_users = int(os.getenv("PROGRESS_CACHE_USERS", "10000"))
+    idle_ttl_s = float(os.getenv("PROGRESS_IDLE_TTL_S", "3600"))
+    if os.getenv("PROGRESS_STORE", "sqlite").lower() == "memory":
+        return MemoryProgressStore(max_users=cache_users, idle_ttl_s=idle_ttl_s)
+    return SqliteProgressStore(
+        os.getenv("PROGRESS_DB", DEFAULT_DB_PATH),
+        flush_interval_ms=float(os.getenv("PROGRESS_FLUSH_MS", "200")),
+        flush_batch=int(os.getenv("PROGRESS_FLUSH_BATCH", "256")),
+        cache_users=cache_users,
+        cache_ttl_s=idle_ttl_s,
+    )
+
+
+_store: Optional[ProgressStore] = None
+_store_lock = threading.Lock()
+
+
+def get_progress_store() -> ProgressStore:
+    """Process-wide progress store configured from the environment."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = progress_store_from_env()
+    return _store
@@ -1,28 +1,37 @@
 import os
-import json
 import logging
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from flask import Blueprint, render_template, request, jsonify, current_app, make_response
-from collections import defaultdict
 
+from .admission import ADMITTED, DEGRADED, AdmissionController
+from .catalog import get_catalog
+from .progress_store import get_progress_store
 from .utils.text import extract_concept
-from .ai.analyzer_service import analyze_answer
+from .ai.analyzer_service import (
+    analyze_answer,
+    analyze_answer_keywords,
+    analyze_answers,
+    cache_stats,
+    encoder_stats,
+    readiness,
+    start_warmup,
+)
 
 bp = Blueprint('main', __name__)
 
 logger = logging.getLogger(__name__)
 
 
-def _load_questions() -> Dict[str, List[Dict[str, str]]]:
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    with open(os.path.join(base_dir, "questions.json"), "r", encoding="utf-8") as f:
-        return json.load(f)
+# Upper bound on /submit-transcript size (a mock interview is 10-15 questions)
+MAX_TRANSCRIPT_ITEMS = 50
 
-
-questions_data = _load_questions()
-
-# In-memory user profiles (use a database like SQLite/Redis for production)
-user_profiles: Dict[str, Dict] = {}
+# Bounds model work per worker process; excess requests wait briefly, degrade or get a 503
+admission = AdmissionController(
+    max_in_flight=int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "4")),
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "16")),
+    queue_timeout_ms=float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "2000")),
+    degrade_at=int(os.getenv("DEGRADE_QUEUE_DEPTH", "0")),
+)
 
 
 def get_user_id_from_request() -> str:
@@ -36,10 +45,38 @@ def welcome():
 
 @bp.route("/interview")
 def interview():
-    categories = list(questions_data.keys())
+    categories = get_catalog().categories()
     return render_template("index.html", categories=categories)
 
 
+@bp.route("/metrics")
+def metrics():
+    return jsonify({
+        "encoder": encoder_stats(),
+        "caches": cache_stats(),
+        "startup": readiness(),
+        "admission": admission.stats(),
+        "progress": get_progress_store().stats(),
+    })
+
+
+@bp.route("/healthz")
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return jsonify({"status": "ok"})
+
+
+@bp.route("/readyz")
+def readyz():
+    """Readiness: 200 only once the model is loaded and warm."""
+    state = readiness()
+    if state["state"] == "ready":
+        return jsonify(state)
+    if state["state"] in ("idle", "failed"):
+        start_warmup()  # warm-up disabled at startup (flask run) or retrying after a failure
+    return jsonify(state), 503
+
+
 @bp.route("/thankyou")
 def thank_you():
     return render_template("thankyou.html")
@@ -48,16 +85,14 @@ def thank_you():
 @bp.route("/dashboard")
 def dashboard():
     user_id = request.cookies.get('user_id')
-    if not user_id or user_id not in user_profiles:
+    progress = get_progress_store().load(user_id) if user_id else None
+    if progress is None:
         return render_template("dashboard.html", user_skills={}, weakest_concept=None, recommended_questions=[])
 
-    profile = user_profiles[user_id]
-    concept_scores = profile.get("concept_scores", defaultdict(list))
-
     user_skills = {}
-    for concept, scores in concept_scores.items():
-        if scores:
-            avg_score = round(sum(scores) / len(scores), 1)
+    for concept, stats in progress.concepts.items():
+        if stats.count:
+            avg_score = round(stats.mean, 1)
             if avg_score > 0:
                 user_skills[concept] = avg_score
 
@@ -66,14 +101,7 @@ def dashboard():
     if user_skills:
         weakest_concept = min(user_skills, key=user_skills.get)
         # Match questions whose extracted concept equals the weakest concept for better precision
-        for category in questions_data.values():
-            for q in category:
-                if extract_concept(q["question"]) == weakest_concept:
-                    recommended_questions.append(q["question"]) 
-                    if len(recommended_questions) >= 3:
-                        break
-            if len(recommended_questions) >= 3:
-                break
+        recommended_questions = [q.question for q in get_catalog().by_concept(weakest_concept)[:3]]
 
     return render_template(
         "dashboard.html",
@@ -86,48 +114,41 @@ def dashboard():
 @bp.route("/get-question", methods=["POST"])
 def get_question():
     user_id = get_user_id_from_request()
-    if user_id not in user_profiles:
-        user_profiles[user_id] = {"concept_scores": defaultdict(list), "used_by_cat": {}, "last_question_by_cat": {}}
-
-    profile = user_profiles[user_id]
+    store = get_progress_store()
+    progress = store.ensure_user(user_id)
     body = request.get_json(silent=True) or {}
     category = body.get("category")
 
-    if not category or category not in questions_data:
+    catalog = get_catalog()
+    if not category or not catalog.has_category(category):
         return jsonify({"message": "Invalid category."})
 
-    all_questions = questions_data[category]
-    used_by_cat = profile.setdefault("used_by_cat", {})
-    last_q_by_cat = profile.setdefault("last_question_by_cat", {})
-    used = set(used_by_cat.get(category, []))
+    all_questions = catalog.questions(category)
+    candidates = [q for q in all_questions
+                  if not store.has_used(progress, category, q.content_hash)]
 
-    candidates = [q for q in all_questions if q["question"] not in used]
+    if len(candidates) > 1:
+        candidates = [q for q in candidates
+                      if not store.is_last(progress, category, q.content_hash)] or candidates
 
-    last_q = last_q_by_cat.get(category)
-    if last_q and len(candidates) > 1:
-        candidates = [q for q in candidates if q["question"] != last_q] or candidates
-
-    if not candidates:
-        used_by_cat[category] = []
-        used = set()
+    reset = not candidates
+    if reset:
         candidates = list(all_questions)
 
     scored = []
     for q in candidates:
-        concept = extract_concept(q["question"])
-        scores = profile["concept_scores"].get(concept, [5.0])
-        avg_score = sum(scores) / len(scores)
-        scored.append((q, avg_score))
+        # Target recent weakness: the moving average follows improvement faster than the mean
+        stats = progress.concepts.get(q.concept)
+        scored.append((q, stats.ewma if stats else 5.0))
 
     scored.sort(key=lambda x: x[1])
     from random import choice
     k = min(3, len(scored))
     selected = choice(scored[:k])[0]
 
-    used_by_cat.setdefault(category, []).append(selected["question"])
-    last_q_by_cat[category] = selected["question"]
+    store.mark_used(user_id, category, selected.content_hash, reset=reset)
 
-    resp = jsonify({"question": selected["question"]})
+    resp = jsonify({"question": selected.question})
     resp = make_response(resp)
     resp.set_cookie('user_id', user_id, max_age=60*60*24*30, httponly=True, samesite='Lax')
     return resp
@@ -142,20 +163,89 @@ def submit_answer():
     if not question or not answer:
         return jsonify({"error": "Missing question or answer."}), 400
 
+    decision = admission.admit()
+    if decision == DEGRADED:
+        # Keyword-only scores are rough, so they stay out of the user's skill history
+        result = analyze_answer_keywords(question, answer)
+        return jsonify(result), 400 if 'error' in result else 200
+    if decision != ADMITTED:
+        return _overloaded()
+
     try:
         result = analyze_answer(question, answer)
         if 'error' in result:
             return jsonify(result), 400
 
-        user_id = request.cookies.get('user_id')
-        if user_id and user_id in user_profiles:
-            profile = user_profiles[user_id]
-            concept = extract_concept(question)
-            score = result.get("score", 0)
-            if isinstance(score, (int, float)) and score > 0:
-                profile["concept_scores"][concept].append(float(score))
-
+        _record_scores([(question, result)])
         return jsonify(result)
     except Exception as e:
         logger.exception("Analyzer failure: %s", e)
         return jsonify({"error": "Analysis service failed."}), 500
+    finally:
+        admission.release()
+
+
+def _overloaded():
+    resp = jsonify({"error": "The coach is busy right now. Please retry shortly."})
+    resp.status_code = 503
+    resp.headers["Retry-After"] = str(admission.retry_after())
+    return resp
+
+
+def _record_scores(scored: List[Tuple[str, Dict]]) -> None:
+    """Append positive scores to the requesting user's per-concept history."""
+    user_id = request.cookies.get('user_id')
+    if not user_id:
+        return
+    catalog = get_catalog()
+    rows = []
+    for question, result in scored:
+        score = result.get("score", 0)
+        if isinstance(score, (int, float)) and score > 0:
+            entry = catalog.get(question)
+            rows.append((entry.concept if entry else extract_concept(question), float(score)))
+    get_progress_store().add_scores(user_id, rows)
+
+
+@bp.route("/submit-transcript", methods=["POST"])
+def submit_transcript():
+    """Score a whole interview ({"items": [{"question", "answer"}, ...]}) in one request."""
+    data = request.get_json(silent=True) or {}
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Provide items: a list of {question, answer} objects."}), 400
+    if len(items) > MAX_TRANSCRIPT_ITEMS:
+        return jsonify({"error": f"At most {MAX_TRANSCRIPT_ITEMS} items per transcript."}), 400
+
+    pairs = []
+    for item in items:
+        item = item if isinstance(item, dict) else {}
+        pairs.append((str(item.get("question") or ""), str(item.get("answer") or "")))
+
+    decision = admission.admit()
+    if decision == DEGRADED:
+        results = [analyze_answer_keywords(question, answer) for question, answer in pairs]
+    elif decision != ADMITTED:
+        return _overloaded()
+    else:
+        try:
+            # One batched encode for every answer that gets past the cheap checks
+            results = analyze_answers(pairs)
+        except Exception as e:
+            logger.exception("Analyzer failure: %s", e)
+            return jsonify({"error": "Analysis service failed."}), 500
+        finally:
+            admission.release()
+        _record_scores([(question, result) for (question, _), result in zip(pairs, results)])
+
+    scores = [float(r["score"]) for r in results if "error" not in r and "score" in r]
+    aggregate = {
+        "items": len(results),
+        "scored": len(scores),
+        "errors": len(results) - len(scores),
+        "average_score": round(sum(scores) / len(scores), 2) if scores else 0.0,
+        "min_score": min(scores) if scores else None,
+        "max_score": max(scores) if scores else None,
+        "degraded": decision == DEGRADED,
+    }
+    return jsonify({"results": results, "aggregate": aggregate})
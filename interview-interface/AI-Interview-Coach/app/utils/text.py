@@ -1,6 +1,6 @@
 import os
 import re
-from typing import List
+from typing import List, Tuple
 
 # Minimal stopword list to extract key concept words from questions
 STOPWORDS: List[str] = [
@@ -21,3 +21,43 @@ def extract_concept(question_text: str) -> str:
     words = re.sub(r"[^a-zA-Z0-9\s]", " ", question_text.lower()).split()
     filtered = [w for w in words if w not in STOPWORDS and len(w) >= 3]
     return filtered[0] if filtered else (words[0] if words else "general")
+
+
+def normalize_question(text: str) -> str:
+    """Normalize question text for lookups: lowercase, punctuation to spaces, single spaces."""
+    return " ".join(re.sub(r"[^a-z0-9\s]", " ", text.lower()).split())
+
+
+# Topic cues in an ideal answer -> the key terms an answer on that topic should mention.
+# Checked in order; the first entry whose cues all appear wins.
+_TCP_UDP_TERMS = ["tcp", "udp", "reliable", "connection", "speed"]
+_TOPIC_KEY_TERMS: List[Tuple[Tuple[str, ...], List[str]]] = [
+    (("hash table",), ["hash", "bucket", "collision", "o(1)"]),
+    (("time complexity",), ["o(", "complexity", "runtime", "scale"]),
+    (("tcp",), _TCP_UDP_TERMS),
+    (("udp",), _TCP_UDP_TERMS),
+    (("recursion",), ["base case", "stack", "function calls", "iterative"]),
+    (("closure",), ["enclosing scope", "private", "function factory"]),
+    (("garbage collection",), ["reference counting", "memory", "cyclic", "free"]),
+    (("api gateway",), ["microservices", "routing", "authentication", "entry point"]),
+    (("cap theorem",), ["consistency", "availability", "partition tolerance"]),
+    (("authentication",), ["identity", "login", "authorization", "permissions"]),
+    (("global state",), ["mutable", "bug", "test", "pure function"]),
+    (("lazy loading",), ["delay", "performance", "memory", "initialize"]),
+    (("https",), ["tls", "ssl", "encrypt", "certificate", "man-in-the-middle"]),
+    (("process", "thread"), ["memory space", "isolation", "lightweight", "race condition"]),
+    (("sql query",), ["explain", "index", "slow query", "profiler"]),
+]
+
+
+def derive_key_terms(ideal_answer: str) -> List[str]:
+    """Key terms for an ideal answer: a curated list for known topics, else its 4+ letter words.
+
+    Order is stable (curated order, or first appearance), so the "missing concepts"
+    shown to users no longer vary between processes.
+    """
+    lower_ideal = ideal_answer.lower()
+    for cues, terms in _TOPIC_KEY_TERMS:
+        if all(cue in lower_ideal for cue in cues):
+            return list(terms)
+    return list(dict.fromkeys(re.findall(r"\b\w{4,}\b", lower_ideal)))
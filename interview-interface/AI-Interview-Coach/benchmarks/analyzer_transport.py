@@ -0,0 +1,155 @@
+"""Scoring latency through System A's two transports: in-process vs HTTP to System B.
+
+By default System B is a subprocess serving `/analyze` through the same
+analyze_answer() call the in-process transport uses, so the difference is the
+loopback HTTP hop, JSON and the second Flask stack. Point --url at a running
+`analyzer.py` to compare against the real System B instead. --stub-model swaps
+the encoder for a cheap hash embedding in both transports, which isolates the
+transport overhead and runs without the model installed.
+
+    python benchmarks/analyzer_transport.py --requests 200
+    python benchmarks/analyzer_transport.py --stub-model
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SERVER = r"""
+import sys
+import logging
+sys.path.insert(0, {root!r})
+sys.path.insert(0, {bench!r})
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+from analyzer_transport import configure
+
+analyze_answer = configure({stub!r})
+app = Flask("system-b-bench")
+
+
+@app.route("/analyze", methods=["POST"])
+def analyze():
+    data = request.json
+    result = analyze_answer(data.get("question", "").strip(), data.get("answer", "").strip())
+    return (jsonify(result), 400) if "error" in result else jsonify(result)
+
+
+logging.getLogger("werkzeug").setLevel(logging.ERROR)
+server = make_server("127.0.0.1", {port}, app, threaded=True)
+print("ready", flush=True)
+server.serve_forever()
+"""
+
+
+def configure(stub):
+    """Import the analyzer; with `stub`, replace the encoder by a deterministic hash embedding."""
+    from app.ai import analyzer_service as svc
+
+    if stub:
+        import hashlib
+        import numpy as np
+
+        def encode(texts):
+            out = np.zeros((len(texts), 64), dtype=np.float32)
+            for i, text in enumerate(texts):
+                for word in text.lower().split():
+                    out[i, int(hashlib.md5(word.encode()).hexdigest(), 16) % 64] += 1.0
+            return out
+
+        svc._encode = svc._encode_direct = encode
+    return svc.analyze_answer
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def workload(n):
+    from app.catalog import get_catalog
+
+    entries = get_catalog().entries()
+    payloads = []
+    for i in range(n):
+        entry = entries[i % len(entries)]
+        # A unique suffix per request keeps the result and embedding caches out of the picture
+        answer = f"{entry.ideal_answer} For example, case {i} illustrates the trade-offs."
+        payloads.append({"question": entry.question, "answer": answer})
+    return payloads
+
+
+def measure(analyzer, payloads, warmup):
+    for payload in payloads[:warmup]:
+        analyzer.post_json(payload)
+    samples = []
+    for payload in payloads[warmup:]:
+        started = time.perf_counter()
+        status, _ = analyzer.post_json(payload)
+        samples.append((time.perf_counter() - started) * 1000.0)
+        assert status == 200, status
+    return samples
+
+
+def summarize(name, samples):
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"{name:<12}{statistics.mean(samples):>10.2f}{statistics.median(samples):>10.2f}"
+          f"{p95:>10.2f}{1000.0 / statistics.mean(samples):>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--url", help="an already running System B /analyze endpoint")
+    parser.add_argument("--stub-model", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Fresh embedding store, caches off: every call does the full scoring work
+        os.environ.update(EMBEDDINGS_DIR=workdir, ANALYSIS_CACHE_MB="0",
+                          EMBEDDING_CACHE_MB="0", WARMUP="0")
+        from app.analyzer_client import AnalyzerClient, InProcessAnalyzer
+
+        configure(args.stub_model)
+        payloads = workload(args.requests + args.warmup)
+
+        server = None
+        url = args.url
+        if not url:
+            port = free_port()
+            code = SERVER.format(root=ROOT, bench=os.path.dirname(os.path.abspath(__file__)),
+                                 stub=args.stub_model, port=port)
+            server = subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.PIPE,
+                                      env=dict(os.environ), text=True)
+            server.stdout.readline()  # "ready"
+            url = f"http://127.0.0.1:{port}/analyze"
+        try:
+            results = {
+                "inprocess": measure(InProcessAnalyzer(), payloads, args.warmup),
+                "http": measure(AnalyzerClient(url, retries=0), payloads, args.warmup),
+            }
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+
+    print(f"{'transport':<12}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'req/s':>10}")
+    for name, samples in results.items():
+        summarize(name, samples)
+    overhead = statistics.median(results["http"]) - statistics.median(results["inprocess"])
+    print(f"HTTP hop adds {overhead:.2f} ms per call at the median "
+          f"({args.requests} sequential requests{', stub model' if args.stub_model else ''})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Compare embedding backends on the question bank: load time, memory, latency, throughput
+and agreement with the sentence-transformers reference.
+
+Each backend runs in a fresh interpreter so load time and RSS are not shared. The ONNX
+backends need `pip install onnxruntime` and `flask --app wsgi export-onnx` first.
+
+    python benchmarks/embedding_backends.py --backends sentence-transformers onnx onnx-int8
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE = r"""
+import json, os, sys, time
+import numpy as np
+sys.path.insert(0, {root!r})
+from app.catalog import get_catalog
+from app.ai import analyzer_service as svc
+
+
+def rss_mb():
+    with open("/proc/self/status") as fh:
+        for line in fh:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024.0
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+entries = get_catalog().entries()
+# A plausible answer per question: the first half of its ideal answer
+answers = []
+for e in entries:
+    words = e.ideal_answer.split()
+    answers.append(" ".join(words[: max(25, len(words) // 2)]))
+
+rss_before = rss_mb()
+t0 = time.perf_counter()
+backend = svc._get_backend()
+backend.encode(["warm-up"])
+load_ms = (time.perf_counter() - t0) * 1000
+
+single = []
+for text in answers:
+    t = time.perf_counter()
+    backend.encode([text])
+    single.append((time.perf_counter() - t) * 1000)
+
+t = time.perf_counter()
+for _ in range({rounds}):
+    answer_vecs = backend.encode(answers)
+throughput = len(answers) * {rounds} / (time.perf_counter() - t)
+
+ideal_vecs = backend.encode([e.ideal_answer for e in entries])
+question_vecs = backend.encode([e.question for e in entries])
+sims_ai = svc.cosine_rows(answer_vecs, ideal_vecs)
+sims_aq = svc.cosine_rows(answer_vecs, question_vecs)
+scores = [svc._score(e.question, a, e, float(ai), float(aq))["score"]
+          for e, a, ai, aq in zip(entries, answers, sims_ai, sims_aq)]
+np.save({out!r}, answer_vecs)
+print(json.dumps({{
+    "backend": getattr(backend, "name", svc._backend_name()),
+    "load_ms": load_ms,
+    "rss_mb": rss_mb() - rss_before,
+    "p50_ms": float(np.percentile(single, 50)),
+    "p95_ms": float(np.percentile(single, 95)),
+    "texts_per_s": throughput,
+    "sims": [float(s) for s in sims_ai],
+    "scores": scores,
+}}))
+"""
+
+
+def run_backend(name, workdir, rounds, threads):
+    out = os.path.join(workdir, f"{name}.npy")
+    env = dict(os.environ, EMBEDDING_BACKEND=name, ONNX_THREADS=str(threads))
+    code = SAMPLE.format(root=ROOT, out=out, rounds=rounds)
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                          capture_output=True, text=True, check=True)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["vectors"] = np.load(out)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+",
+                        default=["sentence-transformers", "onnx", "onnx-int8"])
+    parser.add_argument("--rounds", type=int, default=5, help="batch passes for throughput")
+    parser.add_argument("--threads", type=int, default=0, help="ONNX_THREADS (0 = runtime default)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [run_backend(name, workdir, args.rounds, args.threads) for name in args.backends]
+
+    reference = results[0]
+    header = (f"{'backend':<30}{'load ms':>9}{'rss MB':>8}{'p50 ms':>8}{'p95 ms':>8}"
+              f"{'texts/s':>9}{'vec cos':>9}{'sim Δmax':>9}{'score Δmax':>11}{'same':>6}")
+    print(header)
+    for requested, r in zip(args.backends, results):
+        a, b = r["vectors"], reference["vectors"]
+        vec_cos = float(np.mean(np.sum(a * b, axis=1) /
+                                (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))))
+        sim_delta = max(abs(x - y) for x, y in zip(r["sims"], reference["sims"]))
+        score_deltas = [abs(x - y) for x, y in zip(r["scores"], reference["scores"])]
+        same = sum(d == 0 for d in score_deltas) / len(score_deltas)
+        # A backend that failed to load falls back to the reference; show that
+        label = requested if r["backend"] == requested else f"{requested} -> {r['backend']}"
+        print(f"{label:<30}{r['load_ms']:>9.0f}{r['rss_mb']:>8.0f}"
+              f"{r['p50_ms']:>8.1f}{r['p95_ms']:>8.1f}"
+              f"{r['texts_per_s']:>9.0f}{vec_cos:>9.4f}{sim_delta:>9.4f}{max(score_deltas):>11.1f}"
+              f"{same:>6.0%}")
+    print(f"reference: {args.backends[0]}; {len(reference['scores'])} questions")
+
+
+if __name__ == "__main__":
+    main()
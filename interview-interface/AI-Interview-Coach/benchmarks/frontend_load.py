@@ -0,0 +1,217 @@
+"""Load test: Flask System A (system_a.py) vs the ASGI variant (system_a_async.py).
+
+Both front ends proxy /submit-answer to the same stub System B, which answers
+after --analyzer-ms (standing in for model time) and is asynchronous itself, so
+it is never the bottleneck. For each concurrency level the generator keeps that
+many submissions open and reports throughput, latency percentiles and errors.
+
+    python benchmarks/frontend_load.py --concurrency 50 200 1000 --requests 2000
+    python benchmarks/frontend_load.py --flask-server werkzeug   # no gunicorn installed
+
+Needs starlette and uvicorn (the async variant's requirements); the Flask
+side runs under gunicorn sync workers by default.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STUB = r"""
+import asyncio, sys, uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+DELAY = float(sys.argv[2]) / 1000.0
+
+
+async def analyze(request):
+    await request.json()
+    await asyncio.sleep(DELAY)
+    return JSONResponse({"score": 7.0, "feedback": "stub", "concept_coverage": 0.5})
+
+app = Starlette(routes=[Route("/analyze", analyze, methods=["POST"])])
+uvicorn.run(app, host="127.0.0.1", port=int(sys.argv[1]), log_level="warning", backlog=4096)
+"""
+
+PAYLOAD = {
+    "question": "Explain how a hash table works and why it's efficient.",
+    "answer": ("A hash table maps keys to buckets with a hash function, "
+               "so lookups are O(1) on average."),
+    "keywords": ["hash", "bucket"],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"nothing listening on port {port}")
+
+
+def start(cmd, env):
+    return subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL)
+
+
+def front_end_commands(args, flask_port, async_port):
+    if args.flask_server == "gunicorn":
+        flask = [sys.executable, "-m", "gunicorn", "-w", str(args.flask_workers),
+                 "--threads", str(args.flask_threads), "--backlog", "4096",
+                 "-b", f"127.0.0.1:{flask_port}", "system_a:app"]
+    else:
+        flask = [sys.executable, "-c",
+                 "import system_a; system_a.app.run(host='127.0.0.1', "
+                 f"port={flask_port}, threaded=True)"]
+    asgi = [sys.executable, "-m", "uvicorn", "system_a_async:app", "--host", "127.0.0.1",
+            "--port", str(async_port), "--log-level", "warning", "--backlog", "4096"]
+    return {"flask": (flask, flask_port), "asgi": (asgi, async_port)}
+
+
+class _Connection:
+    """Bare HTTP/1.1 keep-alive connection: the generator must stay cheaper than the servers."""
+
+    def __init__(self, host, port, path, body):
+        self.host, self.port = host, port
+        self.request = (f"POST {path} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+                        "Content-Type: application/json\r\n"
+                        f"Content-Length: {len(body)}\r\n\r\n").encode() + body
+        self.reader = self.writer = None
+
+    async def post(self):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(self.request)
+        await self.writer.drain()
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("closed by server")
+        length, close = 0, False
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+            elif name.lower() == "connection" and value.strip().lower() == "close":
+                close = True
+        await self.reader.readexactly(length)
+        if close:
+            self.close()
+        return int(status_line.split()[1])
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def run_level(url, concurrency, total, timeout):
+    host_port, _, path = url[len("http://"):].partition("/")
+    host, _, port = host_port.partition(":")
+    body = json.dumps(PAYLOAD).encode()
+    latencies, errors = [], 0
+    remaining = iter(range(total))
+
+    async def user():
+        nonlocal errors
+        conn = _Connection(host, int(port), "/" + path, body)
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                ok = await asyncio.wait_for(conn.post(), timeout) == 200
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                conn.close()
+                ok = False
+            if ok:
+                latencies.append((time.perf_counter() - started) * 1000.0)
+            else:
+                errors += 1
+        conn.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def report(name, concurrency, latencies, errors, elapsed):
+    if latencies:
+        ordered = sorted(latencies)
+
+        def pct(p):
+            return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+        p50, p95, p99 = statistics.median(ordered), pct(0.95), pct(0.99)
+    else:
+        p50 = p95 = p99 = float("nan")
+    print(f"{name:<7}{concurrency:>8}{len(latencies) / elapsed:>10.0f}"
+          f"{p50:>10.0f}{p95:>10.0f}{p99:>10.0f}{errors:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--requests", type=int, default=2000, help="submissions per level")
+    parser.add_argument("--analyzer-ms", type=float, default=250.0)
+    parser.add_argument("--flask-server", choices=["gunicorn", "werkzeug"], default="gunicorn")
+    parser.add_argument("--flask-workers", type=int, default=4)
+    parser.add_argument("--flask-threads", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=60.0, help="client timeout per request")
+    parser.add_argument("--pool-size", type=int, default=200,
+                        help="front end -> System B connection pool "
+                             "(ANALYZER_POOL_SIZE / ANALYZER_ASYNC_POOL_SIZE)")
+    parser.add_argument("--only", choices=["flask", "asgi"])
+    args = parser.parse_args()
+
+    stub_port, flask_port, async_port = free_port(), free_port(), free_port()
+    env = dict(os.environ, SYSTEM_B_URL=f"http://127.0.0.1:{stub_port}/analyze",
+               ANALYZER_RETRIES="0", ANALYZER_READ_TIMEOUT=str(args.timeout),
+               ANALYZER_POOL_SIZE=str(args.pool_size), ANALYZER_ASYNC_POOL_SIZE=str(args.pool_size),
+               ANALYZER_BREAKER_FAILURES="1000000")
+    processes = [start([sys.executable, "-c", STUB, str(stub_port), str(args.analyzer_ms)], env)]
+    try:
+        wait_for_port(stub_port)
+        flask_desc = (f"gunicorn {args.flask_workers} workers x {args.flask_threads} threads"
+                      if args.flask_server == "gunicorn" else "werkzeug, thread per request")
+        print(f"stub System B answers after {args.analyzer_ms:.0f} ms; flask = {flask_desc}, "
+              f"asgi = uvicorn, 1 process")
+        print(f"{'server':<7}{'conc.':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+              f"{'p99 ms':>10}{'errors':>8}")
+        for name, (cmd, port) in front_end_commands(args, flask_port, async_port).items():
+            if args.only and name != args.only:
+                continue
+            proc = start(cmd, env)
+            processes.append(proc)
+            wait_for_port(port)
+            url = f"http://127.0.0.1:{port}/submit-answer"
+            for concurrency in args.concurrency:
+                latencies, errors, elapsed = asyncio.run(
+                    run_level(url, concurrency, args.requests, args.timeout))
+                report(name, concurrency, latencies, errors, elapsed)
+            proc.terminate()
+            proc.wait()
+    finally:
+        for proc in processes:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,12 @@
 from flask import Flask, render_template, request, jsonify
 import json
 import random
-import requests
 import os
+import uuid
+
+from app.analyzer_client import AnalyzerUnavailable, CircuitOpenError, analyzer_from_env
+from app.catalog import content_hash
+from app.progress_store import get_progress_store
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 app = Flask(
@@ -13,14 +17,20 @@ app = Flask(
 
 # URL of System B (analysis server)
 SYSTEM_B_URL = os.getenv("SYSTEM_B_URL", "http://127.0.0.1:5000/analyze")
+# ANALYZER_TRANSPORT=inprocess scores here; default is a pooled HTTP client with timeouts,
+# retries and a circuit breaker
+analyzer = analyzer_from_env(SYSTEM_B_URL)
 
 # Load questions from JSON (path-safe)
 with open(os.path.join(BASE_DIR, "questions.json"), "r", encoding="utf-8") as file:
     questions_data = json.load(file)
 
-# Keep track of current question index per session (for simplicity, we'll use a global)
-current_question_index = {}
-used_questions = {}
+# Progress records questions by content hash, so edits to questions.json never shift them
+question_keys = {category: [content_hash(q["question"], q.get("ideal_answer", "")) for q in items]
+                 for category, items in questions_data.items()}
+
+# Questions already asked, per user and category, shared by all workers
+progress_store = get_progress_store()
 
 # Welcome page route
 @app.route("/")
@@ -41,18 +51,21 @@ def thank_you():
 @app.route("/get-question", methods=["POST"])
 def get_question():
     category = request.json.get("category")
+    user_id = request.cookies.get("user_id") or str(uuid.uuid4())
+    progress = progress_store.ensure_user(user_id)
 
-    if category not in used_questions:
-        used_questions[category] = []
-
-    remaining_questions = [q for q in questions_data[category] if q["question"] not in used_questions[category]]
+    remaining_questions = [(key, q) for key, q in zip(question_keys[category],
+                                                      questions_data[category])
+                           if not progress_store.has_used(progress, category, key)]
 
     if not remaining_questions:
         return jsonify({"message": "No more questions in this category."})
 
-    question = random.choice(remaining_questions)
-    used_questions[category].append(question["question"])
-    return jsonify({"question": question["question"], "keywords": question["keywords"]})
+    key, question = random.choice(remaining_questions)
+    progress_store.mark_used(user_id, category, key)
+    resp = jsonify({"question": question["question"], "keywords": question["keywords"]})
+    resp.set_cookie("user_id", user_id, max_age=60*60*24*30)  # 30 days
+    return resp
 
 @app.route("/submit-answer", methods=["POST"])
 def submit_answer():
@@ -68,12 +81,19 @@ def submit_answer():
     }
 
     try:
-        response = requests.post(SYSTEM_B_URL, json=payload)
-        result = response.json()
-        return jsonify(result)
-    except Exception as e:
+        status, result = analyzer.post_json(payload)
+        return jsonify(result), status
+    except CircuitOpenError as e:
+        resp = jsonify({"error": "System B not reachable", "details": str(e)})
+        resp.headers["Retry-After"] = str(int(e.retry_after))
+        return resp, 503
+    except AnalyzerUnavailable as e:
         return jsonify({"error": "System B not reachable", "details": str(e)}), 500
 
+@app.route("/metrics")
+def metrics():
+    return jsonify({"analyzer_client": analyzer.stats(), "progress": progress_store.stats()})
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", "8000"))
     app.run(host="0.0.0.0", port=port, debug=False)
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""ASGI variant of System A: the same routes and templates, with non-blocking calls to System B.
+
+While an answer is with the analyzer the request holds no worker thread, so one
+process keeps thousands of submissions in flight. Run with:
+
+    uvicorn system_a_async:app --host 0.0.0.0 --port 8000
+"""
+import os
+import uuid
+import random
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+from starlette.templating import Jinja2Templates
+
+from app.analyzer_client import AnalyzerUnavailable, AsyncAnalyzerClient, CircuitOpenError
+from app.catalog import QuestionCatalog
+from app.progress_store import get_progress_store
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# URL of System B (analysis server)
+SYSTEM_B_URL = os.getenv("SYSTEM_B_URL", "http://127.0.0.1:5000/analyze")
+analyzer = AsyncAnalyzerClient.from_env(
+    SYSTEM_B_URL, pool_timeout=float(os.getenv("ANALYZER_POOL_TIMEOUT", "30"))
+)
+
+templates = Jinja2Templates(directory=os.path.join(BASE_DIR, "templates"))
+catalog = QuestionCatalog(os.path.join(BASE_DIR, "questions.json"))
+
+# Questions already asked, per user and category, shared with the other workers
+progress_store = get_progress_store()
+
+
+def _url_for(name, filename=None, **params):
+    # The templates are shared with the Flask apps and call url_for("static", filename=...)
+    if filename is not None:
+        params["path"] = filename
+    return app.url_path_for(name, **params)
+
+
+templates.env.globals["url_for"] = _url_for
+
+
+async def welcome(request: Request):
+    return templates.TemplateResponse(request, "welcome.html")
+
+
+async def interview(request: Request):
+    return templates.TemplateResponse(request, "index.html", {"categories": catalog.categories()})
+
+
+async def thank_you(request: Request):
+    return templates.TemplateResponse(request, "thankyou.html")
+
+
+async def get_question(request: Request):
+    body = await request.json()
+    category = body.get("category")
+    if not catalog.has_category(category):
+        return JSONResponse({"message": "Invalid category."})
+
+    # SQLite calls are blocking; keep them off the event loop
+    user_id = request.cookies.get("user_id") or str(uuid.uuid4())
+    progress = await run_in_threadpool(progress_store.ensure_user, user_id)
+    remaining = [q for q in catalog.questions(category)
+                 if not progress_store.has_used(progress, category, q.content_hash)]
+    if not remaining:
+        return JSONResponse({"message": "No more questions in this category."})
+
+    question = random.choice(remaining)
+    await run_in_threadpool(progress_store.mark_used, user_id, category, question.content_hash)
+    response = JSONResponse({"question": question.question, "keywords": list(question.keywords)})
+    response.set_cookie("user_id", user_id, max_age=60 * 60 * 24 * 30)
+    return response
+
+
+async def submit_answer(request: Request):
+    data = await request.json()
+    payload = {
+        "question": data.get("question"),
+        "answer": data.get("answer"),
+        "keywords": data.get("keywords"),
+    }
+    try:
+        status, result = await analyzer.post_json(payload)
+        return JSONResponse(result, status_code=status)
+    except CircuitOpenError as e:
+        return JSONResponse({"error": "System B not reachable", "details": str(e)},
+                            status_code=503, headers={"Retry-After": str(int(e.retry_after))})
+    except AnalyzerUnavailable as e:
+        return JSONResponse({"error": "System B not reachable", "details": str(e)},
+                            status_code=500)
+
+
+async def metrics(request: Request):
+    return JSONResponse({"analyzer_client": analyzer.stats(), "progress": progress_store.stats()})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await analyzer.aclose()
+
+
+app = Starlette(
+    routes=[
+        Route("/", welcome),
+        Route("/interview", interview),
+        Route("/thankyou", thank_you),
+        Route("/get-question", get_question, methods=["POST"]),
+        Route("/submit-answer", submit_answer, methods=["POST"]),
+        Route("/metrics", metrics),
+        Mount("/static", StaticFiles(directory=os.path.join(BASE_DIR, "static")), name="static"),
+    ],
+    lifespan=lifespan,
+)
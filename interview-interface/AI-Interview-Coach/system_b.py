@@ -1,9 +1,10 @@
 import spacy
 from flask import Flask, request, jsonify
-import json
 import random
 import os
 
+from app.catalog import QuestionCatalog
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 app = Flask(__name__)
 
@@ -16,9 +17,8 @@ except Exception:
     except Exception:
         nlp = spacy.blank('en')
 
-# Load questions with keywords
-with open(os.path.join(BASE_DIR, 'questions.json'), 'r', encoding='utf-8') as file:
-    questions_data = json.load(file)
+# Questions with their keyword sets, loaded once and reloaded when the file changes
+catalog = QuestionCatalog(os.path.join(BASE_DIR, 'questions.json'))
 
 # Feedback messages categorized by score range
 feedback_messages = {
@@ -57,14 +57,9 @@ feedback_messages = {
 # Function to analyze the user's answer based on keywords
 def analyze_answer(question, answer):
     doc = nlp(answer)
-    keywords = []
-
-    # Find the corresponding question and extract keywords
-    for category in questions_data.values():
-        for item in category:
-            if item["question"] == question:
-                keywords = item["keywords"]
-                break
+    # Find the corresponding question and its keywords
+    entry = catalog.get(question)
+    keywords = entry.keywords if entry else ()
 
     if not keywords:
         return {"score": 0, "feedback": "No keywords found for this question."}
@@ -0,0 +1,46 @@
+import threading
+import time
+
+from app.admission import ADMITTED, DEGRADED, SHED, AdmissionController
+
+
+def test_sheds_when_queue_is_full_and_admits_after_release():
+    ctl = AdmissionController(max_in_flight=1, max_queue=0)
+    assert ctl.admit() == ADMITTED
+    assert ctl.admit() == SHED
+    ctl.release()
+    assert ctl.admit() == ADMITTED
+    stats = ctl.stats()
+    assert stats["admitted"] == 2 and stats["shed"] == 1 and stats["in_flight"] == 1
+
+
+def test_waiter_is_admitted_on_release_or_times_out():
+    ctl = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout_ms=2000)
+    assert ctl.admit() == ADMITTED
+    outcome = []
+    waiter = threading.Thread(target=lambda: outcome.append(ctl.admit()))
+    waiter.start()
+    while ctl.stats()["queue_depth"] == 0:
+        time.sleep(0.001)
+    ctl.release()
+    waiter.join(2)
+    assert outcome == [ADMITTED]
+    assert ctl.stats()["max_wait_ms"] > 0
+
+    impatient = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout_ms=10)
+    impatient.admit()
+    assert impatient.admit() == SHED
+    assert impatient.stats()["timed_out"] == 1
+
+
+def test_deep_queue_degrades_instead_of_waiting():
+    ctl = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout_ms=2000, degrade_at=1)
+    ctl.admit()
+    waiter = threading.Thread(target=ctl.admit)
+    waiter.start()
+    while ctl.stats()["queue_depth"] == 0:
+        time.sleep(0.001)
+    assert ctl.admit() == DEGRADED
+    ctl.release()
+    waiter.join(2)
+    assert ctl.stats()["degraded"] == 1
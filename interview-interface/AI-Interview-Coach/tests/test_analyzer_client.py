@@ -0,0 +1,149 @@
+import gc
+import json
+import time
+import warnings
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.analyzer_client import (
+    AnalyzerClient, AnalyzerUnavailable, AsyncAnalyzerClient, CircuitBreaker, CircuitOpenError,
+    InProcessAnalyzer,
+)
+from app.async_http import AsyncConnectionPool
+
+
+@pytest.fixture
+def analyzer():
+    """Local stand-in for System B that answers with the queued status codes (then 200)."""
+    statuses = []
+    seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            seen.append((json.loads(body), self.client_address[1]))
+            status = statuses.pop(0) if statuses else 200
+            data = json.dumps({"score": 7.5} if status == 200 else {"error": "busy"}).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/analyze", statuses, seen
+    server.shutdown()
+    server.server_close()
+
+
+def test_retries_transient_errors_over_one_kept_alive_connection(analyzer):
+    url, statuses, seen = analyzer
+    statuses.extend([503, 502])
+    client = AnalyzerClient(url, retries=2, backoff=0.001)
+    assert client.post_json({"question": "q", "answer": "a"}) == (200, {"score": 7.5})
+    assert len(seen) == 3
+    assert len({port for _, port in seen}) == 1  # connection reused
+    stats = client.stats()
+    assert stats["calls"] == 1 and stats["retries"] == 2 and stats["breaker"] == "closed"
+
+
+def test_async_client_retries_over_one_kept_alive_connection(analyzer):
+    url, statuses, seen = analyzer
+    statuses.append(503)
+
+    async def run():
+        client = AsyncAnalyzerClient(url, retries=2, backoff=0.001)
+        try:
+            first = await client.post_json({"question": "q", "answer": "a"})
+            second = await client.post_json({"question": "q", "answer": "b"})
+            return first, second, client.stats()
+        finally:
+            await client.aclose()
+
+    first, second, stats = asyncio.run(run())
+    assert first == second == (200, {"score": 7.5})
+    assert [payload["answer"] for payload, _ in seen] == ["a", "a", "b"]
+    assert len({port for _, port in seen}) == 1
+    assert stats["transport"] == "http-async" and stats["retries"] == 1
+
+
+def test_cancelled_async_request_closes_its_connection():
+    async def run():
+        closed = asyncio.Event()
+
+        async def never_answer(reader, writer):
+            await reader.read(1024)  # the request
+            await reader.read(1024)  # returns b"" once the client closes the socket
+            closed.set()
+            writer.close()
+
+        server = await asyncio.start_server(never_answer, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        pool = AsyncConnectionPool(f"http://127.0.0.1:{port}/analyze", read_timeout=30)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(pool.post(b"{}"), 0.2)
+        await asyncio.wait_for(closed.wait(), 5)
+        server.close()
+        return pool._idle
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", ResourceWarning)
+        assert asyncio.run(run()) == []
+        gc.collect()
+    # Closed by the pool, not by StreamWriter.__del__ ("unclosed <StreamWriter ...>")
+    assert not [w for w in caught if issubclass(w.category, ResourceWarning)]
+
+
+def test_async_pool_size_is_configured_separately(monkeypatch):
+    monkeypatch.setenv("ANALYZER_POOL_SIZE", "10")
+    monkeypatch.delenv("ANALYZER_ASYNC_POOL_SIZE", raising=False)
+    assert AsyncAnalyzerClient.from_env("http://127.0.0.1:1/analyze").pool.max_connections == 200
+    monkeypatch.setenv("ANALYZER_ASYNC_POOL_SIZE", "500")
+    assert AsyncAnalyzerClient.from_env("http://127.0.0.1:1/analyze").pool.max_connections == 500
+
+
+def test_non_idempotent_calls_are_not_retried(analyzer):
+    url, statuses, seen = analyzer
+    statuses.append(503)
+    client = AnalyzerClient(url, retries=2, backoff=0.001)
+    with pytest.raises(AnalyzerUnavailable):
+        client.post_json({"question": "q"}, idempotent=False)
+    assert len(seen) == 1
+
+
+def test_breaker_opens_fails_fast_and_recovers(analyzer):
+    url, statuses, seen = analyzer
+    statuses.extend([503, 503])
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    client = AnalyzerClient(url, retries=0, breaker=breaker)
+    for _ in range(2):
+        with pytest.raises(AnalyzerUnavailable):
+            client.post_json({})
+    with pytest.raises(CircuitOpenError):
+        client.post_json({})
+    assert len(seen) == 2 and client.stats()["short_circuited"] == 1
+
+    time.sleep(0.06)  # half-open: one trial call goes through and closes the breaker
+    assert client.post_json({})[0] == 200
+    assert breaker.state == "closed"
+
+
+def test_in_process_transport_mirrors_system_b_status_codes():
+    analyzer = InProcessAnalyzer()
+    status, body = analyzer.post_json({"question": "  ", "answer": "x"})
+    assert status == 400 and "error" in body
+    # In the bank, but too brief to embed: the precheck answers without loading the model
+    question = "Explain how a hash table works and why it's efficient."
+    status, body = analyzer.post_json({"question": question, "answer": "Too short."})
+    assert status == 200 and body["score"] == 1.5
+    stats = analyzer.stats()
+    assert stats["transport"] == "inprocess" and stats["calls"] == 2
@@ -7,8 +7,12 @@ from app.utils.text import extract_concept
 
 
 @pytest.fixture()
-def client():
-    app = create_app()
+def client(monkeypatch, tmp_path):
+    from app import progress_store
+
+    monkeypatch.setattr(progress_store, "_store",
+                        progress_store.SqliteProgressStore(str(tmp_path / "progress.sqlite3")))
+    app = create_app(warm_up=False)
     app.config.update({"TESTING": True})
     return app.test_client()
 
@@ -25,6 +29,26 @@ def test_get_question(client):
     assert "question" in data
 
 
+def test_used_questions_survive_a_catalog_reload(client, monkeypatch, tmp_path):
+    from app import catalog
+
+    path = tmp_path / "questions.json"
+    questions = [{"question": f"Q{i}?", "ideal_answer": f"Answer {i}."} for i in range(3)]
+    path.write_text(json.dumps({"general": questions[:2]}), encoding="utf-8")
+    os.utime(path, ns=(10**18, 10**18))
+    monkeypatch.setattr(catalog, "_catalog", catalog.QuestionCatalog(str(path)))
+    asked = {client.post("/get-question", json={"category": "general"}).get_json()["question"]
+             for _ in range(2)}
+    assert asked == {"Q0?", "Q1?"}
+
+    # A new question ahead of the asked ones shifts every position; it is the only one left
+    path.write_text(json.dumps({"general": [questions[2], questions[1], questions[0]]}),
+                    encoding="utf-8")
+    os.utime(path, ns=(2 * 10**18, 2 * 10**18))
+    res = client.post("/get-question", json={"category": "general"})
+    assert res.get_json()["question"] == "Q2?"
+
+
 def test_submit_answer_requires_body(client):
     res = client.post("/submit-answer", json={})
     assert res.status_code == 400
@@ -33,3 +57,139 @@ def test_submit_answer_requires_body(client):
 def test_dashboard_renders_empty(client):
     res = client.get("/dashboard")
     assert res.status_code == 200
+
+
+def test_metrics_reports_encoder_batching(client):
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    assert "avg_queue_delay_ms" in res.get_json()["encoder"]
+
+
+HASH_QUESTION = "Explain how a hash table works and why it's efficient."
+LONG_ANSWER = ("A hash table stores key value pairs in buckets chosen by a hash function. "
+               "Collisions are handled by chaining or open addressing, so lookups stay O(1) "
+               "on average, for example when caching user sessions by id.")
+
+
+class FakeBackend:
+    name = "sentence-transformers"
+
+    def encode(self, texts):
+        import numpy as np
+        return np.ones((len(texts), 4))
+
+
+@pytest.fixture()
+def fake_model(monkeypatch, tmp_path):
+    """Stub encoder (sentence-transformers is not needed) with fresh caches; returns its calls."""
+    import numpy as np
+    from app.ai import analyzer_service
+    from app.ai.embedding_store import EmbeddingStore
+    from app.ai.result_cache import SizedLRU
+
+    calls = []
+
+    def fake_encode(texts):
+        calls.append(list(texts))
+        return np.ones((len(texts), 4))
+
+    monkeypatch.setattr(analyzer_service, "_encode", fake_encode)
+    monkeypatch.setattr(analyzer_service, "_encode_direct", lambda texts: np.ones((len(texts), 4)))
+    monkeypatch.setattr(analyzer_service, "_BACKEND", FakeBackend())
+    monkeypatch.setattr(analyzer_service, "_STORE",
+                        EmbeddingStore(str(tmp_path), analyzer_service._id_for(FakeBackend.name)))
+    monkeypatch.setattr(analyzer_service, "_RESULTS", SizedLRU(1))
+    monkeypatch.setattr(analyzer_service, "_ANSWER_VECTORS", SizedLRU(1))
+    return calls
+
+
+def test_submit_transcript_scores_in_one_encode(client, fake_model):
+    calls = fake_model
+    long_answer = LONG_ANSWER
+    items = [
+        {"question": HASH_QUESTION, "answer": long_answer},
+        {"question": HASH_QUESTION, "answer": "Too short."},
+        {"question": "Not in the bank?", "answer": long_answer},
+        {"question": "", "answer": ""},
+    ]
+    res = client.post("/submit-transcript", json={"items": items})
+    assert res.status_code == 200
+    data = res.get_json()
+    assert len(data["results"]) == 4
+    assert data["results"][1]["score"] == 1.5
+    assert data["results"][2]["score"] == 0
+    assert "error" in data["results"][3]
+    assert data["aggregate"]["items"] == 4 and data["aggregate"]["errors"] == 1
+    # Only the answer that passed the cheap checks was embedded
+    assert calls == [[long_answer]]
+
+
+def test_submit_transcript_requires_items(client):
+    assert client.post("/submit-transcript", json={}).status_code == 400
+    assert client.post("/submit-transcript", json={"items": [{}] * 51}).status_code == 400
+
+
+def test_repeated_submission_is_served_from_cache(client, fake_model):
+    first = client.post("/submit-answer", json={"question": HASH_QUESTION, "answer": LONG_ANSWER})
+    # Same question modulo case/spacing, same answer: no second model call
+    variant = "  explain how a HASH table works and why it's efficient"
+    second = client.post("/submit-answer", json={"question": variant, "answer": LONG_ANSWER})
+    assert first.get_json() == second.get_json()
+    assert fake_model == [[LONG_ANSWER]]
+    caches = client.get("/metrics").get_json()["caches"]
+    assert caches["results"]["hits"] == 1
+
+
+def test_readyz_turns_green_after_warm_up(client, fake_model, monkeypatch):
+    from app.ai import analyzer_service
+
+    monkeypatch.setattr(analyzer_service, "_STARTUP", {"state": "loading", "load_ms": None,
+                                                       "warmup_ms": None, "error": None})
+    assert client.get("/healthz").status_code == 200
+    assert client.get("/readyz").status_code == 503
+
+    analyzer_service.warm_up()
+    res = client.get("/readyz")
+    assert res.status_code == 200
+    assert res.get_json()["state"] == "ready" and res.get_json()["load_ms"] is not None
+    assert fake_model  # the warm-up encode went through the (stubbed) batcher path
+
+
+def test_overload_returns_503_with_retry_after(client, fake_model, monkeypatch):
+    from app import routes
+    from app.admission import AdmissionController
+
+    busy = AdmissionController(max_in_flight=1, max_queue=0)
+    busy.admit()  # the only slot is taken
+    monkeypatch.setattr(routes, "admission", busy)
+    res = client.post("/submit-answer", json={"question": HASH_QUESTION, "answer": LONG_ANSWER})
+    assert res.status_code == 503
+    assert int(res.headers["Retry-After"]) >= 1
+    assert fake_model == []
+    assert client.get("/metrics").get_json()["admission"]["shed"] == 1
+
+
+def test_degraded_mode_scores_keywords_without_the_model(client, fake_model, monkeypatch):
+    from app import routes
+    from app.admission import DEGRADED
+
+    monkeypatch.setattr(routes.admission, "admit", lambda: DEGRADED)
+    res = client.post("/submit-answer", json={"question": HASH_QUESTION, "answer": LONG_ANSWER})
+    data = res.get_json()
+    assert res.status_code == 200 and data["degraded"] is True
+    assert "hash" in data["matched_concepts"]
+    assert fake_model == []
+
+
+def test_progress_is_shared_through_the_store(client, fake_model, tmp_path, monkeypatch):
+    from app import progress_store
+
+    client.post("/get-question", json={"category": "technical"})  # sets the user_id cookie
+    res = client.post("/submit-answer", json={"question": HASH_QUESTION, "answer": LONG_ANSWER})
+    assert res.status_code == 200
+    progress_store.get_progress_store().flush()
+
+    # A fresh store on the same file stands in for another worker, or a restart
+    monkeypatch.setattr(progress_store, "_store",
+                        progress_store.SqliteProgressStore(str(tmp_path / "progress.sqlite3")))
+    assert "Hash" in client.get("/dashboard").get_data(as_text=True)
@@ -0,0 +1,36 @@
+import numpy as np
+
+from app.ai import backends
+
+
+def test_mean_pool_ignores_padding_and_normalizes():
+    tokens = np.array([[[1.0, 0.0], [3.0, 0.0], [100.0, 100.0]]], dtype=np.float32)
+    mask = np.array([[1, 1, 0]])
+    pooled = backends.mean_pool(tokens, mask)
+    assert np.allclose(pooled, [[1.0, 0.0]])
+
+
+def test_missing_onnx_model_falls_back_to_sentence_transformers(monkeypatch, tmp_path):
+    class FakeReference:
+        name = backends.SENTENCE_TRANSFORMERS
+
+        def __init__(self, model_name):
+            self.model_name = model_name
+
+    monkeypatch.setattr(backends, "SentenceTransformerBackend", FakeReference)
+    backend = backends.load_backend(backends.ONNX_INT8, "all-MiniLM-L6-v2", str(tmp_path))
+    assert isinstance(backend, FakeReference)
+    assert backend.model_name == "all-MiniLM-L6-v2"
+
+
+def test_fallback_backend_keys_vectors_as_itself(monkeypatch):
+    from app.ai import analyzer_service
+
+    class FallenBack:
+        name = backends.SENTENCE_TRANSFORMERS
+
+    monkeypatch.setenv("EMBEDDING_BACKEND", backends.ONNX_INT8)
+    monkeypatch.setenv("MODEL_NAME", "all-MiniLM-L6-v2")
+    monkeypatch.setattr(analyzer_service, "_BACKEND", FallenBack())
+    # fp32 vectors from the fallback must not be stored under model@onnx-int8
+    assert analyzer_service._embedding_id() == "all-MiniLM-L6-v2"
@@ -0,0 +1,52 @@
+import threading
+
+import numpy as np
+
+from app.ai.batcher import EncodeBatcher
+
+
+def test_concurrent_requests_share_a_batch():
+    calls = []
+    gate = threading.Event()
+
+    def encode(texts):
+        calls.append(list(texts))
+        return np.array([[float(len(t))] for t in texts])
+
+    batcher = EncodeBatcher(encode, max_batch_size=8, max_wait_ms=200)
+    results = {}
+
+    def worker(i):
+        gate.wait()
+        results[i] = batcher.encode([f"text-{i}", "x" * i])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    gate.set()
+    for t in threads:
+        t.join()
+
+    # Each caller gets its own rows back, in order
+    for i in range(4):
+        assert results[i].tolist() == [[float(len(f"text-{i}"))], [float(i)]]
+    assert sum(len(c) for c in calls) == 8
+    assert len(calls) < 4
+    stats = batcher.stats()
+    assert stats["requests"] == 4 and stats["texts"] == 8
+    assert 0 < stats["avg_batch_fill"] <= 1
+
+
+def test_errors_reach_every_caller():
+    def encode(texts):
+        raise ValueError("model down")
+
+    batcher = EncodeBatcher(encode, max_batch_size=4, max_wait_ms=0)
+    try:
+        batcher.encode(["a"])
+    except ValueError as exc:
+        assert "model down" in str(exc)
+    else:
+        raise AssertionError("expected the encode error")
+    assert batcher.stats()["errors"] == 1
+
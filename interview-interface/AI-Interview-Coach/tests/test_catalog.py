@@ -0,0 +1,51 @@
+import os
+import json
+
+from app.catalog import QuestionCatalog
+
+
+def _write(path, data, mtime_ns=None):
+    path.write_text(json.dumps(data), encoding="utf-8")
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_lookup_by_exact_and_normalized_text(tmp_path):
+    path = tmp_path / "questions.json"
+    _write(path, {"technical": [{"question": "Explain how a hash table works.",
+                                 "ideal_answer": "A hash table maps keys to buckets."}]})
+    catalog = QuestionCatalog(str(path))
+
+    entry = catalog.get("Explain how a hash table works.")
+    assert entry is not None
+    assert entry.category == "technical" and entry.position == 0
+    assert entry.concept == "hash"
+    assert entry.key_terms == ("hash", "bucket", "collision", "o(1)")
+    # No explicit keywords in the file: the key terms are used
+    assert entry.keywords == entry.key_terms
+    assert catalog.get("  explain HOW a hash-table works ") is entry
+    assert catalog.get("Unknown question") is None
+
+
+def test_reloads_when_file_changes(tmp_path):
+    path = tmp_path / "questions.json"
+    _write(path, {"general": [{"question": "Q1?", "ideal_answer": "First answer text."}]},
+           mtime_ns=10**18)
+    catalog = QuestionCatalog(str(path))
+    assert catalog.categories() == ["general"]
+
+    _write(path, {"general": [{"question": "Q2?", "ideal_answer": "Second answer text.",
+                               "keywords": ["second"]}]}, mtime_ns=2 * 10**18)
+    assert catalog.get("Q1?") is None
+    assert catalog.get("Q2?").keywords == ("second",)
+
+
+def test_keeps_previous_catalog_on_bad_file(tmp_path):
+    path = tmp_path / "questions.json"
+    _write(path, {"general": [{"question": "Q1?", "ideal_answer": "Answer."}]}, mtime_ns=10**18)
+    catalog = QuestionCatalog(str(path))
+    assert catalog.get("Q1?") is not None
+
+    path.write_text("{not json", encoding="utf-8")
+    os.utime(path, ns=(2 * 10**18, 2 * 10**18))
+    assert catalog.get("Q1?") is not None
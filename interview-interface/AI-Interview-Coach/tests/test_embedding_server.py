@@ -0,0 +1,70 @@
+import threading
+
+import numpy as np
+import pytest
+
+from app.ai.embedding_protocol import (
+    EmbeddingClient, pack_matrix, pack_texts, unpack_matrix, unpack_texts,
+)
+from app.ai.embedding_server import EmbeddingServer
+
+
+def fake_encode(texts):
+    return np.array([[len(t), t.count(" "), 1.0] for t in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def server(tmp_path):
+    srv = EmbeddingServer(str(tmp_path / "emb.sock"), fake_encode, {"model": "fake"})
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_frames_round_trip():
+    texts = ["plain", "", "naïve café ✓"]
+    assert unpack_texts(pack_texts(texts)) == texts
+    matrix = np.arange(6, dtype=np.float32).reshape(2, 3)
+    assert np.array_equal(unpack_matrix(pack_matrix(matrix)), matrix)
+
+
+def test_client_encodes_through_server(server):
+    client = EmbeddingClient(server.server_address, timeout=5)
+    vectors = client.encode(["two words", "x"])
+    assert np.array_equal(vectors, fake_encode(["two words", "x"]))
+    assert client.info() == {"model": "fake"}
+
+
+def test_server_errors_are_raised_to_the_client(tmp_path):
+    def broken(texts):
+        raise ValueError("model exploded")
+
+    srv = EmbeddingServer(str(tmp_path / "broken.sock"), broken)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    try:
+        with pytest.raises(RuntimeError, match="model exploded"):
+            EmbeddingClient(srv.server_address, timeout=5).encode(["anything"])
+    finally:
+        srv.shutdown()
+        srv.server_close()
+
+
+def test_worker_refuses_a_server_with_another_backend(tmp_path, monkeypatch):
+    from app.ai import analyzer_service
+
+    srv = EmbeddingServer(str(tmp_path / "int8.sock"), fake_encode,
+                          {"model": "all-MiniLM-L6-v2", "backend": "onnx-int8"})
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    monkeypatch.setenv("MODEL_NAME", "all-MiniLM-L6-v2")
+    try:
+        monkeypatch.setenv("EMBEDDING_BACKEND", "sentence-transformers")
+        with pytest.raises(RuntimeError, match="onnx-int8"):
+            analyzer_service._connect_embedding_server(srv.server_address)
+        monkeypatch.setenv("EMBEDDING_BACKEND", "onnx-int8")
+        client = analyzer_service._connect_embedding_server(srv.server_address)
+        assert np.array_equal(client.encode(["x"]), fake_encode(["x"]))
+    finally:
+        srv.shutdown()
+        srv.server_close()
@@ -0,0 +1,83 @@
+import json
+import threading
+
+import numpy as np
+
+from app.ai.embedding_store import EmbeddingStore, cosine_rows
+from app.catalog import QuestionCatalog
+
+
+class FakeEncoder:
+    """Deterministic 8-dim vectors derived from the text; records every text it encodes."""
+
+    def __init__(self):
+        self.seen = []
+
+    def __call__(self, texts):
+        self.seen.extend(texts)
+        return np.array([[float((len(t) * (i + 3)) % 11) + 1.0 for i in range(8)] for t in texts])
+
+
+def _catalog(tmp_path, answers):
+    path = tmp_path / "questions.json"
+    items = [{"question": f"Question {i}?", "ideal_answer": a} for i, a in enumerate(answers)]
+    path.write_text(json.dumps({"general": items}), encoding="utf-8")
+    return QuestionCatalog(str(path))
+
+
+def test_builds_once_and_reloads_from_disk(tmp_path):
+    catalog = _catalog(tmp_path, ["alpha answer", "beta answer"])
+    encode = FakeEncoder()
+    store = EmbeddingStore(str(tmp_path / "emb"), "test/model")
+    entry = catalog.get("Question 1?")
+
+    ideal_vec, question_vec = store.vectors(entry, catalog.entries, encode)
+    assert len(encode.seen) == 4  # two ideal answers + two questions, in one batch
+    assert np.allclose(ideal_vec, encode(["beta answer"])[0])
+    assert np.allclose(question_vec, encode(["Question 1?"])[0])
+
+    fresh = EmbeddingStore(str(tmp_path / "emb"), "test/model")
+    assert fresh.load(catalog.entries())
+    never = FakeEncoder()
+    fresh.vectors(entry, catalog.entries, never)
+    assert never.seen == []
+
+
+def test_only_changed_questions_are_encoded(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "emb"), "test/model")
+    store.sync(_catalog(tmp_path, ["alpha answer", "beta answer"]).entries(), FakeEncoder())
+
+    catalog = _catalog(tmp_path, ["alpha answer", "beta answer, revised"])
+    encode = FakeEncoder()
+    store.sync(catalog.entries(), encode)
+    assert encode.seen == ["beta answer, revised", "Question 1?"]
+
+
+def test_concurrent_builds_do_not_collide(tmp_path):
+    catalog = _catalog(tmp_path, ["alpha answer", "beta answer"])
+    start = threading.Barrier(8)
+    errors = []
+
+    def build():
+        # Separate stores stand in for separate workers building on first request
+        store = EmbeddingStore(str(tmp_path / "emb"), "test/model")
+        start.wait()
+        try:
+            store.sync(catalog.entries(), FakeEncoder())
+        except Exception as e:  # pragma: no cover - the failure being tested for
+            errors.append(e)
+
+    threads = [threading.Thread(target=build) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert sorted(p.suffix for p in (tmp_path / "emb").iterdir()) == [".json", ".npy"]
+    assert EmbeddingStore(str(tmp_path / "emb"), "test/model").load(catalog.entries())
+
+
+def test_cosine_rows():
+    a = np.array([[1.0, 0.0], [0.0, 0.0], [1.0, 1.0]])
+    b = np.array([[2.0, 0.0], [1.0, 0.0], [-1.0, -1.0]])
+    assert np.allclose(cosine_rows(a, b), [1.0, 0.0, -1.0])
@@ -0,0 +1,32 @@
+import pytest
+
+from app.ai.model_artifacts import (
+    ArtifactError, resolve_model_source, verify_manifest, write_manifest,
+)
+
+
+def make_model_dir(tmp_path):
+    model_dir = tmp_path / "all-MiniLM-L6-v2"
+    (model_dir / "1_Pooling").mkdir(parents=True)
+    (model_dir / "model.safetensors").write_bytes(b"weights")
+    (model_dir / "1_Pooling" / "config.json").write_text("{}")
+    write_manifest(str(model_dir), "all-MiniLM-L6-v2")
+    return model_dir
+
+
+def test_verified_directory_is_used_instead_of_the_hub(tmp_path):
+    model_dir = make_model_dir(tmp_path)
+    assert resolve_model_source("all-MiniLM-L6-v2", str(model_dir)) == str(model_dir)
+    assert resolve_model_source("all-MiniLM-L6-v2", str(tmp_path / "missing")) == "all-MiniLM-L6-v2"
+
+
+def test_tampered_or_mismatched_artifacts_are_rejected(tmp_path):
+    model_dir = make_model_dir(tmp_path)
+    with pytest.raises(ArtifactError, match="expected"):
+        verify_manifest(str(model_dir), "another-model")
+    (model_dir / "model.safetensors").write_bytes(b"truncated")
+    with pytest.raises(ArtifactError, match="Checksum mismatch"):
+        verify_manifest(str(model_dir))
+    (model_dir / "1_Pooling" / "config.json").unlink()
+    with pytest.raises(ArtifactError, match="missing"):
+        resolve_model_source("all-MiniLM-L6-v2", str(model_dir))
@@ -0,0 +1,127 @@
+import time
+import sqlite3
+import threading
+
+import pytest
+
+from app import progress_store
+from app.progress_store import EWMA_ALPHA, MemoryProgressStore, SqliteProgressStore
+
+
+def test_buffered_scores_fold_into_running_aggregates(tmp_path):
+    path = str(tmp_path / "progress.sqlite3")
+    store = SqliteProgressStore(path, flush_interval_ms=60000)
+    other = SqliteProgressStore(path, flush_interval_ms=60000)  # another worker process
+    store.ensure_user("u1")
+    store.add_scores("u1", [("hash", 6.0), ("hash", 8.0)])
+    store.add_scores("u2", [("tree", 4.0)])
+
+    hash_stats = store.load("u1").concepts["hash"]
+    assert (hash_stats.count, hash_stats.mean) == (2, 7.0)
+    assert hash_stats.ewma == pytest.approx(EWMA_ALPHA * 8.0 + (1 - EWMA_ALPHA) * 6.0)
+    assert other.load("u1").concepts == {}
+
+    store.flush()
+    assert other.load("u1").concepts["hash"] == hash_stats
+    store.add_scores("u1", [("hash", 10.0)])
+    store.flush()
+    assert other.load("u1").concepts["hash"].count == 3
+    assert other.load("u2").concepts["tree"].total == 4.0
+    stats = store.stats()
+    assert stats["pending"] == 0 and stats["flushes"] == 2 and stats["rows_flushed"] == 4
+
+
+def test_used_questions_are_a_bitset_seen_by_every_worker(tmp_path):
+    path = str(tmp_path / "progress.sqlite3")
+    store = SqliteProgressStore(path)
+    other = SqliteProgressStore(path)
+    store.ensure_user("u1")
+    assert store.load("u1").used_by_cat == {}
+    assert store.load("u1").used_by_cat == {}
+    assert store.stats()["cache_hit_rate"] > 0
+
+    other.mark_used("u1", "technical", "hash-a")
+    store.mark_used("u2", "technical", "hash-b")
+    other.mark_used("u1", "technical", "hash-b")
+    progress = store.load("u1")
+    assert progress.used_by_cat == {"technical": 0b11}
+    # hash-a got its bit in the other worker; reading the profile taught it to this one
+    assert store.has_used(progress, "technical", "hash-a")
+    assert store.has_used(progress, "technical", "hash-b")
+    assert not store.has_used(progress, "technical", "x")
+    assert store.is_last(progress, "technical", "hash-b")
+    # One bit per key, assigned once for every user and worker
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT question_key, bit FROM question_bits ORDER BY bit").fetchall() \
+        == [("hash-a", 0), ("hash-b", 1)]
+    assert conn.execute("SELECT bits FROM used_bits WHERE user_id = 'u1'").fetchone() == (b"\x03",)
+
+    other.mark_used("u1", "technical", "hash-c", reset=True)
+    progress = store.load("u1")
+    assert progress.used_by_cat == {"technical": 1 << 2}
+    assert store.has_used(progress, "technical", "hash-c")
+    assert not store.has_used(progress, "technical", "hash-a")
+    assert store.load("nobody") is None
+
+
+
+def test_reads_do_not_wait_for_a_flush_stuck_on_the_write_lock(tmp_path):
+    path = str(tmp_path / "progress.sqlite3")
+    store = SqliteProgressStore(path, flush_interval_ms=60000)
+    store.add_scores("u1", [("hash", 6.0)])
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")  # another worker's long write
+    flusher = threading.Thread(target=store.flush)
+    flusher.start()
+    time.sleep(0.1)
+
+    started = time.perf_counter()
+    assert store.load("u1").concepts["hash"].count == 1
+    assert time.perf_counter() - started < 1.0
+    blocker.execute("COMMIT")
+    flusher.join()
+    assert store.stats()["pending"] == 0
+    assert store.load("u1").concepts["hash"].count == 1
+
+
+def test_rows_from_the_per_score_schema_are_folded_on_open(tmp_path):
+    path = str(tmp_path / "progress.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE users (user_id TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0,
+                            created_at REAL NOT NULL);
+        CREATE TABLE scores (user_id TEXT, concept TEXT, score REAL, created_at REAL);
+        INSERT INTO users VALUES ('u1', 3, 0);
+        INSERT INTO scores VALUES ('u1', 'hash', 4.0, 1), ('u1', 'hash', 6.0, 2);
+        CREATE TABLE used_positions (user_id TEXT, category TEXT, bits BLOB,
+                                     last_position INTEGER);
+        INSERT INTO used_positions VALUES ('u1', 'technical', x'05', 2);
+    """)
+    conn.commit()
+    conn.close()
+
+    progress = SqliteProgressStore(path).load("u1")
+    stats = progress.concepts["hash"]
+    assert (stats.count, stats.total, stats.last_seen) == (2, 10.0, 2)
+    # Positions in an older questions.json cannot be trusted; the rotation starts afresh
+    assert progress.used_by_cat == {}
+    tables = {name for (name,) in sqlite3.connect(path).execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert not tables & {"scores", "used_positions"}
+
+
+def test_memory_store_evicts_least_recent_and_idle_users(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(progress_store.time, "monotonic", lambda: clock[0])
+    store = MemoryProgressStore(max_users=2, idle_ttl_s=60)
+    store.mark_used("u1", "technical", "hash-a")
+    store.add_scores("u2", [("hash", 5.0)])
+    store.load("u1")
+    store.ensure_user("u3")  # u2 is least recently used
+    assert store.load("u2") is None
+    assert store.load("u1").used_by_cat == {"technical": 1}
+    assert store.has_used(store.load("u1"), "technical", "hash-a")
+
+    clock[0] += 61
+    assert store.load("u1") is None and store.load("u3") is None
+    assert store.stats()["evictions"] == 3
@@ -0,0 +1,26 @@
+import numpy as np
+
+from app.ai.result_cache import SizedLRU
+
+
+def test_evicts_least_recently_used_by_size():
+    cache = SizedLRU(max_mb=1, sizeof=lambda value: 400 * 1024)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the oldest
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["entries"] == 2
+    assert stats["hits"] == 3 and stats["misses"] == 1
+
+
+def test_disabled_and_oversized_values_are_not_stored():
+    disabled = SizedLRU(max_mb=0)
+    disabled.set("k", {"score": 1})
+    assert disabled.get("k") is None
+
+    small = SizedLRU(max_mb=0.001)
+    small.set("big", np.zeros(10_000, dtype=np.float32))
+    assert small.get("big") is None
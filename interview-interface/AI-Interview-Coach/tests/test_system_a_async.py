@@ -0,0 +1,53 @@
+import pytest
+from starlette.testclient import TestClient
+
+import system_a_async
+from app.analyzer_client import CircuitOpenError
+from app.progress_store import MemoryProgressStore
+
+
+class FakeAnalyzer:
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.payloads = []
+
+    async def post_json(self, payload, idempotent=True):
+        self.payloads.append(payload)
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+    def stats(self):
+        return {"transport": "fake"}
+
+    async def aclose(self):
+        pass
+
+
+@pytest.fixture
+def client(monkeypatch):
+    analyzer = FakeAnalyzer((200, {"score": 7.5, "feedback": "ok"}))
+    monkeypatch.setattr(system_a_async, "analyzer", analyzer)
+    monkeypatch.setattr(system_a_async, "progress_store", MemoryProgressStore())
+    with TestClient(system_a_async.app) as test_client:
+        yield test_client, analyzer
+
+
+def test_pages_and_questions_match_the_flask_front_end(client):
+    test_client, _ = client
+    welcome = test_client.get("/")
+    assert welcome.status_code == 200 and "/static/images/welcome_bg.jpg" in welcome.text
+    assert test_client.get("/interview").status_code == 200
+    data = test_client.post("/get-question", json={"category": "technical"}).json()
+    assert data["question"] and isinstance(data["keywords"], list)
+
+
+def test_submit_answer_proxies_and_fails_fast_when_breaker_is_open(client):
+    test_client, analyzer = client
+    res = test_client.post("/submit-answer", json={"question": "q", "answer": "a"})
+    assert res.status_code == 200 and res.json()["score"] == 7.5
+    assert analyzer.payloads[0]["answer"] == "a"
+
+    analyzer.outcome = CircuitOpenError(12)
+    res = test_client.post("/submit-answer", json={"question": "q", "answer": "a"})
+    assert res.status_code == 503 and res.headers["Retry-After"] == "12"
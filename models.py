@@ -1,4 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, func, select
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
 from datetime import datetime
 
 db = SQLAlchemy()
@@ -18,23 +22,228 @@ class CandidateProfile(db.Model):
     extracted_skills = db.Column(db.Text)
     tech_score = db.Column(db.Float, default=0.0)
     comm_score = db.Column(db.Float, default=0.0)
+    composite_score = db.Column(db.Float, default=0.0, index=True)  # kept in sync by _sync_composite_score
+    analysis_fingerprint = db.Column(db.String(64))  # resume + GitHub inputs of last analysis
+    github_etag = db.Column(db.String(100))
+    github_refreshed_at = db.Column(db.DateTime, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+def composite_score(tech_score, comm_score):
+    return round(((tech_score or 0.0) + (comm_score or 0.0)) / 2.0, 2)
+
+@event.listens_for(CandidateProfile, 'before_insert')
+@event.listens_for(CandidateProfile, 'before_update')
+def _sync_composite_score(mapper, connection, target):
+    # Bulk UPDATEs bypass mapper events and must set composite_score themselves
+    target.composite_score = composite_score(target.tech_score, target.comm_score)
 
 class Job(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     recruiter_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    closed_at = db.Column(db.DateTime)  # None while the job is open
+
+FUNNEL_STAGES = ["Applied", "Shortlisted", "Technical Checked", "HR Checked", "Selected"]
 
 class Application(db.Model):
+    # AUTOINCREMENT: ids of archived rows must never be handed out again
+    __table_args__ = {'sqlite_autoincrement': True}
     id = db.Column(db.Integer, primary_key=True)
     candidate_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     job_id = db.Column(db.Integer, db.ForeignKey('job.id'))
     status = db.Column(db.String(30), default="Applied")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    status_changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+class ApplicationStatusHistory(db.Model):
+    # Append-only: one row per status change of an application
+    id = db.Column(db.Integer, primary_key=True)
+    application_id = db.Column(db.Integer, db.ForeignKey('application.id'), index=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('job.id'), index=True)
+    from_status = db.Column(db.String(30))  # None when the application was created
+    to_status = db.Column(db.String(30), nullable=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class JobFunnelStage(db.Model):
+    # Per-job funnel summary, maintained incrementally alongside the history rows
+    job_id = db.Column(db.Integer, db.ForeignKey('job.id'), primary_key=True)
+    stage = db.Column(db.String(30), primary_key=True)
+    entered = db.Column(db.Integer, nullable=False, default=0)  # applications that moved into the stage
+    current = db.Column(db.Integer, nullable=False, default=0)  # applications in the stage now
+    exited = db.Column(db.Integer, nullable=False, default=0)   # applications that moved out of it
+    seconds_in_stage = db.Column(db.Float, nullable=False, default=0.0)  # total time spent before exiting
 
 class Review(db.Model):
+    __table_args__ = {'sqlite_autoincrement': True}
     id = db.Column(db.Integer, primary_key=True)
     application_id = db.Column(db.Integer, db.ForeignKey('application.id'))
     reviewer_type = db.Column(db.String(20))  # 'tech' or 'hr'
     score = db.Column(db.Float)
-    comment = db.Column(db.Text)
\ No newline at end of file
+    comment = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+# ===== Archive (separate SQLite file, bind 'archive') =====
+# Applications and reviews of long-closed jobs are moved here by the
+# archive-applications command so the hot tables stay small.
+class ArchivedApplication(db.Model):
+    __bind_key__ = 'archive'
+    id = db.Column(db.Integer, primary_key=True)  # same id as the original Application
+    candidate_id = db.Column(db.Integer, index=True)
+    job_id = db.Column(db.Integer, index=True)
+    status = db.Column(db.String(30))
+    created_at = db.Column(db.DateTime)
+    status_changed_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ArchivedReview(db.Model):
+    __bind_key__ = 'archive'
+    id = db.Column(db.Integer, primary_key=True)  # same id as the original Review
+    application_id = db.Column(db.Integer, index=True)
+    reviewer_type = db.Column(db.String(20))
+    score = db.Column(db.Float)
+    comment = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ExportJob(db.Model):
+    # Background candidate export; the artifact on disk is reused while `stamp` matches the data versions
+    id = db.Column(db.Integer, primary_key=True)
+    stamp = db.Column(db.String(100), nullable=False, index=True)
+    fmt = db.Column(db.String(10), nullable=False)  # 'csv' or 'csv.gz'
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued/running/done/failed/expired
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer)
+    path = db.Column(db.String(300))
+    # "<stamp>:<fmt>" while queued/running, NULL once finished; unique, so concurrent starts create one job
+    active_key = db.Column(db.String(120), unique=True, index=True)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped on every progress update; a job silent for the stale timeout is taken over
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+class DataVersion(db.Model):
+    # Version counter per table, bumped on every write; used for cache keys and ETags
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+VERSIONED_TABLES = ('user', 'candidate_profile', 'application', 'review')
+
+def bump_data_versions(connection, names):
+    now = datetime.utcnow()
+    table = DataVersion.__table__
+    for name in sorted(names):
+        stmt = sqlite_insert(table).values(name=name, version=1, updated_at=now)
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=['name'],
+            set_={'version': table.c.version + 1, 'updated_at': now},
+        ))
+
+@event.listens_for(Session, 'after_flush')
+def _bump_versions_on_flush(session, flush_context):
+    # new/dirty/deleted still hold the pre-flush state here
+    names = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__table__', None)
+        if table is not None and table.name in VERSIONED_TABLES:
+            names.add(table.name)
+    if names:
+        bump_data_versions(session.connection(), names)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bump_versions_on_bulk(orm_execute_state):
+    # Bulk UPDATE/DELETE/INSERT statements bypass the flush
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.local_table.name in VERSIONED_TABLES:
+        bump_data_versions(orm_execute_state.session.connection(), {mapper.local_table.name})
+
+# ===== Schema upgrades =====
+# create_all only creates missing tables; columns and indexes added to existing
+# tables since the first deploy are applied here (see the migrate-db command).
+def _add_missing_columns(connection, table):
+    existing = {row[1] for row in connection.exec_driver_sql(f'PRAGMA table_info("{table.name}")')}
+    added = []
+    for column in table.columns:
+        if column.name not in existing:
+            ddl = column.type.compile(dialect=connection.dialect)
+            connection.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {ddl}')
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+def _rebuild_with_autoincrement(connection, table, floor):
+    """Recreate a table created without AUTOINCREMENT; its id sequence continues above `floor`."""
+    ddl = connection.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)).scalar()
+    if 'AUTOINCREMENT' in ddl.upper():
+        return False
+    rebuilt = table.to_metadata(db.metadata, name=f"_{table.name}_rebuild")
+    try:
+        connection.exec_driver_sql(f'DROP TABLE IF EXISTS "{rebuilt.name}"')
+        connection.execute(CreateTable(rebuilt))
+    finally:
+        db.metadata.remove(rebuilt)
+    columns = ", ".join(f'"{c.name}"' for c in table.columns)
+    connection.exec_driver_sql(f'INSERT INTO "{rebuilt.name}" ({columns}) SELECT {columns} FROM "{table.name}"')
+    connection.exec_driver_sql(f'DROP TABLE "{table.name}"')
+    connection.exec_driver_sql(f'ALTER TABLE "{rebuilt.name}" RENAME TO "{table.name}"')
+    top = connection.exec_driver_sql(f'SELECT max(id) FROM "{table.name}"').scalar() or 0
+    connection.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = ?", (table.name,))
+    connection.exec_driver_sql("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)",
+                               (table.name, max(top, floor or 0)))
+    return True
+
+def _backfill_columns(connection):
+    """Fill columns that were added to tables with existing rows. Safe to re-run."""
+    now = datetime.utcnow()
+    profile, application, review = CandidateProfile.__table__, Application.__table__, Review.__table__
+    counts = {}
+    statements = [
+        profile.update().where(profile.c.composite_score.is_(None)).values(
+            composite_score=func.round((func.coalesce(profile.c.tech_score, 0.0)
+                                        + func.coalesce(profile.c.comm_score, 0.0)) / 2.0, 2)),
+        profile.update().where(profile.c.updated_at.is_(None)).values(updated_at=now),
+        application.update().where(application.c.updated_at.is_(None)).values(
+            updated_at=func.coalesce(application.c.created_at, now)),
+        review.update().where(review.c.updated_at.is_(None)).values(updated_at=now),
+    ]
+    for stmt in statements:
+        count = connection.execute(stmt).rowcount
+        if count:
+            counts[stmt.table.name] = counts.get(stmt.table.name, 0) + count
+    if counts:
+        # Cached views and export ETags were built from the pre-backfill rows
+        bump_data_versions(connection, counts)
+    return sum(counts.values())
+
+def upgrade_schema():
+    """Add missing columns and indexes on every bind, then backfill them. Idempotent.
+
+    Returns (added columns, tables rebuilt with AUTOINCREMENT, rows backfilled).
+    """
+    # Archived rows keep their ids, so a rebuilt hot table must not hand those out again
+    with db.engines['archive'].connect() as connection:
+        floors = {
+            'application': connection.execute(select(func.max(ArchivedApplication.id))).scalar(),
+            'review': connection.execute(select(func.max(ArchivedReview.id))).scalar(),
+        }
+    added, rebuilt = [], []
+    backfilled = 0
+    for bind_key, engine in db.engines.items():
+        tables = [t for t in db.metadata.sorted_tables if t.info.get('bind_key') == bind_key]
+        with engine.begin() as connection:
+            for table in tables:
+                added += _add_missing_columns(connection, table)
+                if (table.dialect_options['sqlite']['autoincrement']
+                        and _rebuild_with_autoincrement(connection, table, floors.get(table.name))):
+                    rebuilt.append(table.name)
+                for index in table.indexes:
+                    index.create(connection, checkfirst=True)
+            if bind_key is None:
+                backfilled += _backfill_columns(connection)
+    return added, rebuilt, backfilled
@@ -0,0 +1,99 @@
+import os
+import time
+import sqlite3
+
+# Token buckets shared by every worker process through a small SQLite file.
+# BEGIN IMMEDIATE serializes the read-modify-write across processes.
+# Settings are read from the environment on first use, after create_app() has loaded .env.
+_config = None
+
+
+def _settings():
+    global _config
+    if _config is None:
+        _config = {
+            "db": os.getenv(
+                "RATE_LIMIT_DB",
+                os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "ratelimit.db"),
+            ),
+            "max_wait": float(os.getenv("RATE_LIMIT_MAX_WAIT", "5")),
+            # name -> (burst capacity, tokens refilled per second)
+            "buckets": {
+                "gemini": (
+                    float(os.getenv("GEMINI_RATE_BURST", "5")),
+                    float(os.getenv("GEMINI_RATE_PER_MIN", "15")) / 60.0,
+                ),
+                "github": (
+                    float(os.getenv("GITHUB_RATE_BURST", "10")),
+                    float(os.getenv("GITHUB_RATE_PER_HOUR", "60")) / 3600.0,
+                ),
+            },
+        }
+    return _config
+
+
+def _connect():
+    path = _settings()["db"]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS buckets ("
+        "name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+    )
+    return conn
+
+
+def _reserve(name, capacity, rate, max_wait):
+    """Reserve one token and return the seconds to wait for it, or None if over max_wait.
+
+    Tokens may go negative: each reservation queues behind the earlier ones,
+    so concurrent callers are served in order instead of retrying in a loop.
+    """
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+            now = time.time()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if wait > max_wait:
+                conn.execute("ROLLBACK")
+                return None
+            conn.execute(
+                "INSERT INTO buckets (name, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (name, tokens - 1, now),
+            )
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+
+def default_max_wait():
+    """Seconds a caller may queue for a token unless it asks otherwise (RATE_LIMIT_MAX_WAIT)."""
+    return _settings()["max_wait"]
+
+
+def acquire(name, max_wait=None):
+    """Block until a token for `name` is available. Returns False if it would take longer than max_wait."""
+    settings = _settings()
+    if name not in settings["buckets"]:
+        return True
+    capacity, rate = settings["buckets"][name]
+    if max_wait is None:
+        max_wait = settings["max_wait"]
+    try:
+        wait = _reserve(name, capacity, rate, max_wait)
+    except sqlite3.Error:
+        # Limiter storage unavailable: don't block outbound calls on it
+        return True
+    if wait is None:
+        return False
+    if wait > 0:
+        time.sleep(wait)
+    return True
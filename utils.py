@@ -1,13 +1,14 @@
 import os
-import requests
+import time
+import hashlib
 from datetime import datetime, timedelta
-from PyPDF2 import PdfReader
-from dotenv import load_dotenv
+from ratelimit import acquire, default_max_wait
 
-load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# PyPDF2 and requests are imported inside the functions that use them so that
+# importing the app (every worker boot, every test) does not pay for them.
 
 def extract_text_from_pdf(pdf_path):
+    from PyPDF2 import PdfReader
     try:
         reader = PdfReader(pdf_path)
         text = ""
@@ -19,10 +20,29 @@ def extract_text_from_pdf(pdf_path):
     except Exception as e:
         raise ValueError(f"PDF read failed: {str(e)}")
 
-def call_gemini_api(prompt, timeout=20):
-    if not GEMINI_API_KEY:
+def profile_fingerprint(resume_path, github_url):
+    """Hash of the inputs that affect scoring: resume file content and GitHub URL."""
+    h = hashlib.sha256()
+    if resume_path and os.path.exists(resume_path):
+        with open(resume_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                h.update(chunk)
+    h.update(b'\0')
+    h.update((github_url or '').strip().rstrip('/').lower().encode('utf-8'))
+    return h.hexdigest()
+
+# Returned by call_gemini_api when the shared limiter had no token within max_wait
+GEMINI_RATE_LIMITED = object()
+
+def call_gemini_api(prompt, timeout=20, max_wait=None):
+    """Gemini's reply text; None without an API key or on failure, GEMINI_RATE_LIMITED if throttled."""
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
         return None
-    url = f"https://generativelanguage.googleapis.com/v1/models/gemini-1.0-pro-latest:generateContent?key={GEMINI_API_KEY}"
+    if not acquire("gemini", max_wait=max_wait):
+        return GEMINI_RATE_LIMITED
+    import requests
+    url = f"https://generativelanguage.googleapis.com/v1/models/gemini-1.0-pro-latest:generateContent?key={api_key}"
     payload = {
         "contents": [{"parts": [{"text": prompt}]}],
         "safetySettings": [
@@ -45,51 +65,96 @@ def extract_skills_fallback(text):
     found = [k for k in keywords if k.lower() in text.lower()]
     return ", ".join(found[:10]) if found else "No relevant skills detected"
 
-def analyze_candidate(resume_text, github_url=""):
+def analyze_github(github_url, etag=None, max_wait=None):
+    """Score GitHub activity (repos, languages, pushes in the last 90 days) → tech score.
+
+    Passing the ETag of the previous fetch makes a conditional request; on 304
+    the result has not_modified=True and callers keep their stored score. A
+    failed fetch (non-200, unexpected body, network error) sets error=True and
+    its tech_score is only a placeholder that must not replace a stored one.
+    """
+    result = {"tech_score": 50.0, "summary": "Not provided", "etag": etag,
+              "not_modified": False, "rate_limited": False, "error": False}
+    if not github_url:
+        return result
+    if not acquire("github", max_wait=max_wait):
+        result["rate_limited"] = True
+        result["summary"] = "GitHub rate limit reached; will re-check on next save"
+        return result
+    import requests
+    try:
+        username = github_url.strip('/').split('/')[-1]
+        headers = {"If-None-Match": etag} if etag else {}
+        resp = requests.get(f"https://api.github.com/users/{username}/repos?per_page=100", headers=headers, timeout=8)
+        if resp.status_code == 304:
+            result["not_modified"] = True
+            return result
+        repos = resp.json() if resp.status_code == 200 else None
+        recent_pushes = 0
+        langs = set()
+        if not isinstance(repos, list):
+            result["error"] = True
+            result["summary"] = f"GitHub check failed (HTTP {resp.status_code}); will re-check later"
+        else:
+            for r in repos:
+                if r.get('language'):
+                    langs.add(r['language'])
+                pushed_at = r.get('pushed_at')
+                if pushed_at:
+                    # Count pushes in last 90 days
+                    try:
+                        dt = datetime.strptime(pushed_at, "%Y-%m-%dT%H:%M:%SZ")
+                        if datetime.utcnow() - dt <= timedelta(days=90):
+                            recent_pushes += 1
+                    except Exception:
+                        pass
+            repo_count = len(repos)
+            lang_count = len(langs)
+            activity_bonus = min(30, recent_pushes * 2)
+            result["tech_score"] = round(min(100.0, 40 + repo_count * 2 + lang_count * 6 + activity_bonus), 1)
+            result["summary"] = f"Repos: {repo_count}, Recent active repos: {recent_pushes}, Languages: {', '.join(sorted(langs)) if langs else 'None'}"
+            result["etag"] = resp.headers.get("ETag")
+    except Exception:
+        result["error"] = True
+        result["summary"] = "GitHub check failed; will re-check later"
+    return result
+
+def analyze_candidate(resume_text, github_url="", max_wait=None):
+    """Skills, communication score and GitHub score for a profile.
+
+    The Gemini and GitHub calls together queue at most max_wait seconds
+    (default RATE_LIMIT_MAX_WAIT) on the rate limiter. If Gemini is throttled,
+    gemini_rate_limited=True and skills/comm_score are placeholders that must
+    not replace stored ones; likewise rate_limited for GitHub.
+    """
+    deadline = time.monotonic() + (default_max_wait() if max_wait is None else max_wait)
+
+    def remaining():
+        return max(0.0, deadline - time.monotonic())
+
     # Skills
     skills = extract_skills_fallback(resume_text)
-    ai_skills = call_gemini_api(f"Extract only technical and soft skills as comma-separated list. Resume: {resume_text[:1500]}")
-    if ai_skills:
+    ai_skills = call_gemini_api(f"Extract only technical and soft skills as comma-separated list. Resume: {resume_text[:1500]}",
+                                max_wait=remaining())
+    gemini_rate_limited = ai_skills is GEMINI_RATE_LIMITED
+    if ai_skills and not gemini_rate_limited:
         skills = ai_skills
 
-    # Communication Score
+    # Communication Score (not worth a token once the skills call was throttled)
     comm_score = 65.0
-    ai_comm = call_gemini_api(f"Rate resume clarity 0-100. Only number: {resume_text[:500]}")
-    if ai_comm:
+    ai_comm = None
+    if not gemini_rate_limited:
+        ai_comm = call_gemini_api(f"Rate resume clarity 0-100. Only number: {resume_text[:500]}",
+                                  max_wait=remaining())
+        gemini_rate_limited = ai_comm is GEMINI_RATE_LIMITED
+    if ai_comm and not gemini_rate_limited:
         try:
             comm_score = float(ai_comm.strip())
         except:
             pass
 
     # GitHub Analysis
-    tech_score = 50.0
-    github_summary = "Not provided"
-    if github_url:
-        try:
-            username = github_url.strip('/').split('/')[-1]
-            repos = requests.get(f"https://api.github.com/users/{username}/repos?per_page=100", timeout=8).json()
-            recent_pushes = 0
-            langs = set()
-            if isinstance(repos, list):
-                for r in repos:
-                    if r.get('language'):
-                        langs.add(r['language'])
-                    pushed_at = r.get('pushed_at')
-                    if pushed_at:
-                        # Count pushes in last 90 days
-                        try:
-                            dt = datetime.strptime(pushed_at, "%Y-%m-%dT%H:%M:%SZ")
-                            if datetime.utcnow() - dt <= timedelta(days=90):
-                                recent_pushes += 1
-                        except Exception:
-                            pass
-                repo_count = len(repos)
-                lang_count = len(langs)
-                activity_bonus = min(30, recent_pushes * 2)
-                tech_score = min(100.0, 40 + repo_count * 2 + lang_count * 6 + activity_bonus)
-                github_summary = f"Repos: {repo_count}, Recent active repos: {recent_pushes}, Languages: {', '.join(sorted(langs)) if langs else 'None'}"
-        except Exception:
-            pass
+    github = analyze_github(github_url, max_wait=remaining())
 
     # Feedback
     feedback = "Great technical profile! Add live project links to stand out."
@@ -98,8 +163,12 @@ def analyze_candidate(resume_text, github_url=""):
 
     return {
         "skills": skills,
-        "tech_score": round(tech_score, 1),
+        "tech_score": github["tech_score"],
         "comm_score": round(comm_score, 1),
-        "github_summary": github_summary,
-        "feedback": feedback
+        "github_summary": github["summary"],
+        "github_etag": github["etag"],
+        "feedback": feedback,
+        "rate_limited": github["rate_limited"],
+        "github_error": github["error"],
+        "gemini_rate_limited": gemini_rate_limited
     }
\ No newline at end of file